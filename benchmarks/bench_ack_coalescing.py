@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+
+# Pacotes e chamadas de sistema por KB transferido: ACK individual vs cumulativo/atrasado
+
+# (nome, modo de ACK do cliente, --ack-every do servidor)
+SCENARIOS = [
+    ("individual", "individual", 1),
+    ("cumulativo N=1", "cumulative", 1),
+    ("cumulativo N=2", "cumulative", 2),
+    ("cumulativo N=4", "cumulative", 4),
+    ("cumulativo N=8", "cumulative", 8),
+]
+
+def process_syscalls(pid):
+    """Lê as chamadas de leitura/escrita do processo em /proc (Linux)"""
+    try:
+        with open(f"/proc/{pid}/io") as io_file:
+            fields = dict(line.split(': ') for line in io_file.read().splitlines())
+        return int(fields['syscr']) + int(fields['syscw'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def run_scenario(host, input_path, operation_mode, ack_mode, ack_every, window_size, payload_size):
+    """Executa client.py contra um servidor dedicado e coleta as estatísticas"""
+    port = find_free_port(host)
+    server = start_server(host, port, '--window-size', window_size, '--ack-every', ack_every)
+    try:
+        server_before = process_syscalls(server.pid)
+        with tempfile.NamedTemporaryFile(suffix='.json') as stats_file:
+            subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+                            '--file', input_path, '--payload-size', str(payload_size),
+                            '--operation-mode', operation_mode, '--ack-mode', ack_mode,
+                            '--stats-json', stats_file.name],
+                           stdout=subprocess.DEVNULL, check=True)
+            with open(stats_file.name) as f:
+                stats = json.load(f)
+        server_after = process_syscalls(server.pid)
+    finally:
+        stop_server(server)
+
+    kilobytes = stats['payload_chars'] / 1024
+    server_syscalls = None if server_before is None else server_after - server_before
+    return {
+        "operation_mode": operation_mode,
+        "ack_mode": ack_mode,
+        "ack_every": ack_every,
+        "elapsed_s": stats['elapsed_s'],
+        "acks_per_kb": stats['acks_received'] / kilobytes,
+        "packets_per_kb": (stats['acks_received'] + stats['data_packets_sent'] + stats['retransmissions']) / kilobytes,
+        "client_syscalls_per_kb": (stats['send_calls'] + stats['recv_calls']) / kilobytes,
+        # Inclui as escritas de log do servidor (stdout redirecionado para /dev/null)
+        "server_syscalls_per_kb": None if server_syscalls is None else server_syscalls / kilobytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Redução de pacotes/syscalls com ACKs cumulativos')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--size', type=int, default=256 * 1024, help='Caracteres transferidos (padrão: 262144)')
+    parser.add_argument('--payload-size', type=int, default=256, help='Tamanho do segmento (padrão: 256)')
+    parser.add_argument('--window-size', type=int, default=16, help='Janela do servidor (padrão: 16)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as input_file:
+        input_file.write(('ACKs cumulativos reduzem o tráfego de retorno. ' * (args.size // 48 + 1))[:args.size])
+        input_file.flush()
+        for operation_mode in ('go_back_n', 'selective_repeat'):
+            for name, ack_mode, ack_every in SCENARIOS:
+                r = run_scenario(args.host, input_file.name, operation_mode, ack_mode, ack_every,
+                                 args.window_size, args.payload_size)
+                r["scenario"] = name
+                results.append(r)
+                if not args.json:
+                    server = '-' if r['server_syscalls_per_kb'] is None else f"{r['server_syscalls_per_kb']:.1f}"
+                    print(f"{operation_mode:>16} {name:<15} | {r['acks_per_kb']:5.2f} ACKs/KB | "
+                          f"{r['packets_per_kb']:5.2f} pacotes/KB | syscalls/KB cliente {r['client_syscalls_per_kb']:5.1f} "
+                          f"servidor {server:>5} | {r['elapsed_s']:.3f}s")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
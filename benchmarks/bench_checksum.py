@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Vazão (MB/s) de cada algoritmo de integridade para diferentes tamanhos de payload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import CHECKSUM_ALGORITHMS, compute_checksum
+
+def per_char_sum(text):
+    """Implementação original: gerador Python sobre cada caractere"""
+    return sum(ord(c) for c in text) % 256
+
+def measure(function, text, duration):
+    """Chama a função repetidamente sobre o mesmo payload e devolve MB/s (bytes UTF-8)"""
+    size = len(text.encode('utf-8'))
+    calls = 0
+    began = time.perf_counter()
+    deadline = began + duration
+    while time.perf_counter() < deadline:
+        function(text)
+        calls += 1
+    return calls * size / (time.perf_counter() - began) / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a vazão dos algoritmos de checksum')
+    parser.add_argument('--sizes', type=str, default='4,64,1024,16384,65536',
+                        help='Tamanhos de payload em caracteres (padrão: 4,64,1024,16384,65536)')
+    parser.add_argument('--duration', type=float, default=0.3, help='Segundos por medição (padrão: 0.3)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    functions = {'sum-por-caractere': per_char_sum}
+    for algorithm in CHECKSUM_ALGORITHMS:
+        functions[algorithm] = lambda text, algorithm=algorithm: compute_checksum(text, algorithm)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        text = ('abcdefghijklmnopqrstuvwxyz0123456789' * (size // 36 + 1))[:size]
+        rates = {name: measure(function, text, args.duration) for name, function in functions.items()}
+        results.append({"payload_chars": size, "mb_per_s": rates})
+        if not args.json:
+            print(f"payload {size:>6} | " + " | ".join(f"{name} {rate:>9.1f} MB/s" for name, rate in rates.items()))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
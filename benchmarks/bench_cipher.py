@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Vazão por pacote das cifras de payload: César original, César por tabela e AEAD (se disponível)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ciphers import AEAD_CIPHERS, AeadCipher, caesar_encrypt, caesar_decrypt
+
+SHIFT = 3
+
+def per_char_caesar(text, shift):
+    """Implementação original: isalpha/ord/chr por caractere e lista de partes"""
+    result = []
+    for char in text:
+        if char.isalpha():
+            base = ord('A') if char.isupper() else ord('a')
+            result.append(chr(base + (ord(char) - base + shift) % 26))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+def cipher_pairs():
+    """(criptografar, descriptografar) de cada cifra, ambos recebendo (seq, texto)"""
+    pairs = {
+        'caesar-por-caractere': (lambda seq, text: per_char_caesar(text, SHIFT),
+                                 lambda seq, text: per_char_caesar(text, -SHIFT)),
+        'caesar': (lambda seq, text: caesar_encrypt(text, SHIFT), lambda seq, text: caesar_decrypt(text, SHIFT)),
+    }
+    for name in AEAD_CIPHERS:
+        cipher = AeadCipher(name, os.urandom(32))
+        pairs[name] = (cipher.seal, cipher.open)
+    return pairs
+
+def measure(function, payloads, duration):
+    """Processa os payloads em sequência (um por pacote) e devolve pacotes/s"""
+    packets = 0
+    began = time.perf_counter()
+    deadline = began + duration
+    while time.perf_counter() < deadline:
+        for seq, text in enumerate(payloads):
+            function(seq, text)
+        packets += len(payloads)
+    return packets / (time.perf_counter() - began)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a vazão das cifras de payload por pacote')
+    parser.add_argument('--sizes', type=str, default='4,64,1024,16384',
+                        help='Tamanhos de payload em caracteres (padrão: 4,64,1024,16384)')
+    parser.add_argument('--packets', type=int, default=64, help='Pacotes distintos por rodada (padrão: 64)')
+    parser.add_argument('--duration', type=float, default=0.3, help='Segundos por medição (padrão: 0.3)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    if not AEAD_CIPHERS:
+        print("[AVISO] Pacote cryptography não instalado: apenas a Cifra de César será medida", file=sys.stderr)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        text = ('Olá mundo! Transporte confiável. ' * (size // 33 + 1))[:size]
+        payload_bytes = len(text.encode('utf-8'))
+        for name, (encrypt, decrypt) in cipher_pairs().items():
+            plain = [text] * args.packets
+            sealed = [encrypt(seq, text) for seq in range(args.packets)]
+            encrypt_rate = measure(encrypt, plain, args.duration)
+            decrypt_rate = measure(decrypt, sealed, args.duration)
+            results.append({"cipher": name, "payload_chars": size,
+                            "encrypt_packets_per_s": encrypt_rate, "decrypt_packets_per_s": decrypt_rate,
+                            "encrypt_mb_per_s": encrypt_rate * payload_bytes / 1e6,
+                            "decrypt_mb_per_s": decrypt_rate * payload_bytes / 1e6})
+            if not args.json:
+                r = results[-1]
+                print(f"payload {size:>6} | {name:<20} | cifrar {encrypt_rate:>10.0f} pacotes/s "
+                      f"({r['encrypt_mb_per_s']:>8.1f} MB/s) | decifrar {decrypt_rate:>10.0f} pacotes/s "
+                      f"({r['decrypt_mb_per_s']:>8.1f} MB/s)")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import io
+import os
+import glob
+import json
+import time
+import argparse
+
+from common import ROOT
+from compression import COMPRESSIONS, COMPRESSION_LEVELS, COMPRESSION_MODES, PayloadDecoder, compressed_segments
+from protocol import parse_size, TEXT_ERRORS
+
+# Taxa de compressão × custo de CPU por algoritmo, nível e modo, com os pacotes necessários para a entrada
+# e o tempo estimado em um enlace com banda limitada (CPU nos dois lados + bytes no fio)
+
+def default_corpus():
+    """Texto do próprio repositório (código e documentação), repetido até o tamanho pedido"""
+    parts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, '*.py')) + glob.glob(os.path.join(ROOT, '*.md'))):
+        with open(path, encoding='utf-8', errors=TEXT_ERRORS, newline='') as source:
+            parts.append(source.read())
+    return ''.join(parts)
+
+def measure(text, segment_size, name, level, mode):
+    """Comprime e descomprime a entrada pelo mesmo caminho do cliente/servidor"""
+    totals = {'uncompressed_bytes': 0, 'compressed_bytes': 0}
+    start = time.perf_counter()
+    segments = list(compressed_segments(io.StringIO(text, newline=''), segment_size, None, name, level, mode, totals))
+    compress_s = time.perf_counter() - start
+    decoder = PayloadDecoder(name, mode)
+    start = time.perf_counter()
+    output = ''.join(decoder.decode(segment, len(text) * 4 + 3) for segment in segments) + decoder.finish()
+    decompress_s = time.perf_counter() - start
+    if output != text:
+        raise RuntimeError(f"{name} nível {level} ({mode}): saída diferente da entrada")
+    return segments, totals, compress_s, decompress_s
+
+def main():
+    parser = argparse.ArgumentParser(description='Taxa de compressão e custo de CPU por algoritmo, nível e modo')
+    parser.add_argument('--file', type=str, default=None, help='Entrada (padrão: código e documentação do repositório)')
+    parser.add_argument('--size', type=parse_size, default=parse_size('2M'), help='Caracteres da entrada padrão (padrão: 2M)')
+    parser.add_argument('--payload-size', type=parse_size, default=parse_size('1400'),
+                        help='Segmento (MSS) usado para contar pacotes (padrão: 1400)')
+    parser.add_argument('--algorithms', type=str, default=','.join(COMPRESSIONS),
+                        help=f'Algoritmos (padrão: {",".join(COMPRESSIONS)})')
+    parser.add_argument('--levels', type=str, default=None, help='Níveis medidos (padrão: mínimo, padrão e máximo de cada algoritmo)')
+    parser.add_argument('--modes', type=str, default=','.join(COMPRESSION_MODES), help=f'Modos (padrão: {",".join(COMPRESSION_MODES)})')
+    parser.add_argument('--bandwidth', type=parse_size, default=parse_size('1M'),
+                        help='Banda do enlace para o tempo estimado, em bytes/s (padrão: 1M)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    if args.file is not None:
+        with open(args.file, encoding='utf-8', errors=TEXT_ERRORS, newline='') as source:
+            text = source.read()
+    else:
+        corpus = default_corpus()
+        text = (corpus * (args.size // len(corpus) + 1))[:args.size]
+    raw_bytes = len(text.encode('utf-8', TEXT_ERRORS))
+    raw_packets = -(-len(text) // args.payload_size)
+    results = [{"algorithm": "none", "level": None, "mode": None, "bytes": raw_bytes, "ratio": 1.0,
+                "packets": raw_packets, "compress_mb_s": None, "decompress_mb_s": None,
+                "link_s": raw_bytes / args.bandwidth}]
+    if not args.json:
+        print(f"{'sem compressão':<22} | {raw_bytes:>9} bytes | {raw_packets:>6} pacotes | enlace {results[0]['link_s']:6.2f}s")
+
+    for name in args.algorithms.split(','):
+        minimum, maximum, default = COMPRESSION_LEVELS[name]
+        levels = [int(level) for level in args.levels.split(',')] if args.levels else sorted({minimum, default, maximum})
+        for level in levels:
+            for mode in args.modes.split(','):
+                segments, totals, compress_s, decompress_s = measure(text, args.payload_size, name, level, mode)
+                wire_bytes = totals['compressed_bytes']
+                results.append({"algorithm": name, "level": level, "mode": mode, "bytes": wire_bytes,
+                                "ratio": wire_bytes / raw_bytes, "packets": len(segments),
+                                "compress_s": compress_s, "decompress_s": decompress_s,
+                                "compress_mb_s": raw_bytes / compress_s / 1e6,
+                                "decompress_mb_s": raw_bytes / decompress_s / 1e6,
+                                # CPU dos dois lados somada ao tempo de serialização no enlace
+                                "link_s": compress_s + decompress_s + wire_bytes / args.bandwidth})
+                if not args.json:
+                    r = results[-1]
+                    print(f"{name:<5} nível {level} {mode:<8} | {wire_bytes:>9} bytes ({r['ratio']:6.1%}) | "
+                          f"{r['packets']:>6} pacotes | comprime {r['compress_mb_s']:7.1f} MB/s | "
+                          f"descomprime {r['decompress_mb_s']:7.1f} MB/s | enlace {r['link_s']:6.2f}s")
+
+    if args.json:
+        print(json.dumps({"input_bytes": raw_bytes, "payload_size": args.payload_size, "bandwidth": args.bandwidth,
+                          "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import json
+import time
+import socket
+import argparse
+
+from common import find_free_port, start_server, stop_server
+from server import send_message, receive_message, calculate_checksum, raise_open_file_limit
+
+# Benchmark de concorrência: várias sessões simultâneas contra um único processo servidor
+
+def run_round(host, port, connections, segments, payload):
+    """Abre todas as conexões, faz o handshake de todas e só então troca dados"""
+    start = time.perf_counter()
+    sockets = [socket.create_connection((host, port)) for _ in range(connections)]
+    connected = time.perf_counter()
+
+    handshake = {"type": "handshake", "max_message_size": segments * len(payload),
+                 "operation_mode": "go_back_n", "encryption_enabled": False}
+    for s in sockets:
+        send_message(s, handshake)
+    window_size = min(receive_message(s)["window_size"] for s in sockets)
+    handshaken = time.perf_counter()
+
+    # Todas as sessões ficam abertas ao mesmo tempo; a troca avança janela a janela
+    checksum = calculate_checksum(payload)
+    for base in range(0, segments, window_size):
+        burst = range(base, min(base + window_size, segments))
+        for s in sockets:
+            for seq in burst:
+                send_message(s, {"type": "data", "seq_num": seq, "payload": payload, "checksum": checksum})
+        for s in sockets:
+            for seq in burst:
+                ack = receive_message(s)
+                if ack["type"] != "ack" or ack["seq_num"] != seq:
+                    raise RuntimeError(f"Resposta inesperada: {ack}")
+    finished = time.perf_counter()
+
+    for s in sockets:
+        s.close()
+
+    total_packets = connections * segments
+    payload_bytes = total_packets * len(payload.encode('utf-8'))
+    transfer_time = finished - handshaken
+    return {
+        "connections": connections,
+        "segments_per_connection": segments,
+        "connect_s": connected - start,
+        "handshake_s": handshaken - connected,
+        "transfer_s": transfer_time,
+        "total_s": finished - start,
+        "data_packets_per_s": total_packets / transfer_time,
+        "payload_bytes_per_s": payload_bytes / transfer_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de sessões simultâneas do servidor')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=0, help='Porta de um servidor já em execução (padrão: inicia um)')
+    parser.add_argument('--connections', type=str, default='1,10,100,1000,2000',
+                        help='Quantidades de conexões simultâneas (padrão: 1,10,100,1000,2000)')
+    parser.add_argument('--segments', type=int, default=20, help='Pacotes de dados por conexão (padrão: 20)')
+    parser.add_argument('--payload', type=str, default='abcd', help='Payload de cada pacote (padrão: abcd)')
+    parser.add_argument('--window-size', type=int, default=5, help='Janela do servidor iniciado (padrão: 5)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+
+    port = args.port
+    process = None
+    if not port:
+        port = find_free_port(args.host)
+        process = start_server(args.host, port, '--window-size', args.window_size)
+
+    results = []
+    try:
+        for connections in (int(c) for c in args.connections.split(',')):
+            results.append(run_round(args.host, port, connections, args.segments, args.payload))
+            if not args.json:
+                r = results[-1]
+                print(f"{r['connections']:>6} conexões | handshake {r['handshake_s']:.3f}s | "
+                      f"transferência {r['transfer_s']:.3f}s | {r['data_packets_per_s']:.0f} pacotes/s | "
+                      f"{r['payload_bytes_per_s'] / 1024:.1f} KiB/s")
+    finally:
+        stop_server(process)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
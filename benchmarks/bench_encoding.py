@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Microbenchmark das codificações de pacote: bytes no fio e pacotes/s (codificar + decodificar)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import PACKET_ENCODINGS, encode_packet, decode_packet, frame
+
+def sample_packets(payload_size):
+    """Pacote de dados com payload do tamanho pedido e o ACK correspondente"""
+    payload = ('abcdefghij' * (payload_size // 10 + 1))[:payload_size]
+    data = {"type": "data", "seq_num": 1234, "payload": payload, "checksum": 187, "encrypted": True}
+    ack = {"type": "ack", "seq_num": 1234}
+    return data, ack
+
+def measure(packet, encoding, duration):
+    """Executa codificar + decodificar repetidamente pelo tempo indicado"""
+    iterations = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            decode_packet(encode_packet(packet, encoding), encoding)
+        iterations += 1000
+    return iterations / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara as codificações JSON e binária dos pacotes')
+    parser.add_argument('--payload-sizes', type=str, default='4,64,1024,16384',
+                        help='Tamanhos de payload a medir (padrão: 4,64,1024,16384)')
+    parser.add_argument('--duration', type=float, default=0.5, help='Segundos por medição (padrão: 0.5)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    results = []
+    for payload_size in (int(p) for p in args.payload_sizes.split(',')):
+        data, ack = sample_packets(payload_size)
+        for encoding in PACKET_ENCODINGS:
+            results.append({
+                "encoding": encoding,
+                "payload_size": payload_size,
+                "data_wire_bytes": len(frame(encode_packet(data, encoding))),
+                "ack_wire_bytes": len(frame(encode_packet(ack, encoding))),
+                "data_packets_per_s": measure(data, encoding, args.duration),
+                "ack_packets_per_s": measure(ack, encoding, args.duration),
+            })
+            if not args.json:
+                r = results[-1]
+                print(f"{r['encoding']:>6} payload={payload_size:>6} | dados {r['data_wire_bytes']:>6} B "
+                      f"{r['data_packets_per_s']:>10.0f} pacotes/s | ack {r['ack_wire_bytes']:>3} B "
+                      f"{r['ack_packets_per_s']:>10.0f} pacotes/s")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
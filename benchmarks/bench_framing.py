@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+# Leitura de quadros: concatenação de bytes (recv(4) + message_data += chunk) vs. FrameReader com recv_into
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import FrameReader, frame
+
+def concatenating_reader(sock, count):
+    """Laço original: recv(4) separado e mensagem crescendo com +="""
+    for _ in range(count):
+        size = int.from_bytes(sock.recv(4), byteorder='big')
+        message_data = b''
+        while len(message_data) < size:
+            message_data += sock.recv(size - len(message_data))
+
+def frame_reader(sock, count):
+    """Buffer reutilizável: vários quadros por leitura, entregues como fatias"""
+    reader = FrameReader()
+    received = 0
+    while received < count:
+        if reader.next_frame() is not None:
+            received += 1
+        elif not reader.read_from(sock):
+            raise ConnectionError("Conexão fechada")
+
+def measure(read, frame_size, count):
+    """Uma thread escreve `count` quadros em um socketpair enquanto `read` os consome"""
+    writer, reader_socket = socket.socketpair()
+    data = frame(b'x' * frame_size)
+    sender = threading.Thread(target=lambda: [writer.sendall(data) for _ in range(count)])
+    began = time.perf_counter()
+    sender.start()
+    read(reader_socket, count)
+    elapsed = time.perf_counter() - began
+    sender.join()
+    writer.close()
+    reader_socket.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a leitura de quadros por concatenação com o FrameReader')
+    parser.add_argument('--sizes', type=str, default='16,1024,65536,1048576,16777216',
+                        help='Tamanhos de quadro em bytes (padrão: 16,1024,65536,1048576,16777216)')
+    parser.add_argument('--bytes', type=int, default=64 * 1024 * 1024,
+                        help='Total aproximado de bytes por medição (padrão: 64M)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        count = max(1, args.bytes // size)
+        rates = {name: count / measure(read, size, count)
+                 for name, read in (('concatenacao', concatenating_reader), ('frame_reader', frame_reader))}
+        results.append({"frame_bytes": size, "frames": count,
+                        "concatenating_frames_per_s": rates['concatenacao'],
+                        "frame_reader_frames_per_s": rates['frame_reader'],
+                        "concatenating_mb_per_s": rates['concatenacao'] * size / 1e6,
+                        "frame_reader_mb_per_s": rates['frame_reader'] * size / 1e6})
+        if not args.json:
+            r = results[-1]
+            print(f"quadro {size:>9} bytes | concatenação {r['concatenating_frames_per_s']:>10.0f} quadros/s "
+                  f"({r['concatenating_mb_per_s']:>8.1f} MB/s) | FrameReader {r['frame_reader_frames_per_s']:>10.0f} "
+                  f"quadros/s ({r['frame_reader_mb_per_s']:>8.1f} MB/s)")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import tempfile
+import itertools
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+from impairment import ImpairmentProxy, add_impairment_arguments, impairment_from_args
+from protocol import parse_size
+
+# Vazão útil, tempo de conclusão e taxa de retransmissão sob um enlace emulado (perda/atraso/reordenação),
+# varrendo modo × janela × tamanho de segmento; com a mesma semente as decisões do proxy se repetem
+
+MODES = {'gbn': 'go_back_n', 'sr': 'selective_repeat'}
+
+def run_transfer(host, proxy_port, input_path, client_args, workdir, timeout):
+    """Envia o arquivo pelo proxy; devolve as estatísticas do cliente e o tempo total (None se não concluiu)"""
+    stats_path = os.path.join(workdir, 'stats.json')
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(proxy_port),
+               '--file', input_path, '--stats-json', stats_path, '--quiet', *client_args]
+    start = time.perf_counter()
+    try:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=timeout)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None, time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    with open(stats_path) as stats_file:
+        return json.load(stats_file), elapsed
+
+def delivered_intact(output_dir, expected):
+    """Compara o que o servidor gravou com o arquivo enviado"""
+    files = glob.glob(os.path.join(output_dir, '*.txt'))
+    if len(files) != 1:
+        return False
+    with open(files[0], 'rb') as output_file:
+        return output_file.read() == expected
+
+def main():
+    parser = argparse.ArgumentParser(description='Varre modo × janela × segmento sob perda/atraso/reordenação emulados')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor e do proxy (padrão: 127.0.0.1)')
+    parser.add_argument('--transport', type=str, default='tcp', choices=('tcp', 'udp'), help='Transporte (padrão: tcp)')
+    parser.add_argument('--size', type=parse_size, default=parse_size('256K'), help='Bytes enviados por execução (padrão: 256K)')
+    parser.add_argument('--modes', type=str, default=','.join(MODES), help=f'Modos (padrão: {",".join(MODES)})')
+    parser.add_argument('--windows', type=str, default='16,64', help='--window-size do servidor (padrão: 16,64)')
+    parser.add_argument('--segments', type=str, default='512,4K', help='--payload-size do cliente (padrão: 512,4K)')
+    parser.add_argument('--client-timeout', type=float, default=0.2, help='--timeout do cliente, o RTO inicial (padrão: 0.2)')
+    parser.add_argument('--run-timeout', type=float, default=120.0,
+                        help='Limite de cada transferência em segundos; acima dele conta como falha (padrão: 120)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    add_impairment_arguments(parser)
+    args = parser.parse_args()
+
+    impairment = impairment_from_args(args)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        input_path = os.path.join(workdir, 'input.txt')
+        payload = ('abcdefghij' * (args.size // 10 + 1))[:args.size].encode()
+        with open(input_path, 'wb') as input_file:
+            input_file.write(payload)
+        for mode, window, segment in itertools.product(args.modes.split(','), args.windows.split(','),
+                                                       args.segments.split(',')):
+            output_dir = tempfile.mkdtemp(dir=workdir)
+            port = find_free_port(args.host)
+            server = start_server(args.host, port, '--window-size', window, '--output', output_dir, '--quiet',
+                                  transport=args.transport)
+            # Proxy novo por execução: cada combinação vê a mesma sequência de decisões para a semente
+            proxy = ImpairmentProxy(args.host, port, impairment, seed=args.seed, transport=args.transport)
+            client_args = ['--operation-mode', MODES[mode], '--payload-size', segment, '--timeout', str(args.client_timeout),
+                           '--transport', args.transport]
+            try:
+                stats, elapsed = run_transfer(args.host, proxy.port, input_path, client_args, workdir, args.run_timeout)
+            finally:
+                proxy.close()
+                stop_server(server)
+            result = {"mode": mode, "window": int(window), "segment": parse_size(segment), "bytes": args.size,
+                      "completed": stats is not None and delivered_intact(output_dir, payload),
+                      "completion_s": elapsed, "proxy": proxy.stats()}
+            if stats is not None:
+                sent = stats['data_packets_sent'] + stats['retransmissions']
+                result.update({"transfer_s": stats['elapsed_s'],
+                               "goodput_bps": args.size / stats['elapsed_s'] if stats['elapsed_s'] else None,
+                               "data_packets": stats['data_packets_sent'], "retransmissions": stats['retransmissions'],
+                               "retransmission_ratio": stats['retransmissions'] / sent if sent else 0.0,
+                               "timeouts": stats['timeouts']})
+            results.append(result)
+            if not args.json:
+                r = result
+                label = f"{mode:<3} | janela {window:>4} | segmento {segment:>5}"
+                if stats is None:
+                    print(f"{label} | FALHOU após {elapsed:.2f}s")
+                else:
+                    print(f"{label} | {r['goodput_bps'] / 1024:>9.1f} KiB/s | conclusão {elapsed:6.2f}s | "
+                          f"retransmissões {r['retransmission_ratio']:6.1%} | "
+                          f"descartados {r['proxy']['upstream']['dropped']}/{r['proxy']['downstream']['dropped']}"
+                          f"{'' if r['completed'] else ' | SAÍDA DIVERGENTE'}")
+
+    if args.json:
+        print(json.dumps({"impairment": impairment.describe(), "seed": args.seed, "transport": args.transport,
+                          "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
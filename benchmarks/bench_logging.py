@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+from protocol import parse_size
+
+# Custo dos logs por pacote: pacotes/s do cliente e do servidor com cada nível e destino de log
+
+VARIANTS = {
+    'debug': ['--log-level', 'debug'],
+    'debug-json': ['--log-level', 'debug', '--log-format', 'json'],
+    'debug-ring': ['--log-level', 'debug', '--log-ring', '1000'],
+    'info': ['--log-level', 'info'],
+    'quiet': ['--quiet'],
+}
+
+def run_client(host, port, input_path, client_args, log_args, workdir):
+    """Envia o arquivo com client.py (logs descartados) e lê as estatísticas gravadas em JSON"""
+    stats_path = os.path.join(workdir, 'stats.json')
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+               '--file', input_path, '--stats-json', stats_path, *client_args, *log_args]
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    with open(stats_path) as stats_file:
+        return json.load(stats_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede pacotes/s com os logs em cada nível (saída descartada)')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--size', type=parse_size, default=parse_size('1M'), help='Bytes enviados por execução (padrão: 1M)')
+    parser.add_argument('--payload-size', type=str, default='64',
+                        help='Segmento proposto: pequeno para que o custo por pacote domine (padrão: 64)')
+    parser.add_argument('--variants', type=str, default=','.join(VARIANTS),
+                        help=f'Variantes medidas (padrão: {",".join(VARIANTS)})')
+    parser.add_argument('--runs', type=int, default=3, help='Execuções por variante, vale a mediana (padrão: 3)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    client_args = ['--payload-size', args.payload_size]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        input_path = os.path.join(workdir, 'input.txt')
+        with open(input_path, 'w') as input_file:
+            input_file.write(('abcdefghij' * (args.size // 10 + 1))[:args.size])
+        for variant in args.variants.split(','):
+            log_args = VARIANTS[variant]
+            port = find_free_port(args.host)
+            # Servidor com os mesmos logs: o custo aparece nos dois lados da transferência
+            server = start_server(args.host, port, '--output', workdir, *log_args)
+            try:
+                runs = [run_client(args.host, port, input_path, client_args, log_args, workdir) for _ in range(args.runs)]
+            finally:
+                stop_server(server)
+            elapsed = statistics.median(stats['elapsed_s'] for stats in runs)
+            packets = runs[0]['data_packets_sent']
+            results.append({"variant": variant, "log_args": log_args, "bytes": args.size, "packets": packets,
+                            "elapsed_s": elapsed, "packets_per_s": packets / elapsed})
+            if not args.json:
+                r = results[-1]
+                print(f"{variant:<12} | {r['packets']:>6} pacotes | {r['elapsed_s']:.3f}s | "
+                      f"{r['packets_per_s']:>9.0f} pacotes/s (mediana de {args.runs})")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
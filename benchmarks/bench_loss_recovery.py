@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+
+# Tempo de conclusão dos cenários de perda do TEST.md para cada variante de recuperação
+
+# Cenários de --drop-packets/--corrupt-packets usados no TEST.md
+CASES = [
+    ["--drop-packets", "2"],
+    ["--drop-packets", "2,5,10"],
+    ["--drop-packets", "3-7"],
+    ["--drop-packets", "2,5-7,10"],
+    ["--drop-packets", "2", "--corrupt-packets", "5"],
+]
+
+# Variantes comparadas: (nome, argumentos extras do cliente)
+# As variantes "-sem-fr" desativam a retransmissão rápida e dependem apenas do timeout
+VARIANTS = {
+    "gbn-sem-fr": ["--operation-mode", "go_back_n", "--dup-threshold", "0"],
+    "gbn": ["--operation-mode", "go_back_n"],
+    "sr-sem-sack-sem-fr": ["--operation-mode", "selective_repeat", "--no-sack", "--dup-threshold", "0"],
+    "sr-sem-sack": ["--operation-mode", "selective_repeat", "--no-sack"],
+    "sr-sack": ["--operation-mode", "selective_repeat", "--sack"],
+}
+
+def run_case(host, port, case, variant_args, timeout):
+    """Executa client.py e mede o tempo total até a conclusão"""
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+               '--timeout', str(timeout), *variant_args, *case]
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de recuperação de perdas nos cenários do TEST.md')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='--timeout do cliente, o RTO inicial (padrão: 5.0, como no TEST.md)')
+    parser.add_argument('--variants', type=str, default=','.join(VARIANTS),
+                        help=f'Variantes a comparar (padrão: {",".join(VARIANTS)})')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    port = find_free_port(args.host)
+    server = start_server(args.host, port)
+    results = []
+    try:
+        for case in CASES:
+            for variant in args.variants.split(','):
+                elapsed = run_case(args.host, port, case, VARIANTS[variant], args.timeout)
+                results.append({"case": ' '.join(case), "variant": variant, "elapsed_s": elapsed})
+                if not args.json:
+                    print(f"{' '.join(case):<40} {variant:<20} {elapsed:6.2f}s")
+    finally:
+        stop_server(server)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT, find_free_port, start_server, stop_server
+from client import Connection, ClientSettings
+from pool import ConnectionPool
+from protocol import TRANSPORTS
+
+# Mensagens por segundo de um mesmo processo: um client.py por mensagem, uma Connection nova por mensagem
+# (connect + handshake a cada envio) e conexões reutilizadas pelo ConnectionPool
+
+def per_process(host, port, text, count, transport):
+    """Um processo client.py por mensagem (o único caminho antes da API importável)"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+                        '--transport', transport, '--text', text, '--log-level', 'error'],
+                       stdout=subprocess.DEVNULL, check=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def per_connection(host, port, text, count, settings):
+    """Uma Connection nova (connect + handshake) por mensagem, no mesmo processo"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with Connection(host, port, settings) as connection:
+            connection.send(text)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def pooled(host, port, text, count, settings, threads, size):
+    """Envios concorrentes por conexões mantidas abertas pelo pool"""
+    with ConnectionPool(host, port, settings, size=size) as pool:
+        def send(_):
+            start = time.perf_counter()
+            pool.send(text)
+            return time.perf_counter() - start
+        with ThreadPoolExecutor(threads) as executor:
+            latencies = list(executor.map(send, range(count)))
+        return latencies, dict(pool.stats)
+
+def main():
+    parser = argparse.ArgumentParser(description='Mensagens por segundo com e sem reutilização de conexões')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--transport', type=str, default='tcp', choices=TRANSPORTS, help='Transporte (padrão: tcp)')
+    parser.add_argument('--messages', type=int, default=2000, help='Mensagens enviadas pelo pool (padrão: 2000)')
+    parser.add_argument('--connection-messages', type=int, default=200,
+                        help='Mensagens enviadas com uma conexão nova cada (padrão: 200)')
+    parser.add_argument('--process-messages', type=int, default=20,
+                        help='Mensagens enviadas com um processo client.py cada, 0 pula (padrão: 20)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads enviando pelo pool (padrão: 8)')
+    parser.add_argument('--pool-size', type=int, default=4, help='Conexões do pool (padrão: 4)')
+    parser.add_argument('--size', type=int, default=256, help='Caracteres por mensagem (padrão: 256)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    text = 'x' * args.size
+    settings = ClientSettings(payload_size=1400, transport=args.transport)
+    port = find_free_port(args.host)
+    # Logs do servidor em warning: mede o transporte, não a escrita de cada mensagem no log
+    server = start_server(args.host, port, '--log-level', 'warning', transport=args.transport)
+    results = []
+    try:
+        runs = []
+        if args.process_messages > 0:
+            runs.append(('processo-por-mensagem', lambda: (per_process(args.host, port, text, args.process_messages, args.transport), None)))
+        runs.append(('conexão-por-mensagem', lambda: (per_connection(args.host, port, text, args.connection_messages, settings), None)))
+        runs.append((f'pool-{args.pool_size}x{args.threads}',
+                     lambda: pooled(args.host, port, text, args.messages, settings, args.threads, args.pool_size)))
+        for variant, run in runs:
+            start = time.perf_counter()
+            latencies, pool_stats = run()
+            elapsed = time.perf_counter() - start
+            results.append({"variant": variant, "messages": len(latencies), "elapsed_s": elapsed,
+                            "messages_per_s": len(latencies) / elapsed,
+                            "median_latency_ms": statistics.median(latencies) * 1000,
+                            "pool": pool_stats})
+            if not args.json:
+                r = results[-1]
+                reuse = (f" | conexões abertas {pool_stats['connections_opened']}, reutilizadas {pool_stats['connections_reused']}"
+                         if pool_stats else "")
+                print(f"{variant:<22} | {r['messages']:>5} mensagens | {r['messages_per_s']:>9.1f} msg/s | "
+                      f"latência mediana {r['median_latency_ms']:>8.2f}ms{reuse}")
+    finally:
+        stop_server(server)
+
+    if args.json:
+        print(json.dumps({"transport": args.transport, "size": args.size, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+
+# Latência da conexão até o primeiro byte entregue (e confirmado): handshake completo vs. retomada com ticket (0-RTT)
+
+class DelayRelay:
+    """Repassa conexões TCP ao servidor atrasando cada sentido em metade do RTT simulado"""
+
+    def __init__(self, host, target_port, rtt):
+        self.listener = socket.create_server((host, 0))
+        self.port = self.listener.getsockname()[1]
+        self.target = (host, target_port)
+        self.delay = rtt / 2
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.pipe(client, server)
+            self.pipe(server, client)
+
+    def pipe(self, source, destination):
+        """Dois threads por sentido: um lê e agenda, o outro entrega quando o atraso vence"""
+        pending = queue.Queue()
+
+        def reader():
+            while True:
+                try:
+                    data = source.recv(1 << 16)
+                except OSError:
+                    data = b''
+                pending.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def writer():
+            while True:
+                due, data = pending.get()
+                time.sleep(max(0.0, due - time.monotonic()))
+                try:
+                    if not data:
+                        destination.shutdown(socket.SHUT_WR)
+                        return
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=reader, daemon=True).start()
+        threading.Thread(target=writer, daemon=True).start()
+
+    def close(self):
+        self.listener.close()
+
+def run_client(host, port, client_args, cache_path, workdir):
+    """Executa client.py e lê as estatísticas gravadas em JSON"""
+    stats_path = os.path.join(workdir, 'stats.json')
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+               '--stats-json', stats_path, *client_args]
+    if cache_path is not None:
+        command += ['--session-cache', cache_path]
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    with open(stats_path) as stats_file:
+        return json.load(stats_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a latência até o primeiro byte com e sem retomada de sessão')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--rtt', type=float, default=20.0,
+                        help='RTT simulado em milissegundos por um relay com atraso, 0 conecta direto (padrão: 20)')
+    parser.add_argument('--runs', type=int, default=10, help='Conexões medidas por variante (padrão: 10)')
+    parser.add_argument('--text', type=str, default='x' * 256, help='Mensagem enviada em cada conexão')
+    parser.add_argument('--encryption', action='store_true', help='Ativar a cifra AEAD (troca de chaves no handshake completo)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    client_args = ['--text', args.text, '--payload-size', '1K']
+    if args.encryption:
+        client_args.append('--enable-encryption')
+    port = find_free_port(args.host)
+    server = start_server(args.host, port)
+    relay = DelayRelay(args.host, port, args.rtt / 1000) if args.rtt > 0 else None
+    target_port = relay.port if relay is not None else port
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            cache_path = os.path.join(workdir, 'tickets.json')
+            run_client(args.host, target_port, client_args, cache_path, workdir)  # Obter o primeiro ticket
+            for variant, cache in (('handshake-completo', None), ('retomada-0rtt', cache_path)):
+                runs = [run_client(args.host, target_port, client_args, cache, workdir) for _ in range(args.runs)]
+                if cache is not None and not all(stats['resumed'] for stats in runs):
+                    print("[AVISO] Nem todas as conexões foram retomadas com ticket", file=sys.stderr)
+                results.append({"variant": variant, "rtt_ms": args.rtt, "runs": args.runs,
+                                "handshake_ms": statistics.median(s['handshake_s'] for s in runs) * 1000,
+                                "first_ack_ms": statistics.median(s['first_ack_s'] for s in runs) * 1000})
+                if not args.json:
+                    r = results[-1]
+                    print(f"{variant:<20} | RTT {args.rtt:>5.1f}ms | até enviar dados {r['handshake_ms']:>7.2f}ms | "
+                          f"até o primeiro ACK {r['first_ack_ms']:>7.2f}ms (mediana de {args.runs})")
+    finally:
+        if relay is not None:
+            relay.close()
+        stop_server(server)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import json
+import time
+import socket
+import argparse
+
+from common import find_free_port, start_server, stop_server
+from protocol import MAX_SEGMENT_SIZE
+from server import send_message, receive_message, calculate_checksum
+
+# Teste de throughput: bytes/s da mesma mensagem conforme o segmento negociado cresce
+
+def transfer(host, port, message, segment_size, encoding):
+    """Negocia o MSS, envia a mensagem janela a janela e mede o tempo até o último ACK"""
+    s = socket.create_connection((host, port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    send_message(s, {"type": "handshake", "max_message_size": len(message), "max_segment_size": segment_size,
+                     "operation_mode": "go_back_n", "packet_encodings": [encoding]})
+    response = receive_message(s)
+    segment_size = response["max_segment_size"]
+    window_size = response["window_size"]
+    encoding = response.get("packet_encoding", "json")
+
+    segments = [message[i:i + segment_size] for i in range(0, len(message), segment_size)]
+    start = time.perf_counter()
+    for base in range(0, len(segments), window_size):
+        burst = range(base, min(base + window_size, len(segments)))
+        for seq in burst:
+            send_message(s, {"type": "data", "seq_num": seq, "payload": segments[seq],
+                             "checksum": calculate_checksum(segments[seq])}, encoding)
+        for seq in burst:
+            ack = receive_message(s, encoding)
+            if ack["type"] != "ack":
+                raise RuntimeError(f"Resposta inesperada: {ack}")
+    elapsed = time.perf_counter() - start
+    s.close()
+    return {
+        "segment_size": segment_size,
+        "encoding": encoding,
+        "packets": len(segments),
+        "elapsed_s": elapsed,
+        "bytes_per_s": len(message.encode('utf-8')) / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput em função do tamanho de segmento negociado')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--message-size', type=int, default=256 * 1024, help='Caracteres transferidos (padrão: 262144)')
+    parser.add_argument('--segment-sizes', type=str, default=f'4,16,64,256,1024,4096,16384,{MAX_SEGMENT_SIZE}',
+                        help='Tamanhos de segmento a medir')
+    parser.add_argument('--window-size', type=int, default=32, help='Janela do servidor iniciado (padrão: 32)')
+    parser.add_argument('--encoding', type=str, default='binary', choices=['binary', 'json'],
+                        help='Codificação dos pacotes (padrão: binary)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    message = ('Protocolo de transporte confiável. ' * (args.message_size // 35 + 1))[:args.message_size]
+    port = find_free_port(args.host)
+    process = start_server(args.host, port, '--window-size', args.window_size)
+
+    results = []
+    try:
+        for segment_size in (int(size) for size in args.segment_sizes.split(',')):
+            results.append(transfer(args.host, port, message, segment_size, args.encoding))
+            if not args.json:
+                r = results[-1]
+                print(f"segmento {r['segment_size']:>6} | {r['packets']:>7} pacotes | {r['elapsed_s']:7.3f}s | "
+                      f"{r['bytes_per_s'] / 1024 / 1024:8.2f} MiB/s")
+    finally:
+        stop_server(process)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import tempfile
+import argparse
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+
+# Chamadas de sistema por pacote e tempo de transferência: um send por prefixo/mensagem vs. rajadas com sendmsg
+
+# Variantes comparadas: (nome, argumentos extras do cliente)
+VARIANTS = {
+    "por-pacote": ["--no-batch-sends"],
+    "por-pacote-nagle": ["--no-batch-sends", "--no-tcp-nodelay"],
+    "rajada": ["--batch-sends"],
+    "rajada-nagle": ["--batch-sends", "--no-tcp-nodelay"],
+}
+
+def run_variant(host, port, input_path, payload_size, variant_args, workdir):
+    """Executa client.py com a entrada gerada e lê as estatísticas gravadas em JSON"""
+    stats_path = os.path.join(workdir, 'stats.json')
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+               '--file', input_path, '--payload-size', str(payload_size), '--stats-json', stats_path,
+               *variant_args]
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    with open(stats_path) as stats_file:
+        return json.load(stats_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara envios por pacote com rajadas coalescidas (sendmsg)')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--size', type=str, default='1M', help='Tamanho da entrada gerada em caracteres (padrão: 1M)')
+    parser.add_argument('--payload-sizes', type=str, default='64,1024',
+                        help='Tamanhos de segmento a medir (padrão: 64,1024)')
+    parser.add_argument('--window-size', type=int, default=64, help='Janela do servidor iniciado (padrão: 64)')
+    parser.add_argument('--variants', type=str, default=','.join(VARIANTS),
+                        help=f'Variantes a comparar (padrão: {",".join(VARIANTS)})')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from protocol import parse_size
+
+    port = find_free_port(args.host)
+    server = start_server(args.host, port, '--window-size', args.window_size)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            input_path = os.path.join(workdir, 'entrada.txt')
+            with open(input_path, 'w') as input_file:
+                input_file.write(('abcdefghijklmnopqrstuvwxyz0123456789\n' * (parse_size(args.size) // 37 + 1))[:parse_size(args.size)])
+            for payload_size in (int(p) for p in args.payload_sizes.split(',')):
+                for variant in args.variants.split(','):
+                    stats = run_variant(args.host, port, input_path, payload_size, VARIANTS[variant], workdir)
+                    packets = stats['data_packets_sent'] + stats['retransmissions']
+                    results.append({"payload_size": payload_size, "variant": variant, "packets": packets,
+                                    "send_calls": stats['send_calls'], "recv_calls": stats['recv_calls'],
+                                    "send_calls_per_packet": stats['send_calls'] / packets,
+                                    "elapsed_s": stats['elapsed_s'],
+                                    "packets_per_s": packets / stats['elapsed_s']})
+                    if not args.json:
+                        r = results[-1]
+                        print(f"segmento {payload_size:>6} | {variant:<17} | {r['send_calls_per_packet']:.3f} send/pacote | "
+                              f"{r['recv_calls'] / packets:.3f} recv/pacote | {r['elapsed_s']:.3f}s | "
+                              f"{r['packets_per_s']:.0f} pacotes/s")
+    finally:
+        stop_server(server)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+from impairment import ImpairmentProxy, add_impairment_arguments, impairment_from_args
+from bench_impairment import delivered_intact
+from protocol import TRANSPORTS, parse_size
+
+# Vazão de uma única transferência grande conforme cresce o número de faixas (conexões paralelas) em um
+# enlace com atraso: cada conexão envia no máximo uma janela por RTT, as faixas somam as janelas
+
+def run_transfer(host, proxy_port, input_path, stripes, client_args, workdir, timeout):
+    """Envia o arquivo em faixas pelo proxy; devolve as estatísticas do cliente e o tempo total (None se falhou)"""
+    stats_path = os.path.join(workdir, 'stats.json')
+    command = [sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(proxy_port),
+               '--file', input_path, '--stats-json', stats_path, '--quiet', *client_args]
+    if stripes > 1:
+        command += ['--stripes', str(stripes)]
+    start = time.perf_counter()
+    try:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=timeout)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None, time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    with open(stats_path) as stats_file:
+        return json.load(stats_file), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão de uma transferência por número de faixas paralelas')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor e do proxy (padrão: 127.0.0.1)')
+    parser.add_argument('--transport', type=str, default='tcp', choices=TRANSPORTS, help='Transporte (padrão: tcp)')
+    parser.add_argument('--size', type=parse_size, default=parse_size('2M'), help='Bytes da transferência (padrão: 2M)')
+    parser.add_argument('--stripes', type=str, default='1,2,4,8', help='Quantidades de faixas medidas (padrão: 1,2,4,8)')
+    parser.add_argument('--window-size', type=int, default=16, help='--window-size do servidor, por conexão (padrão: 16)')
+    parser.add_argument('--payload-size', type=str, default='1400', help='--payload-size do cliente (padrão: 1400)')
+    parser.add_argument('--run-timeout', type=float, default=300.0, help='Limite de cada transferência em segundos (padrão: 300)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    add_impairment_arguments(parser)
+    parser.set_defaults(delay=25.0)  # RTT de 50ms: a janela por conexão limita a vazão
+    args = parser.parse_args()
+
+    impairment = impairment_from_args(args)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        input_path = os.path.join(workdir, 'input.txt')
+        payload = ('abcdefghij' * (args.size // 10 + 1))[:args.size].encode()
+        with open(input_path, 'wb') as input_file:
+            input_file.write(payload)
+        for stripes in (int(count) for count in args.stripes.split(',')):
+            output_dir = tempfile.mkdtemp(dir=workdir)
+            port = find_free_port(args.host)
+            server = start_server(args.host, port, '--window-size', args.window_size, '--output', output_dir, '--quiet',
+                                  transport=args.transport)
+            # O limite de banda do proxy vale para cada conexão: com --bandwidth as faixas também somam banda
+            proxy = ImpairmentProxy(args.host, port, impairment, seed=args.seed, transport=args.transport)
+            client_args = ['--payload-size', args.payload_size, '--transport', args.transport]
+            try:
+                stats, elapsed = run_transfer(args.host, proxy.port, input_path, stripes, client_args, workdir,
+                                              args.run_timeout)
+            finally:
+                proxy.close()
+                stop_server(server)
+            result = {"stripes": stripes, "bytes": args.size, "completion_s": elapsed,
+                      "completed": stats is not None and delivered_intact(output_dir, payload)}
+            if stats is not None:
+                result.update({"goodput_bps": args.size / elapsed, "retransmissions": stats['retransmissions'],
+                               "timeouts": stats['timeouts']})
+            results.append(result)
+            if not args.json:
+                r = result
+                if stats is None:
+                    print(f"{stripes:>3} faixas | FALHOU após {elapsed:.2f}s")
+                else:
+                    print(f"{stripes:>3} faixas | {r['goodput_bps'] / 1024:>9.1f} KiB/s | conclusão {elapsed:6.2f}s | "
+                          f"{r['goodput_bps'] / results[0].get('goodput_bps', r['goodput_bps']):5.2f}x | "
+                          f"retransmissões {r['retransmissions']}{'' if r['completed'] else ' | SAÍDA DIVERGENTE'}")
+
+    if args.json:
+        print(json.dumps({"impairment": impairment.describe(), "seed": args.seed, "transport": args.transport,
+                          "window_size": args.window_size, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
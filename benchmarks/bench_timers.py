@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Custo de cada volta do laço de espera por ACKs: varredura linear da janela vs. heap de timers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timers import RetransmissionTimers
+
+def linear_pass(send_times, acknowledged, base_seq, next_seq, rto, now):
+    """Laço original: reconstrói a lista de pendentes e a percorre duas vezes"""
+    unacknowledged = [i for i in range(base_seq, next_seq) if i not in acknowledged]
+    for seq in unacknowledged:
+        if seq in send_times and now - send_times[seq] >= rto:
+            return seq
+    min_timeout = rto
+    for seq in unacknowledged:
+        if seq in send_times:
+            remaining = rto - (now - send_times[seq])
+            if 0 < remaining < min_timeout:
+                min_timeout = remaining
+    return None
+
+def heap_pass(timers, rto, now):
+    """Laço com heap: só o timer mais antigo importa"""
+    earliest = timers.earliest()
+    if earliest is not None and now - earliest[0] >= rto:
+        return earliest[1]
+    return None
+
+def measure(window, duration):
+    """Janela cheia; a cada volta um ACK desliza a base e um novo pacote é enviado"""
+    rto = 1.0
+    send_times = {}
+    timers = RetransmissionTimers()
+    start = time.monotonic()
+    for seq in range(window):
+        send_times[seq] = start
+        timers.arm(seq, start)
+
+    results = {}
+    for name in ('linear', 'heap'):
+        base_seq, next_seq = 0, window
+        acknowledged = set()
+        iterations = 0
+        began = time.perf_counter()
+        deadline = began + duration
+        while time.perf_counter() < deadline:
+            now = time.monotonic()
+            if name == 'linear':
+                linear_pass(send_times, acknowledged, base_seq, next_seq, rto, now)
+                send_times.pop(base_seq, None)
+                send_times[next_seq] = now
+            else:
+                heap_pass(timers, rto, now)
+                timers.cancel(base_seq)
+                timers.arm(next_seq, now)
+            base_seq += 1
+            next_seq += 1
+            iterations += 1
+        results[name] = iterations / (time.perf_counter() - began)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a varredura linear de timers com o heap de timers')
+    parser.add_argument('--windows', type=str, default='5,64,1024,16384,65536',
+                        help='Pacotes em trânsito a medir (padrão: 5,64,1024,16384,65536)')
+    parser.add_argument('--duration', type=float, default=0.5, help='Segundos por medição (padrão: 0.5)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    results = []
+    for window in (int(w) for w in args.windows.split(',')):
+        rates = measure(window, args.duration)
+        results.append({"window": window, "linear_iterations_per_s": rates['linear'],
+                        "heap_iterations_per_s": rates['heap']})
+        if not args.json:
+            print(f"janela {window:>6} | linear {rates['linear']:>12.0f} voltas/s | heap {rates['heap']:>12.0f} voltas/s")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
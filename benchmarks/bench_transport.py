@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from common import ROOT, find_free_port, start_server, stop_server
+
+# Throughput e recuperação de perdas do protocolo sobre TCP e sobre UDP, comparados ao TCP puro
+
+def raw_tcp_throughput(host, data):
+    """Referência: envia os mesmos bytes com sendall para um receptor que apenas descarta"""
+    listener = socket.create_server((host, 0))
+    received = []
+
+    def sink():
+        connection, _ = listener.accept()
+        total = 0
+        while chunk := connection.recv(1 << 16):
+            total += len(chunk)
+        received.append(total)
+        connection.close()
+
+    thread = threading.Thread(target=sink)
+    thread.start()
+    start = time.perf_counter()
+    with socket.create_connection(listener.getsockname()) as s:
+        s.sendall(data)
+    thread.join()
+    elapsed = time.perf_counter() - start
+    listener.close()
+    return {"transport": "tcp puro", "elapsed_s": elapsed, "mb_per_s": received[0] / elapsed / 1e6,
+            "retransmissions": None}
+
+def protocol_throughput(host, transport, input_path, size, client_args):
+    """Executa client.py sobre o transporte indicado contra um servidor dedicado"""
+    port = find_free_port(host)
+    with tempfile.TemporaryDirectory() as output_dir:
+        server = start_server(host, port, '--output', output_dir, '--window-size', 4096, transport=transport)
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.json') as stats_file:
+                subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), '--host', host, '--port', str(port),
+                                '--transport', transport, '--file', input_path, '--stats-json', stats_file.name,
+                                *client_args],
+                               stdout=subprocess.DEVNULL, check=True)
+                with open(stats_file.name) as f:
+                    stats = json.load(f)
+        finally:
+            stop_server(server)
+    return {"transport": transport, "elapsed_s": stats['elapsed_s'], "mb_per_s": size / stats['elapsed_s'] / 1e6,
+            "retransmissions": stats['retransmissions']}
+
+def main():
+    parser = argparse.ArgumentParser(description='Protocolo sobre TCP vs UDP vs TCP puro')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--size', type=int, default=8 * 1024 * 1024, help='Bytes transferidos (padrão: 8388608)')
+    parser.add_argument('--payload-size', type=str, default='16K', help='Segmento proposto (padrão: 16K)')
+    parser.add_argument('--operation-mode', type=str, default='selective_repeat',
+                        choices=['go_back_n', 'selective_repeat'], help='Modo do protocolo (padrão: selective_repeat)')
+    parser.add_argument('--drop-packets', type=str, default='10,100-104,300',
+                        help='Perdas simuladas na segunda rodada (padrão: 10,100-104,300)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    data = (b'transporte confiavel sobre datagramas ' * (args.size // 38 + 1))[:args.size]
+    base_args = ['--payload-size', args.payload_size, '--operation-mode', args.operation_mode]
+
+    results = [dict(raw_tcp_throughput(args.host, data), scenario="sem perdas")]
+    with tempfile.NamedTemporaryFile(suffix='.txt') as input_file:
+        input_file.write(data)
+        input_file.flush()
+        for scenario, extra in (("sem perdas", []), (f"perdas {args.drop_packets}", ['--drop-packets', args.drop_packets])):
+            for transport in ('tcp', 'udp'):
+                r = protocol_throughput(args.host, transport, input_file.name, args.size, base_args + extra)
+                results.append(dict(r, scenario=scenario))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        retransmissions = '-' if r['retransmissions'] is None else r['retransmissions']
+        print(f"{r['scenario']:<24} {r['transport']:<9} | {r['elapsed_s']:7.3f}s | {r['mb_per_s']:8.1f} MB/s | "
+              f"retransmissões {retransmissions}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from common import find_free_port, start_server, stop_server
+from client import Connection, ClientSettings
+from protocol import TRANSPORTS, parse_size
+
+# Vazão agregada do servidor conforme cresce o número de processos worker (--workers): vários clientes,
+# cada um em seu processo, enviando mensagens grandes ao mesmo tempo
+
+def load(host, port, transport, text, messages):
+    """Um cliente: uma conexão enviando messages mensagens em sequência (roda em outro processo)"""
+    settings = ClientSettings(payload_size=1400, transport=transport)
+    with Connection(host, port, settings) as connection:
+        for _ in range(messages):
+            connection.send(text)
+    return messages * len(text)
+
+def run_round(host, workers, clients, text, messages, transport):
+    port = find_free_port(host)
+    # Logs do servidor em warning: mede o processamento dos pacotes, não a escrita de cada mensagem no log
+    server = start_server(host, port, '--workers', workers, '--log-level', 'warning', transport=transport)
+    try:
+        with ProcessPoolExecutor(clients) as executor:
+            list(executor.map(abs, range(clients)))  # Processos dos clientes já criados antes da medição
+            start = time.perf_counter()
+            futures = [executor.submit(load, host, port, transport, text, messages) for _ in range(clients)]
+            chars = sum(future.result() for future in futures)
+            elapsed = time.perf_counter() - start
+    finally:
+        stop_server(server)
+    return {"workers": workers, "clients": clients, "messages": clients * messages, "chars": chars,
+            "elapsed_s": elapsed, "chars_per_s": chars / elapsed, "messages_per_s": clients * messages / elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão agregada do servidor por número de processos worker')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--transport', type=str, default='tcp', choices=TRANSPORTS, help='Transporte (padrão: tcp)')
+    parser.add_argument('--workers', type=str, default=None,
+                        help='Quantidades de workers medidas (padrão: 1, 2, 4... até o número de CPUs)')
+    parser.add_argument('--clients', type=int, default=None, help='Clientes simultâneos (padrão: 2x o número de CPUs, mínimo 4)')
+    parser.add_argument('--messages', type=int, default=20, help='Mensagens por cliente (padrão: 20)')
+    parser.add_argument('--size', type=parse_size, default=parse_size('256K'), help='Caracteres por mensagem (padrão: 256K)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados em JSON')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(count) for count in args.workers.split(',')]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= cpus:
+            counts.append(counts[-1] * 2)
+    clients = args.clients or max(4, 2 * cpus)
+    text = 'x' * args.size
+
+    results = []
+    for workers in counts:
+        results.append(run_round(args.host, workers, clients, text, args.messages, args.transport))
+        if not args.json:
+            r = results[-1]
+            print(f"{workers:>3} workers | {clients} clientes | {r['messages']:>5} mensagens em {r['elapsed_s']:.2f}s | "
+                  f"{r['chars_per_s'] / 1e6:7.2f} M caracteres/s | {r['messages_per_s']:8.1f} msg/s | "
+                  f"{r['chars_per_s'] / results[0]['chars_per_s']:.2f}x")
+
+    if args.json:
+        print(json.dumps({"cpus": cpus, "transport": args.transport, "size": args.size, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+
+# Utilitários compartilhados pelos benchmarks
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def find_free_port(host):
+    """Reserva uma porta livre para o servidor do benchmark"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+def udp_port_bound(host, port):
+    """Verifica se algum processo já ocupa a porta UDP (não há conexão para testar)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            s.bind((host, port))
+        except OSError:
+            return True
+    return False
+
+def start_server(host, port, *server_args, transport='tcp'):
+    """Inicia o servidor em um subprocesso e aguarda ele aceitar conexões"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'server.py'), '--host', host, '--port', str(port),
+         '--transport', transport, *[str(arg) for arg in server_args]],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10.0
+    while time.time() < deadline:
+        if transport == 'udp':
+            if udp_port_bound(host, port):
+                return process
+            time.sleep(0.05)
+            continue
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Servidor não iniciou a tempo")
+
+def stop_server(process):
+    """Encerra o servidor iniciado pelo benchmark"""
+    if process is not None:
+        process.terminate()
+        process.wait()
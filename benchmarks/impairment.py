@@ -0,0 +1,248 @@
+import sys
+import time
+import heapq
+import random
+import socket
+import argparse
+import itertools
+import threading
+
+from common import find_free_port
+from protocol import parse_size
+
+# Emulador de rede local: proxy entre cliente e servidor com perda, atraso, variação, reordenação,
+# duplicação e limite de banda, todos sorteados por geradores semeados (mesma semente, mesmas decisões)
+
+MAX_DATAGRAM = 65535
+
+class Impairment:
+    """Condições de um sentido do enlace emulado"""
+
+    def __init__(self, loss=0.0, delay=0.0, jitter=0.0, reorder=0.0, reorder_gap=0.01, duplicate=0.0, bandwidth=None):
+        self.loss = loss                # Probabilidade de descartar o pacote
+        self.delay = delay              # Atraso fixo em segundos
+        self.jitter = jitter            # Variação uniforme do atraso (±, segundos)
+        self.reorder = reorder          # Probabilidade de segurar o pacote para que os seguintes o ultrapassem
+        self.reorder_gap = reorder_gap  # ... por este atraso extra (segundos)
+        self.duplicate = duplicate      # Probabilidade de entregar o pacote duas vezes
+        self.bandwidth = bandwidth      # Bytes por segundo (None: ilimitada)
+
+    def describe(self):
+        """Parâmetros em um dicionário serializável (para relatórios)"""
+        return dict(vars(self))
+
+class Link:
+    """Um sentido do proxy: sorteia perda/duplicação e entrega cada pacote quando o seu atraso vence
+
+    Os pacotes de handshake (os primeiros `exempt` de cada sentido) passam sem impairments: sobre TCP o
+    cliente não reenvia o handshake.
+    """
+
+    def __init__(self, impairment, seed, send, on_close=None, exempt=1):
+        self.impairment = impairment
+        self.rng = random.Random(seed)
+        self.send = send
+        self.on_close = on_close
+        self.exempt = exempt
+        self.heap = []                  # (instante de entrega, ordem de chegada, pacote); None encerra o sentido
+        self.order = itertools.count()
+        self.cond = threading.Condition()
+        self.link_free_at = 0.0         # Fim da transmissão do último pacote (limite de banda)
+        self.last_due = 0.0
+        self.stats = {"packets": 0, "bytes": 0, "dropped": 0, "duplicated": 0, "reordered": 0}
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, packet):
+        """Recebe um pacote do remetente e agenda a(s) entrega(s)"""
+        now = time.monotonic()
+        imp = self.impairment
+        self.stats["packets"] += 1
+        self.stats["bytes"] += len(packet)
+        # Todos os sorteios acontecem para todo pacote: as decisões dependem só da semente e da posição
+        rng = self.rng
+        lost, duplicated, reordered = rng.random() < imp.loss, rng.random() < imp.duplicate, rng.random() < imp.reorder
+        jitters = (rng.uniform(-imp.jitter, imp.jitter), rng.uniform(-imp.jitter, imp.jitter))
+        if self.stats["packets"] <= self.exempt:
+            lost = duplicated = reordered = False
+            jitters = (0.0, 0.0)
+        if lost:
+            self.stats["dropped"] += 1
+            return
+        self.stats["duplicated"] += duplicated
+        self.stats["reordered"] += reordered
+        with self.cond:
+            for copy in range(2 if duplicated else 1):
+                start = max(now, self.link_free_at)
+                self.link_free_at = start + (len(packet) / imp.bandwidth if imp.bandwidth else 0.0)
+                due = self.link_free_at + max(0.0, imp.delay + jitters[copy])
+                if reordered and copy == 0:
+                    due += imp.reorder_gap
+                self.last_due = max(self.last_due, due)
+                heapq.heappush(self.heap, (due, next(self.order), packet))
+            self.cond.notify()
+
+    def close(self):
+        """O remetente encerrou: fechar o sentido depois de entregar o que já foi agendado"""
+        with self.cond:
+            heapq.heappush(self.heap, (max(self.last_due, time.monotonic()), next(self.order), None))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, packet = heapq.heappop(self.heap)
+            try:
+                if packet is None:
+                    if self.on_close is not None:
+                        self.on_close()
+                    return
+                self.send(packet)
+            except OSError:
+                return
+
+def read_frames(sock):
+    """Quadros TCP do protocolo (prefixo de 4 bytes + mensagem), inteiros, até o fim da conexão"""
+    buffer = bytearray()
+    while True:
+        while len(buffer) >= 4 and len(buffer) >= 4 + int.from_bytes(buffer[:4], 'big'):
+            size = 4 + int.from_bytes(buffer[:4], 'big')
+            yield bytes(buffer[:size])
+            del buffer[:size]
+        try:
+            data = sock.recv(1 << 16)
+        except OSError:
+            return
+        if not data:
+            return
+        buffer += data
+
+class ImpairmentProxy:
+    """Proxy local entre cliente e servidor: quadros TCP ou datagramas UDP passam pelos enlaces emulados
+
+    Sobre TCP a unidade é o quadro do protocolo (perder um quadro equivale a perder o pacote), então perdas e
+    reordenações exercitam a recuperação do protocolo mesmo com o TCP por baixo.
+    """
+
+    def __init__(self, host, target_port, upstream, downstream=None, seed=0, transport='tcp', port=0):
+        self.target = (host, target_port)
+        self.upstream = upstream                   # Cliente -> servidor
+        self.downstream = downstream or upstream   # Servidor -> cliente
+        self.seed = seed
+        self.transport = transport
+        self.links = []
+        self.connections = itertools.count()
+        self.closed = False
+        if transport == 'udp':
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.listener.bind((host, port))
+            self.sessions = {}  # Endereço do cliente -> enlace cliente -> servidor
+            threading.Thread(target=self.serve_datagrams, daemon=True).start()
+        else:
+            self.listener = socket.create_server((host, port))
+            threading.Thread(target=self.accept_loop, daemon=True).start()
+        self.port = self.listener.getsockname()[1]
+
+    def create_links(self, send_up, send_down, close_up=None, close_down=None):
+        """Par de enlaces de uma conexão, cada sentido com a sua própria semente derivada"""
+        index = next(self.connections)
+        up = Link(self.upstream, f"{self.seed}:{index}:up", send_up, close_up)
+        down = Link(self.downstream, f"{self.seed}:{index}:down", send_down, close_down)
+        self.links += (up, down)
+        return up, down
+
+    def accept_loop(self):
+        while not self.closed:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            up, down = self.create_links(server.sendall, client.sendall,
+                                         lambda sock=server: sock.shutdown(socket.SHUT_WR),
+                                         lambda sock=client: sock.shutdown(socket.SHUT_WR))
+            threading.Thread(target=self.pump, args=(client, up), daemon=True).start()
+            threading.Thread(target=self.pump, args=(server, down), daemon=True).start()
+
+    @staticmethod
+    def pump(source, link):
+        for frame in read_frames(source):
+            link.submit(frame)
+        link.close()
+
+    def serve_datagrams(self):
+        while not self.closed:
+            try:
+                data, address = self.listener.recvfrom(MAX_DATAGRAM)
+            except OSError:
+                return
+            up = self.sessions.get(address)
+            if up is None:
+                server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                server.connect(self.target)
+                up, down = self.create_links(server.send, lambda packet, address=address: self.listener.sendto(packet, address))
+                self.sessions[address] = up
+                threading.Thread(target=self.relay_replies, args=(server, down), daemon=True).start()
+            up.submit(data)
+
+    @staticmethod
+    def relay_replies(server, link):
+        while True:
+            try:
+                link.submit(server.recv(MAX_DATAGRAM))
+            except OSError:
+                return
+
+    def stats(self):
+        """Totais por sentido de todas as conexões atendidas"""
+        totals = {}
+        for direction, links in (("upstream", self.links[0::2]), ("downstream", self.links[1::2])):
+            totals[direction] = {key: sum(link.stats[key] for link in links)
+                                 for key in ("packets", "bytes", "dropped", "duplicated", "reordered")}
+        return totals
+
+    def close(self):
+        self.closed = True
+        self.listener.close()
+
+def add_impairment_arguments(parser):
+    """Opções do emulador comuns ao proxy avulso e aos benchmarks"""
+    parser.add_argument('--loss', type=float, default=0.0, help='Probabilidade de perda por pacote (padrão: 0)')
+    parser.add_argument('--delay', type=float, default=0.0, help='Atraso em cada sentido, em milissegundos (padrão: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variação uniforme do atraso (±), em milissegundos (padrão: 0)')
+    parser.add_argument('--reorder', type=float, default=0.0, help='Probabilidade de um pacote ser ultrapassado pelos seguintes (padrão: 0)')
+    parser.add_argument('--reorder-gap', type=float, default=10.0, help='Atraso extra dos pacotes reordenados, em milissegundos (padrão: 10)')
+    parser.add_argument('--duplicate', type=float, default=0.0, help='Probabilidade de duplicar um pacote (padrão: 0)')
+    parser.add_argument('--bandwidth', type=parse_size, default=None,
+                        help='Banda em bytes por segundo em cada sentido, aceita K/M/G (padrão: ilimitada)')
+    parser.add_argument('--seed', type=int, default=1, help='Semente dos sorteios (padrão: 1)')
+
+def impairment_from_args(args):
+    return Impairment(args.loss, args.delay / 1000, args.jitter / 1000, args.reorder, args.reorder_gap / 1000,
+                      args.duplicate, args.bandwidth)
+
+def main():
+    parser = argparse.ArgumentParser(description='Proxy com perda/atraso/reordenação/duplicação/banda entre cliente e servidor')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do proxy e do servidor (padrão: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=None, help='Porta do proxy (padrão: uma livre)')
+    parser.add_argument('--target-port', type=int, default=8080, help='Porta do servidor (padrão: 8080)')
+    parser.add_argument('--transport', type=str, default='tcp', choices=('tcp', 'udp'), help='Transporte (padrão: tcp)')
+    add_impairment_arguments(parser)
+    args = parser.parse_args()
+
+    port = args.port if args.port is not None else find_free_port(args.host)
+    proxy = ImpairmentProxy(args.host, args.target_port, impairment_from_args(args), seed=args.seed,
+                            transport=args.transport, port=port)
+    print(f"Proxy em {args.host}:{proxy.port} -> {args.host}:{args.target_port} ({args.transport.upper()})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        proxy.close()
+        print(proxy.stats(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import base64
+import string
+from functools import lru_cache
+
+from protocol import TEXT_ERRORS, SEQ_MASK
+
+try:
+    # Cifras autenticadas (AEAD) e troca de chaves, opcionais: pip install cryptography
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:
+    AESGCM = ChaCha20Poly1305 = None
+
+# Cifras de payload negociáveis (em ordem de preferência); "caesar" dispensa dependências
+AEAD_CIPHERS = {'aes-gcm': AESGCM, 'chacha20-poly1305': ChaCha20Poly1305} if AESGCM is not None else {}
+CIPHERS = (*AEAD_CIPHERS, 'caesar')
+
+AEAD_TAG_SIZE = 16     # Bytes da tag de autenticação acrescentados a cada payload
+AEAD_KEY_INFO = b'protocolo-transporte aead'
+RESUMPTION_LABEL = b'retomada' # Segredo guardado com o ticket de sessão para derivar a chave da próxima sessão
+
+@lru_cache(maxsize=None)
+def caesar_table(shift):
+    """Tabela de tradução da Cifra de César (apenas letras ASCII), calculada uma vez por deslocamento"""
+    shift %= 26
+    lower, upper = string.ascii_lowercase, string.ascii_uppercase
+    return str.maketrans(lower + upper, lower[shift:] + lower[:shift] + upper[shift:] + upper[:shift])
+
+def caesar_encrypt(text, shift):
+    """Criptografa texto usando Cifra de César"""
+    return text.translate(caesar_table(shift))
+
+def caesar_decrypt(text, shift):
+    """Descriptografa texto usando Cifra de César (desloca no sentido oposto)"""
+    return text.translate(caesar_table(-shift))
+
+def choose_cipher(offered):
+    """Escolhe a primeira cifra oferecida que também é suportada (César como fallback)"""
+    for cipher in offered:
+        if cipher in CIPHERS:
+            return cipher
+    return 'caesar'
+
+def derive_secret(secret, label, salt=None):
+    """Deriva 32 bytes de um segredo com HKDF-SHA256 (rótulos distintos geram chaves independentes)"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=AEAD_KEY_INFO + b' ' + label).derive(secret)
+
+def resume_session(resumption_secret, cipher, resume_nonce):
+    """Cifra de uma sessão retomada e o segredo do próximo ticket
+
+    O valor aleatório do cliente entra como salt: a chave é nova a cada retomada, e a sequência
+    recomeçar em 0 não repete nonces.
+    """
+    key = derive_secret(resumption_secret, cipher.encode('ascii'), resume_nonce)
+    return AeadCipher(cipher, key), derive_secret(resumption_secret, RESUMPTION_LABEL, resume_nonce)
+
+class AeadCipher:
+    """Cifra autenticada de um payload por pacote: fluxo e número de sequência formam o nonce e os dados associados"""
+
+    def __init__(self, name, key):
+        self.name = name
+        self.aead = AEAD_CIPHERS[name](key)
+
+    @staticmethod
+    def nonce(seq_num, stream_id):
+        # Chave nova a cada sessão e um (fluxo, sequência) por pacote: o nonce nunca se repete com outro conteúdo
+        return stream_id.to_bytes(4, 'big') + seq_num.to_bytes(8, 'big')
+
+    @staticmethod
+    def associated_data(seq_num, stream_id):
+        # O fluxo 0 (conexões sem multiplexação) autentica só o número de sequência, como vai no fio (32 bits);
+        # o nonce usa o contador completo
+        prefix = stream_id.to_bytes(4, 'big') if stream_id else b''
+        return prefix + (seq_num & SEQ_MASK).to_bytes(4, 'big')
+
+    def seal(self, seq_num, text, stream_id=0):
+        """Criptografa e autentica o payload; o resultado continua sendo texto (bytes como surrogates)"""
+        data = self.aead.encrypt(self.nonce(seq_num, stream_id), text.encode('utf-8', TEXT_ERRORS),
+                                 self.associated_data(seq_num, stream_id))
+        return data.decode('utf-8', TEXT_ERRORS)
+
+    def open(self, seq_num, text, stream_id=0):
+        """Verifica a tag e descriptografa; ValueError se o payload foi corrompido ou não pertence ao pacote"""
+        data = text.encode('utf-8', TEXT_ERRORS)
+        try:
+            plain = self.aead.decrypt(self.nonce(seq_num, stream_id), data, self.associated_data(seq_num, stream_id))
+        except InvalidTag:
+            raise ValueError(f"Tag de autenticação inválida no pacote {seq_num}") from None
+        return plain.decode('utf-8', TEXT_ERRORS)
+
+class KeyExchange:
+    """Troca de chaves X25519 efêmera no handshake; a chave da cifra sai do segredo comum via HKDF"""
+
+    def __init__(self):
+        self.private_key = X25519PrivateKey.generate()
+        self.resumption_secret = None  # Disponível após derive(), para o ticket de sessão
+
+    @property
+    def key_share(self):
+        """Chave pública (base64) enviada ao outro lado no handshake"""
+        public = self.private_key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return base64.b64encode(public).decode('ascii')
+
+    def derive(self, peer_key_share, cipher):
+        """Combina com a chave pública do outro lado e instancia a cifra negociada"""
+        peer = X25519PublicKey.from_public_bytes(base64.b64decode(peer_key_share))
+        shared = self.private_key.exchange(peer)
+        self.resumption_secret = derive_secret(shared, RESUMPTION_LABEL)
+        return AeadCipher(cipher, derive_secret(shared, cipher.encode('ascii')))
@@ -1,431 +1,1498 @@
+import io
+import os
+import sys
+import base64
 import socket
 import json
 import time
+import logging
 import argparse
-import datetime
-
-# Cliente com troca de mensagens
-
-# ===== CONFIGURAÇÕES DO CLIENTE (via CLI) =====
-parser = argparse.ArgumentParser(description='Cliente do Protocolo de Transporte Confiável')
-parser.add_argument('--host', type=str, default='localhost', help='Endereço do servidor (padrão: localhost)')
-parser.add_argument('--port', type=int, default=8080, help='Porta do servidor (padrão: 8080)')
-parser.add_argument('--max-message-size', type=int, default=100, help='Tamanho máximo da mensagem (padrão: 100)')
-parser.add_argument('--operation-mode', type=str, default='go_back_n', 
-                    choices=['go_back_n', 'selective_repeat'], 
-                    help='Modo de operação: go_back_n ou selective_repeat (padrão: go_back_n)')
-parser.add_argument('--timeout', type=float, default=5.0, help='Timeout em segundos (padrão: 5.0)')
-parser.add_argument('--text', type=str, 
-                    default="Olá mundo! Esta é uma mensagem de teste para o protocolo de transporte confiável.",
-                    help='Texto a ser enviado')
-parser.add_argument('--payload-size', type=int, default=4, 
-                    help='Tamanho do segmento/payload (padrão: 4, máximo: 4)')
-parser.add_argument('--enable-encryption', action='store_true',
-                    help='Ativar criptografia Cifra de César para payloads')
-parser.add_argument('--caesar-shift', type=int, default=1,
-                    help='Número de deslocamento para Cifra de César (padrão: 1)')
-parser.add_argument('--drop-packets', type=str, default='',
-                    help='Pacotes a perder (ex: "2,5,10" ou "2-5" para intervalo)')
-parser.add_argument('--corrupt-packets', type=str, default='',
-                    help='Pacotes a corromper (ex: "3,7" ou "3-7" para intervalo)')
-
-args = parser.parse_args()
-
-HOST = args.host
-PORT = args.port
-MAX_MESSAGE_SIZE = args.max_message_size
-OPERATION_MODE = args.operation_mode
-TIMEOUT_DURATION = args.timeout
-TEXT_TO_SEND = args.text
-PAYLOAD_SIZE = min(args.payload_size, 4)  # Garantir que não exceda 4
-ENABLE_ENCRYPTION = args.enable_encryption
-CAESAR_SHIFT = args.caesar_shift
-
-# Processar lista de pacotes para perder
-packets_to_drop = set()
-if args.drop_packets:
-    for item in args.drop_packets.split(','):
+from concurrent.futures import ThreadPoolExecutor
+
+from protocol import (encode_packet, decode_packet, parse_size, is_json_datagram, compute_checksum,
+                      FrameReader, FrameWriter, SequenceRing, unwrap_seq, STREAM_ID,
+                      PACKET_ENCODINGS, CHECKSUM_ALGORITHMS,
+                      DEFAULT_SEGMENT_SIZE, MAX_SEGMENT_SIZE, DEFAULT_MAX_MESSAGE_SIZE, BINARY_HEADER,
+                      TRANSPORTS, MAX_DATAGRAM_SIZE, UDP_IP_OVERHEAD, TEXT_ERRORS)
+from congestion import CONGESTION_CONTROLS, create_congestion_control
+from timers import RetransmissionTimers
+from ciphers import CIPHERS, AEAD_TAG_SIZE, KeyExchange, caesar_encrypt, resume_session
+from tickets import load_ticket, save_ticket, RESUME_NONCE_BYTES
+from compression import COMPRESSIONS, COMPRESSION_LEVELS, COMPRESSION_MODES, compressed_segments, default_level
+from logs import add_logging_arguments, configure_logging
+from metrics import MetricsRegistry
+
+# Cliente com troca de mensagens: Connection envia mensagens (uma por fluxo) em uma conexão já negociada;
+# a CLI (main) é uma camada fina sobre ela
+
+log = logging.getLogger('client')
+
+DEFAULT_TEXT = "Olá mundo! Esta é uma mensagem de teste para o protocolo de transporte confiável."
+HANDSHAKE_ATTEMPTS = 5    # Tentativas de handshake/encerramento sobre UDP (datagramas podem se perder)
+DEFAULT_PATH_MTU = 1500   # MTU assumido quando o sistema não informa o do caminho
+DEFAULT_STRIPES = 4       # Conexões paralelas de uma transferência em faixas
+# Segmento proposto por padrão: no UDP cabe em um datagrama de MTU 1500; no TCP poucos pacotes por mensagem
+DEFAULT_PAYLOAD_SIZES = {'tcp': 16 * 1024, 'udp': 1400}
+
+class TicketRejected(ConnectionError):
+    """O servidor recusou o ticket: os dados 0-RTT foram descartados e precisam ser reenviados"""
+
+def parse_packet_list(text):
+    """Números de pacote de "2,5,10" ou "2-5" (intervalo)"""
+    packets = set()
+    for item in text.split(','):
         item = item.strip()
+        if not item:
+            continue
         if '-' in item:
             # Intervalo (ex: "2-5")
             start, end = map(int, item.split('-'))
-            packets_to_drop.update(range(start, end + 1))
+            packets.update(range(start, end + 1))
         else:
             # Número único
-            packets_to_drop.add(int(item))
+            packets.add(int(item))
+    return packets
 
-# Processar lista de pacotes para corromper
-packets_to_corrupt = set()
-if args.corrupt_packets:
-    for item in args.corrupt_packets.split(','):
-        item = item.strip()
-        if '-' in item:
-            # Intervalo (ex: "3-7")
-            start, end = map(int, item.split('-'))
-            packets_to_corrupt.update(range(start, end + 1))
-        else:
-            # Número único
-            packets_to_corrupt.add(int(item))
-
-# Estatísticas de simulação
-simulation_stats = {
-    'packets_dropped': 0,
-    'packets_corrupted': 0,
-    'total_packets': 0
-}
-
-def send_message(socket, message):
-    """Envia uma mensagem com framing"""
-    json_data = json.dumps(message) # Converte dicionário para JSON
-    message_bytes = json_data.encode('utf-8') # Converte a stirng para bytes
-    socket.send(len(message_bytes).to_bytes(4, byteorder='big')) # Envia tamanho primeiro (4 bytes)
-    socket.send(message_bytes) # Envia a mensagem
-
-def receive_message(socket, timeout=None):
-    """Recebe uma mensagem com framing"""
-    if timeout is not None:
-        socket.settimeout(timeout)
-    
-    try:
-        size_data = socket.recv(4) # Recebe os 4 bytes do tamanho
-        if not size_data:
-            raise TimeoutError("Nenhum dado recebido")
-        
-        size = int.from_bytes(size_data, byteorder='big') # Converte para número
-        
-        message_data = b'' # Buffer para a mensagem (string de bytes)
-        while len(message_data) < size: # Recebe até completar o tamanho
-            chunk = socket.recv(size - len(message_data))
-            if not chunk:
-                raise TimeoutError("Conexão fechada durante recebimento")
-            message_data += chunk
-        
-        return json.loads(message_data.decode('utf-8')) # Converte de volta para dicionário
-    except (OSError, TimeoutError) as e:
-        if "timed out" in str(e).lower() or "timeout" in str(e).lower():
-            raise TimeoutError("Timeout ao receber mensagem")
-        raise
-
-def caesar_encrypt(text, shift):
-    """Criptografa texto usando Cifra de César"""
-    result = []
-    for char in text:
-        if char.isalpha():
-            # Determinar se é maiúscula ou minúscula
-            base = ord('A') if char.isupper() else ord('a')
-            # Aplicar deslocamento circular
-            shifted = (ord(char) - base + shift) % 26
-            result.append(chr(base + shifted))
+class ClientSettings:
+    """Parâmetros que o cliente propõe no handshake e usa na transferência (ValueError se inválidos)"""
+
+    def __init__(self, max_message_size=DEFAULT_MAX_MESSAGE_SIZE, operation_mode='go_back_n', timeout=1.0,
+                 min_rto=0.2, max_rto=60.0, payload_size=None, enable_encryption=False,
+                 cipher=CIPHERS[0], caesar_shift=1, drop_packets=(), corrupt_packets=(), ack_mode='cumulative',
+                 dup_threshold=3, congestion_control='reno', initial_cwnd=4, sack=True, tcp_nodelay=True,
+                 batch_sends=True, packet_encoding='binary', checksum=CHECKSUM_ALGORITHMS[0], transport='tcp',
+                 session_cache=None, compression=None, compression_level=None, compression_mode='stream'):
+        if payload_size is None:
+            payload_size = DEFAULT_PAYLOAD_SIZES[transport]
+        if payload_size > MAX_SEGMENT_SIZE:
+            raise ValueError(f"--payload-size não pode exceder {MAX_SEGMENT_SIZE}")
+        if transport == 'udp' and packet_encoding != 'binary':
+            raise ValueError("--transport udp requer --packet-encoding binary (o segmento é dimensionado em bytes pelo MTU)")
+        if initial_cwnd < 1:
+            raise ValueError("--initial-cwnd deve ser pelo menos 1")
+        if dup_threshold < 0:
+            raise ValueError("--dup-threshold não pode ser negativo")
+        if not 0 < min_rto <= max_rto:
+            raise ValueError("--min-rto deve ser positivo e não maior que --max-rto")
+        if compression is not None:
+            minimum, maximum, _ = COMPRESSION_LEVELS[compression]
+            if compression_level is None:
+                compression_level = default_level(compression)
+            elif not minimum <= compression_level <= maximum:
+                raise ValueError(f"--compression-level de {compression} deve estar entre {minimum} e {maximum}")
+        self.max_message_size = max_message_size
+        self.operation_mode = operation_mode
+        self.timeout = timeout                # RTO inicial, adaptado ao RTT medido
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.payload_size = payload_size      # Tamanho proposto; o valor final é negociado no handshake
+        self.enable_encryption = enable_encryption
+        self.cipher = cipher                  # Cifra preferida (César como fallback)
+        self.caesar_shift = caesar_shift
+        self.drop_packets = set(drop_packets)       # Simulação: pacotes de cada fluxo a perder
+        self.corrupt_packets = set(corrupt_packets) # ... e a corromper
+        self.ack_mode = ack_mode
+        self.dup_threshold = dup_threshold    # Indicações de lacuna que disparam a retransmissão rápida
+        self.congestion_control = congestion_control
+        self.initial_cwnd = initial_cwnd
+        self.sack = sack
+        self.tcp_nodelay = tcp_nodelay
+        self.batch_sends = batch_sends
+        self.packet_encoding = packet_encoding  # Codificação preferida dos pacotes de dados
+        self.checksum = checksum
+        self.transport = transport
+        self.session_cache = session_cache    # Arquivo de tickets de sessão (None: sem retomada)
+        self.compression = compression        # Algoritmo proposto (None: sem compressão)
+        self.compression_level = compression_level
+        self.compression_mode = compression_mode
+
+class ClientMetrics:
+    """Métricas da conexão, gravadas em --stats-json no mesmo formato do endpoint JSON do servidor"""
+
+    def __init__(self):
+        self.registry = registry = MetricsRegistry()
+        packets_sent = registry.counter('packets_sent_total', 'Pacotes enviados por tipo (inclui retransmissões)', ('type',))
+        self.bytes_sent = registry.counter('bytes_sent_total', 'Bytes de pacotes enviados (sem o prefixo de tamanho)')
+        self.packets_received = registry.counter('packets_received_total', 'Pacotes recebidos por tipo', ('type',))
+        self.bytes_received = registry.counter('bytes_received_total', 'Bytes de pacotes recebidos (sem o prefixo de tamanho)')
+        self.retransmissions = registry.counter('retransmissions_total',
+                                                'Retransmissões por causa: timeout, nack, fast, sack ou gbn_window (resto da janela no Go-Back-N)',
+                                                ('cause',))
+        self.duplicate_acks = registry.counter('duplicate_acks_total', 'ACKs de pacotes já confirmados')
+        self.rtt = registry.histogram('rtt_seconds', 'Amostras de RTT (sem pacotes retransmitidos, regra de Karn)')
+        self.rto = registry.histogram('rto_seconds', 'Timeout de retransmissão após cada amostra de RTT ou backoff')
+        self.cwnd = registry.series('congestion_window_packets', 'Janela de congestionamento ao longo do tempo')
+        self.rwnd = registry.series('receive_window_packets', 'Janela anunciada pelo receptor (soma dos fluxos ativos) ao longo do tempo')
+        # Instâncias por tipo resolvidas uma vez (sem busca de rótulos a cada pacote)
+        self.sent_by_type = {packet_type: packets_sent.labels(packet_type) for packet_type in ('handshake', 'data', 'fin')}
+        self.received_by_type = {packet_type: self.packets_received.labels(packet_type)
+                                 for packet_type in ('handshake_ack', 'ack', 'nack', 'fin', 'error')}
+
+class RtoEstimator:
+    """Timeout de retransmissão adaptativo (RFC 6298): SRTT/RTTVAR, limites e backoff exponencial"""
+
+    ALPHA = 1 / 8        # Peso de uma nova amostra no SRTT
+    BETA = 1 / 4         # Peso de uma nova amostra no RTTVAR
+    GRANULARITY = 0.001  # Menor variação considerada (resolução do relógio)
+
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backed_off_at = None
+        self.timeout = self.clamp(initial)
+
+    def clamp(self, value):
+        """Mantém o RTO entre os limites configurados"""
+        return min(max(value, self.minimum), self.maximum)
+
+    def sample(self, rtt):
+        """Atualiza SRTT/RTTVAR com uma amostra válida e recalcula o RTO (desfaz o backoff)"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
         else:
-            # Manter caracteres não-alfabéticos inalterados
-            result.append(char)
-    return ''.join(result)
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+        self.timeout = self.clamp(self.srtt + max(self.GRANULARITY, 4 * self.rttvar))
 
+    def reset_backoff(self):
+        """Dados novos confirmados: o caminho voltou a funcionar, desfazer o backoff acumulado"""
+        self.backed_off_at = None
+        if self.srtt is not None:
+            self.timeout = self.clamp(self.srtt + max(self.GRANULARITY, 4 * self.rttvar))
 
-def calculate_checksum(data):
-    """Calcula soma de verificação simples"""
-    return sum(ord(c) for c in data) % 256 # Soma valores ASCII e pega resto da divisão por 256
+    def backoff(self, now):
+        """Dobra o RTO após um timeout (uma vez por RTO: pacotes da mesma rajada expiram juntos)"""
+        if self.backed_off_at is not None and now - self.backed_off_at < self.timeout:
+            return False
+        self.backed_off_at = now
+        self.timeout = self.clamp(self.timeout * 2)
+        return True
+
+def open_input(path):
+    """Abre o arquivo (ou stdin) em modo texto preservando bytes que não são UTF-8 válido"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='surrogateescape', newline='')
+    return open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='')
+
+def read_segments(stream, segment_size, max_bytes=None):
+    """Lê a entrada sob demanda, um segmento por vez (memória limitada à janela)
+
+    Com max_bytes (UDP) o segmento é encurtado até caber no datagrama e o restante abre o próximo.
+    """
+    pending = ''
+    while True:
+        segment = pending + stream.read(segment_size - len(pending))
+        if not segment:
+            return
+        if max_bytes is not None:
+            encoded_size = len(segment.encode('utf-8', 'surrogateescape'))
+            cut = len(segment)
+            while encoded_size > max_bytes:
+                cut = max(1, cut * max_bytes // encoded_size) # Sempre menor que o corte anterior
+                encoded_size = len(segment[:cut].encode('utf-8', 'surrogateescape'))
+            segment, pending = segment[:cut], segment[cut:]
+        else:
+            pending = ''
+        yield segment
+
+def path_mtu(sock):
+    """MTU do caminho até o servidor (Linux informa via IP_MTU em um socket UDP conectado)"""
+    ip_mtu = getattr(socket, 'IP_MTU', 14 if sys.platform.startswith('linux') else None)
+    if ip_mtu is not None:
+        try:
+            return sock.getsockopt(socket.IPPROTO_IP, ip_mtu)
+        except OSError:
+            pass
+    return DEFAULT_PATH_MTU
 
 def create_data_packet(seq_num, payload, checksum):
     """Cria um pacote de dados"""
     return {
         "type": "data",      # Tipo da mensagem
         "seq_num": seq_num,  # Número de sequência
-        "payload": payload,  # Dados (4 caracteres)
+        "payload": payload,  # Dados (até o MSS negociado)
         "checksum": checksum # Soma de verificação
     }
 
-def get_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
-
-# Variáveis globais para timer e protocolo
-sent_packets = {}  # Armazenar pacotes enviados
-acknowledged_packets_global = set()  # Pacotes confirmados
-packet_send_times = {}  # Timestamp de quando cada pacote foi enviado (para timeout síncrono)
-
-def start_timer(seq_num):
-    """Registra timestamp de envio do pacote (para timeout síncrono)"""
-    packet_send_times[seq_num] = time.time()
-    print(f"\n[{get_timestamp()}] [TIMER] Timer iniciado para pacote {seq_num} ({TIMEOUT_DURATION}s)")
-
-def stop_timer(seq_num):
-    """Remove timestamp do pacote confirmado"""
-    if seq_num in packet_send_times:
-        del packet_send_times[seq_num]
-        print(f"[{get_timestamp()}] [TIMER] Timer cancelado para pacote {seq_num}\n")
-
-# Criar conexão com o servidor
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # Socket TCP
-s.connect((HOST, PORT)) # Conectar ao servidor
-
-def retransmit_packet(seq_num):
-    """Retransmite um pacote específico com checksum corrigido se necessário"""
-    if seq_num not in sent_packets or seq_num in acknowledged_packets_global:
-        return
-    
-    retry_packet = sent_packets[seq_num].copy()
-    if 'original_checksum' in retry_packet:
-        retry_packet['checksum'] = retry_packet['original_checksum']
-        print(f"[{get_timestamp()}] [RETRY] Retransmitindo pacote {seq_num} com checksum corrigido")
-    else:
-        payload_display = retry_packet.get('payload', 'encrypted')
-        print(f"[{get_timestamp()}] [RETRY] Retransmitindo pacote {seq_num}: '{payload_display}'\n")
-    
-    send_message(s, retry_packet)
-    packet_send_times[seq_num] = time.time()
-    start_timer(seq_num)
-
-print(f"Conectado ao servidor {HOST}:{PORT}")
-
-# Handshake - negociação inicial
-print("Iniciando handshake...")
-
-handshake_data = {
-    "type": "handshake",           # Tipo da mensagem
-    "max_message_size": MAX_MESSAGE_SIZE,      # Tamanho máximo da mensagem
-    "operation_mode": OPERATION_MODE,  # Modo de operação (go_back_n ou selective_repeat)
-    "encryption_enabled": ENABLE_ENCRYPTION  # Flag de criptografia
-}
-
-# Adicionar shift da Cifra de César se habilitada
-if ENABLE_ENCRYPTION:
-    print(f"[ENCRYPTION] Cifra de César ativada com deslocamento: {CAESAR_SHIFT}")
-    handshake_data["caesar_shift"] = CAESAR_SHIFT
-
-print(f"Enviando: {handshake_data}")
-send_message(s, handshake_data) # Enviar handshake
-
-# Handshake não precisa de timeout curto, usar timeout maior
-s.settimeout(10.0)  # Timeout maior para handshake
-response = receive_message(s) # Receber confirmação (ack do servidor)
-print(f"Resposta recebida: {response}")
-
-# Verificar se servidor confirmou criptografia
-if ENABLE_ENCRYPTION:
-    if response.get("encryption_enabled", False):
-        print(f"[ENCRYPTION] Criptografia confirmada pelo servidor (shift: {CAESAR_SHIFT})")
-    else:
-        print("[WARNING] Servidor não confirmou criptografia, desabilitando...")
-        ENABLE_ENCRYPTION = False
-
-print("Handshake concluído!")
-
-# Troca de mensagens - envio dos dados
-print("\n=== INICIANDO TROCA DE MENSAGENS ===")
-
-# Texto para enviar (dividido em segmentos de 4 caracteres)
-text_to_send = TEXT_TO_SEND
-print(f"Texto a ser enviado: {text_to_send}")
-print(f"Tamanho da mensagem: {len(text_to_send)} caracteres")
-
-# Verificar se a mensagem excede o limite máximo
-max_message_size = response["max_message_size"]
-if len(text_to_send) > max_message_size:
-    print(f"[WARNING] ATENÇÃO: Mensagem excede limite de {max_message_size} caracteres!")
-    print(f"[INFO] Tamanho atual: {len(text_to_send)} caracteres")
-    print(f"[INFO] Truncando mensagem para {max_message_size} caracteres...")
-    text_to_send = text_to_send[:max_message_size]
-    print(f"[INFO] Nova mensagem: {text_to_send}")
-    print(f"[INFO] Novo tamanho: {len(text_to_send)} caracteres")
-else:
-    print(f"[OK] Mensagem dentro do limite de {max_message_size} caracteres")
-
-# Dividir texto em segmentos de até 4 caracteres
-segments = [text_to_send[i:i+PAYLOAD_SIZE] for i in range(0, len(text_to_send), PAYLOAD_SIZE)]
-print(f"Segmentos criados: {segments}\n")
-
-# Implementar protocolo baseado no modo de operação
-window_size = response["window_size"]  # Tamanho da janela do servidor
-operation_mode = response["operation_mode"]  # Modo de operação
-sent_packets.clear()  # Limpar pacotes anteriores (variável global)
-acknowledged_packets_global.clear()  # Limpar pacotes confirmados (variável global)
-packet_send_times.clear()  # Limpar timestamps anteriores
-next_seq_to_send = 0                   # Próximo número de sequência a enviar
-base_seq = 0                          # Base da janela (primeiro não confirmado)
-
-if operation_mode == "go_back_n":
-    print(f"[GBN] Iniciando Go-Back-N com janela de tamanho: {window_size}")
-elif operation_mode == "selective_repeat":
-    print(f"[SR] Iniciando Selective Repeat com janela de tamanho: {window_size}")
-else:
-    print(f"[WARNING] Modo desconhecido: {operation_mode}, usando Go-Back-N")
-    operation_mode = "go_back_n"
-
-# Mostrar configuração de simulação se houver
-if packets_to_drop or packets_to_corrupt:
-    print(f"\n[SIMULATION] Simulação de erros ativada:")
-    if packets_to_drop:
-        print(f"  - Pacotes a perder: {sorted(packets_to_drop)}")
-    if packets_to_corrupt:
-        print(f"  - Pacotes a corromper: {sorted(packets_to_corrupt)}")
-    print()
-
-# Enviar pacotes dentro da janela
-while base_seq < len(segments):
-    # Enviar pacotes até preencher a janela
-    while next_seq_to_send < min(base_seq + window_size, len(segments)):
-        segment = segments[next_seq_to_send]
-        simulation_stats['total_packets'] += 1
-        
+class StreamSender:
+    """Uma mensagem em seu próprio fluxo: sequência, janela e retransmissões independentes
+
+    Sem multiplexação existe apenas o fluxo 0, sem marcador de fim (a mensagem termina com a conexão).
+    """
+
+    def __init__(self, connection, stream_id, segments, receive_window):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.segments = segments
+        self.receive_window = receive_window  # Janela anunciada pelo servidor (atualizada a cada ACK)
+        self.sent_packets = SequenceRing(receive_window)  # Pacotes enviados e ainda não confirmados (um por posição da janela)
+        self.acknowledged = set()        # Pacotes confirmados acima da base da janela
+        self.fast_retransmitted = set()  # Lacunas já retransmitidas sem aguardar timeout (SACK ou indicações duplicadas)
+        self.duplicate_indications = {}  # Indicações de perda por pacote (NACKs de lacuna ou ACKs de pacotes posteriores)
+        self.retransmitted = set()       # Pacotes retransmitidos: sem amostra de RTT (regra de Karn)
+        self.send_order = SequenceRing(receive_window)    # Ordem de envio na conexão de cada pacote em trânsito
+        self.next_seq = 0                # Próximo número de sequência a enviar
+        self.base_seq = 0                # Base da janela (primeiro não confirmado)
+        self.sent_size = 0               # Caracteres já lidos e colocados na janela
+        self.highest_individual_ack = -1 # Maior pacote confirmado individualmente (indica lacunas abaixo dele)
+        # Um segmento lido adiante: o último pacote do fluxo carrega o marcador de fim
+        self.lookahead = next(segments, None)
+        if self.lookahead is None and connection.multiplexed:
+            self.lookahead = ''  # Mensagem vazia: um pacote vazio só com o marcador de fim
+        self.input_exhausted = self.lookahead is None  # Todos os segmentos já foram lidos da entrada
+
+    @property
+    def done(self):
+        """Mensagem inteira enviada e confirmada"""
+        return self.input_exhausted and self.base_seq == self.next_seq
+
+    def can_send(self):
+        """Há segmento a enviar e espaço na janela anunciada pelo receptor (e no buffer de envio)"""
+        return (not self.input_exhausted
+                and self.next_seq < self.base_seq + min(self.receive_window, self.sent_packets.capacity))
+
+    def send_next(self):
+        """Envia o próximo segmento do fluxo; False se a entrada excedeu o limite negociado"""
+        connection = self.connection
+        segment = self.lookahead
+        self.lookahead = next(self.segments, None)
+        self.input_exhausted = self.lookahead is None
+        seq_num = self.next_seq
+        label = connection.packet_label(self.stream_id, seq_num)
+        self.sent_size += len(segment)
+        connection.stats['payload_chars'] += len(segment)
+        if self.sent_size > connection.max_message_size:
+            log.error("[ERROR] Entrada excede o limite negociado de %d caracteres - interrompendo envio", connection.max_message_size)
+            connection.closed = True
+            return False
+        connection.simulation_stats['total_packets'] += 1
+
+        # Criar pacote (criptografado se necessário; checksum do payload original)
+        packet = connection.build_data_packet(self.stream_id, seq_num, segment, connection.multiplexed and self.input_exhausted)
+        self.sent_packets.put(seq_num, packet)  # Armazenar pacote enviado (mesmo se perdido, para retransmitir)
+        self.send_order.put(seq_num, connection.transmissions)
+        connection.transmissions += 1
+        connection.packets_in_flight += 1
+        self.next_seq += 1
+
         # SIMULAÇÃO: Verificar se deve perder este pacote
-        if next_seq_to_send in packets_to_drop:
-            print(f"[SIMULATION] ⚠️  PERDA SIMULADA: Pacote {next_seq_to_send} não será enviado")
-            simulation_stats['packets_dropped'] += 1
-            # Não enviar o pacote, mas armazenar para possível retransmissão
-            # Criar o pacote normalmente para poder retransmitir depois
-            payload_to_send = caesar_encrypt(segment, CAESAR_SHIFT) if ENABLE_ENCRYPTION else segment
-            checksum = calculate_checksum(segment)
-            packet = create_data_packet(next_seq_to_send, payload_to_send, checksum)
-            if ENABLE_ENCRYPTION:
-                packet["encrypted"] = True
-            sent_packets[next_seq_to_send] = packet
-            start_timer(next_seq_to_send)
-            next_seq_to_send += 1
-            continue
-        
-        # Preparar payload (criptografar se necessário)
-        if ENABLE_ENCRYPTION:
-            payload_to_send = caesar_encrypt(segment, CAESAR_SHIFT)
-            print(f"[ENCRYPTION] Payload criptografado para pacote {next_seq_to_send}: '{segment}' -> '{payload_to_send}'")
+        if seq_num in connection.settings.drop_packets:
+            log.info("[SIMULATION] ⚠️  PERDA SIMULADA: Pacote %s não será enviado", label)
+            connection.simulation_stats['packets_dropped'] += 1
+            connection.start_timer(self.stream_id, seq_num)
+            return True
+
+        checksum = packet["checksum"]
+        if connection.encryption_enabled and connection.aead_cipher is None:
+            log.debug("[ENCRYPTION] Payload criptografado para pacote %s: %r -> %r", label, segment, packet['payload'])
+
+        # SIMULAÇÃO: Corromper o pacote se necessário
+        # Armazenar o original para retransmissão (se corrompido, retransmitir com checksum correto)
+        if seq_num in connection.settings.corrupt_packets:
+            if connection.aead_cipher is not None:
+                # Com AEAD a tag é a verificação de integridade: alterar o último byte do payload
+                sealed = packet['payload']
+                packet['original_payload'] = sealed
+                packet['payload'] = sealed[:-1] + chr(ord(sealed[-1]) ^ 1)
+                log.info("[SIMULATION] ⚠️  CORRUPÇÃO SIMULADA: Pacote %s com tag de autenticação inválida", label)
+            else:
+                packet['original_checksum'] = checksum
+                checksum ^= 1  # Corromper checksum (inverte o bit menos significativo)
+                packet['checksum'] = checksum
+                log.info("[SIMULATION] ⚠️  CORRUPÇÃO SIMULADA: Pacote %s com checksum incorreto (%d -> %d)",
+                         label, packet['original_checksum'], checksum)
+            connection.simulation_stats['packets_corrupted'] += 1
+
+        log.debug("[SEND] Enviando pacote %s: %r (checksum: %d)", label, segment, checksum)
+        connection.send_message(packet)
+        connection.stats['data_packets_sent'] += 1
+        connection.start_timer(self.stream_id, seq_num)  # Iniciar timer para este pacote
+        return True
+
+    def retransmit(self, seq_num, cause):
+        """Retransmite um pacote específico com checksum corrigido se necessário"""
+        packet = self.sent_packets.get(seq_num)
+        if packet is None or seq_num in self.acknowledged:
+            return
+        connection = self.connection
+        label = connection.packet_label(self.stream_id, seq_num)
+
+        retry_packet = packet.copy()
+        if 'original_checksum' in retry_packet or 'original_payload' in retry_packet:
+            retry_packet['checksum'] = retry_packet.pop('original_checksum', retry_packet['checksum'])
+            retry_packet['payload'] = retry_packet.pop('original_payload', retry_packet['payload'])
+            log.debug("[RETRY] Retransmitindo pacote %s com checksum corrigido", label)
+        else:
+            log.debug("[RETRY] Retransmitindo pacote %s: %r", label, retry_packet.get('payload', 'encrypted'))
+
+        connection.send_message(retry_packet)
+        connection.stats['retransmissions'] += 1
+        connection.metrics.retransmissions.labels(cause).inc()
+        self.retransmitted.add(seq_num)
+        connection.start_timer(self.stream_id, seq_num)
+
+    def retransmit_window(self, cause):
+        """Go-Back-N: reenvia todos os pacotes ainda não confirmados a partir da base"""
+        if self.connection.debug_logs:
+            log.debug("[GBN] Go-Back-N: Retransmitindo janela a partir de %s", self.connection.packet_label(self.stream_id, self.base_seq))
+        for i in range(self.base_seq, self.next_seq):
+            self.retransmit(i, cause if i == self.base_seq else 'gbn_window')
+
+    def sample_rtt(self, seq_num):
+        """Mede o RTT do pacote confirmado, exceto se foi retransmitido (ACK ambíguo)"""
+        connection = self.connection
+        sent_at = connection.timers.sent_time((self.stream_id, seq_num))
+        if sent_at is not None and seq_num not in self.retransmitted:
+            rtt = time.monotonic() - sent_at
+            connection.rto.sample(rtt)
+            connection.metrics.rtt.observe(rtt)
+            connection.metrics.rto.observe(connection.rto.timeout)
+
+    def acknowledge(self, seq_num):
+        """Marca o pacote como confirmado e cancela seu timer"""
+        self.connection.stop_timer(self.stream_id, seq_num)
+        self.acknowledged.add(seq_num)
+
+    def count_gap_indication(self, seq_num):
+        """Registra uma indicação de que seq_num se perdeu; True quando atinge o limite da retransmissão rápida"""
+        dup_threshold = self.connection.settings.dup_threshold
+        self.duplicate_indications[seq_num] = self.duplicate_indications.get(seq_num, 0) + 1
+        return (dup_threshold > 0 and self.duplicate_indications[seq_num] >= dup_threshold
+                and seq_num not in self.fast_retransmitted)
+
+    def signal_loss(self):
+        """Perda detectada sem timeout: reduz a janela de congestionamento uma vez por janela em trânsito"""
+        connection = self.connection
+        if self.send_order.get(self.base_seq, connection.transmissions) >= connection.recovery_point:
+            connection.congestion.on_loss(time.monotonic())
+            connection.recovery_point = connection.transmissions
+            connection.metrics.cwnd.record(connection.congestion.window)
+            log.info("[CWND] Perda detectada - janela de congestionamento: %d", connection.congestion.window)
+
+    def fast_retransmit(self, seq_num):
+        """Retransmite a lacuna sem aguardar o timeout (Go-Back-N reenvia a janela a partir dela)"""
+        connection = self.connection
+        self.signal_loss()
+        self.fast_retransmitted.add(seq_num)
+        connection.stats['fast_retransmits'] += 1
+        if connection.debug_logs:
+            log.debug("[FAST] %d indicações de perda do pacote %s - retransmitindo sem aguardar timeout",
+                      self.duplicate_indications.get(seq_num, 0), connection.packet_label(self.stream_id, seq_num))
+        if connection.operation_mode == "go_back_n":
+            for i in range(seq_num, self.next_seq):
+                self.retransmit(i, 'fast' if i == seq_num else 'gbn_window')
+        else:
+            self.retransmit(seq_num, 'fast')
+
+    def on_timeout(self, seq_num):
+        """Timer do pacote expirou: Go-Back-N reenvia a janela, Selective Repeat só o pacote"""
+        if self.connection.operation_mode == "go_back_n":
+            self.retransmit_window('timeout')
         else:
-            payload_to_send = segment
-        
-        # Calcular checksum do payload original (antes da criptografia)
-        checksum = calculate_checksum(segment)
-        original_checksum = checksum
-        
-        # SIMULAÇÃO: Corromper checksum se necessário
-        if next_seq_to_send in packets_to_corrupt:
-            checksum = (checksum + 1) % 256  # Corromper checksum
-            print(f"[SIMULATION] ⚠️  CORRUPÇÃO SIMULADA: Pacote {next_seq_to_send} com checksum incorreto ({original_checksum} -> {checksum})")
-            simulation_stats['packets_corrupted'] += 1
-        
-        # Criar pacote
-        packet = create_data_packet(next_seq_to_send, payload_to_send, checksum)
-        
-        # Armazenar checksum original para retransmissão (se corrompido, retransmitir com checksum correto)
-        if next_seq_to_send in packets_to_corrupt:
-            packet['original_checksum'] = original_checksum
-        
-        # Adicionar flag de criptografia no pacote
-        if ENABLE_ENCRYPTION:
+            self.retransmit(seq_num, 'timeout')
+
+    def handle_response(self, response):
+        """Processa um ACK/NACK do fluxo; devolve quantos pacotes a janela deslizou"""
+        connection = self.connection
+        stats = connection.stats
+        metrics = connection.metrics
+        debug_logs = connection.debug_logs
+        ack_seq = unwrap_seq(response["seq_num"], self.base_seq)  # No fio o número vai módulo 2^32
+        label = connection.packet_label(self.stream_id, ack_seq) if debug_logs else ack_seq
+        window_base_before = self.base_seq
+        flight_before = connection.packets_in_flight
+        if "window" in response and response["window"] != self.receive_window:
+            self.receive_window = response["window"]  # Controle de fluxo anunciado pelo servidor
+            metrics.rwnd.record(connection.advertised_window())
+
+        if response["type"] == "ack":
+            stats['acks_received'] += 1
+            if response.get("cumulative"):
+                log.debug("[ACK] ACK cumulativo recebido até pacote %s", label)
+                if ack_seq < self.base_seq:
+                    metrics.duplicate_acks.inc()
+                if self.base_seq <= ack_seq < self.next_seq:
+                    self.sample_rtt(ack_seq)
+                # Um único ACK confirma todo o intervalo [base_seq, ack_seq]
+                for seq in range(self.base_seq, min(ack_seq + 1, self.next_seq)):
+                    self.acknowledge(seq)
+            else:
+                if debug_logs:
+                    elapsed_time = time.monotonic() - (connection.timers.sent_time((self.stream_id, ack_seq)) or time.monotonic())
+                    log.debug("[ACK] ACK recebido para pacote %s (tempo decorrido: %.2fs)", label, elapsed_time)
+                if ack_seq < self.base_seq or ack_seq in self.acknowledged:
+                    metrics.duplicate_acks.inc()
+                self.sample_rtt(ack_seq)
+                # Marcar pacote como confirmado (ACKs atrasados de pacotes já deslizados são ignorados)
+                connection.stop_timer(self.stream_id, ack_seq)
+                if ack_seq >= self.base_seq:
+                    self.acknowledged.add(ack_seq)
+                    self.highest_individual_ack = max(self.highest_individual_ack, ack_seq)
+
+                # Selective Repeat sem SACK: ACK de um pacote posterior indica perda da base da janela
+                if self.base_seq < ack_seq < self.next_seq and self.base_seq not in self.acknowledged \
+                        and self.count_gap_indication(self.base_seq):
+                    self.fast_retransmit(self.base_seq)
+
+            # SACK: blocos recebidos fora de ordem são confirmados de uma vez
+            sack_blocks = response.get("sack")
+            if sack_blocks:
+                highest_sacked = self.base_seq
+                for start, end in sack_blocks:
+                    start, end = unwrap_seq(start, self.base_seq), unwrap_seq(end, self.base_seq)
+                    for seq in range(max(start, self.base_seq), min(end + 1, self.next_seq)):
+                        if seq not in self.acknowledged:
+                            self.acknowledge(seq)
+                    highest_sacked = max(highest_sacked, end)
+                log.debug("[SACK] Blocos confirmados: %s", sack_blocks)
+
+                # Lacunas abaixo do maior bloco foram perdidas: retransmitir já, uma vez por lacuna
+                for seq in range(self.base_seq, min(highest_sacked, self.next_seq)):
+                    if seq not in self.acknowledged and seq not in self.fast_retransmitted:
+                        if debug_logs:
+                            log.debug("[SACK] Lacuna no pacote %s - retransmitindo sem aguardar timeout",
+                                      connection.packet_label(self.stream_id, seq))
+                        self.signal_loss()
+                        self.fast_retransmitted.add(seq)
+                        stats['fast_retransmits'] += 1
+                        self.retransmit(seq, 'sack')
+
+            # Mover janela se base foi confirmada, liberando o estado dos pacotes confirmados
+            while self.base_seq in self.acknowledged:
+                base_seq = self.base_seq
+                self.acknowledged.discard(base_seq)
+                self.fast_retransmitted.discard(base_seq)
+                self.duplicate_indications.pop(base_seq, None)
+                self.retransmitted.discard(base_seq)
+                self.sent_packets.pop(base_seq, None)
+                self.send_order.pop(base_seq, None)
+                self.base_seq += 1
+            slid = self.base_seq - window_base_before
+            if slid:
+                connection.packets_in_flight -= slid
+                rto = connection.rto
+                congestion = connection.congestion
+                rto.reset_backoff()
+                # A janela de congestionamento só cresce quando era ela (e não o receptor) que limitava o envio
+                if flight_before >= congestion.window and congestion.window < connection.advertised_window():
+                    congestion.on_ack(slid, time.monotonic(), rto.srtt)
+                    metrics.cwnd.record(congestion.window)
+                if debug_logs:
+                    log.debug("[WINDOW] Janela movida. Base agora: %s (RTO: %.3fs, cwnd: %d, rwnd: %d)",
+                              connection.packet_label(self.stream_id, self.base_seq), rto.timeout, congestion.window, self.receive_window)
+
+                # Nova base é outra lacuna: ACKs já recebidos acima dela contam como indicações de perda
+                dup_threshold = connection.settings.dup_threshold
+                if self.highest_individual_ack > self.base_seq and dup_threshold > 0:
+                    acked_above = 0
+                    for seq in range(self.base_seq + 1, self.highest_individual_ack + 1):
+                        if seq in self.acknowledged:
+                            acked_above += 1
+                            if acked_above >= dup_threshold:
+                                break
+                    self.duplicate_indications[self.base_seq] = acked_above
+                    if acked_above >= dup_threshold and self.base_seq not in self.fast_retransmitted:
+                        self.fast_retransmit(self.base_seq)
+            return slid
+
+        if response["type"] == "nack" and response.get("gap"):
+            # Go-Back-N: o servidor descartou um pacote fora de ordem; ack_seq é o que ele espera
+            stats['gap_nacks_received'] += 1
+            log.debug("[NACK] Lacuna sinalizada no pacote %s", label)
+            if self.base_seq <= ack_seq < self.next_seq and self.count_gap_indication(ack_seq):
+                self.fast_retransmit(ack_seq)
+
+        elif response["type"] == "nack":
+            stats['nacks_received'] += 1
+            log.debug("[NACK] NACK recebido para pacote %s", label)
+
+            if connection.operation_mode == "go_back_n":
+                for i in range(self.base_seq, self.next_seq):
+                    connection.stop_timer(self.stream_id, i)
+                self.retransmit_window('nack')
+            elif connection.operation_mode == "selective_repeat":
+                log.debug("[SR] Selective Repeat: Retransmitindo apenas pacote %s", label)
+                self.retransmit(ack_seq, 'nack')
+        return 0
+
+class Connection:
+    """Conexão negociada com o servidor: cada envio é uma mensagem em seu próprio fluxo, até close()
+
+    O handshake acontece na criação; com multiplexação a mesma conexão serve a quantos envios forem
+    necessários (sem novo connect nem handshake). Não é thread-safe: um envio por vez.
+    """
+
+    def __init__(self, host='localhost', port=8080, settings=None, resume=True, stripe=None):
+        self.host = host
+        self.port = port
+        self.stripe = stripe          # Faixa de uma transferência em faixas declarada no handshake (ver send_striped)
+        self.settings = settings = settings if settings is not None else ClientSettings()
+        self.transport = settings.transport
+        self.debug_logs = log.isEnabledFor(logging.DEBUG)  # Logs por pacote: sem eles nem os rótulos são montados
+        self.encryption_enabled = settings.enable_encryption
+        self.cipher = None            # Cifra confirmada pelo servidor
+        self.aead_cipher = None       # Cifra autenticada com a chave derivada no handshake (None: César)
+        self.resumption_secret = None # Segredo da cifra guardado com o ticket para a próxima sessão
+        self.resumption_pending = False # Dados 0-RTT enviados e a confirmação do ticket ainda não chegou
+        self.packet_encoding = 'json' # Handshake sempre em JSON; atualizado com o valor negociado
+        self.checksum_algorithm = 'sum' # Soma original até o servidor confirmar outro algoritmo
+        self.compression = None       # Compressão confirmada pelo servidor
+        self.compression_mode = None
+
+        # Estatísticas de simulação
+        self.simulation_stats = {
+            'packets_dropped': 0,
+            'packets_corrupted': 0,
+            'total_packets': 0
+        }
+
+        # Estatísticas da transferência (pacotes e chamadas de sistema no socket), acumuladas entre envios
+        self.stats = {
+            'payload_chars': 0,
+            'data_packets_sent': 0,
+            'retransmissions': 0,
+            'acks_received': 0,
+            'nacks_received': 0,
+            'gap_nacks_received': 0,
+            'fast_retransmits': 0,
+            'timeouts': 0,
+            'rtt_samples': 0,
+            'srtt_s': None,
+            'rto_s': 0.0,
+            'congestion_control': settings.congestion_control,
+            'cwnd': None,
+            'max_cwnd': None,
+            'ssthresh': None,
+            'congestion_events': 0,
+            'receive_window': None,
+            'send_calls': 0,
+            'recv_calls': 0,
+            'elapsed_s': 0.0,
+            'transport': settings.transport,
+            'checksum_algorithm': None,
+            'cipher': None,
+            'streams': 0,
+            'resumed': False,
+            'handshake_s': 0.0,
+            'first_ack_s': None,
+            'compression': None,
+            'uncompressed_bytes': 0,  # Entrada lida antes da compressão
+            'compressed_bytes': 0     # ... e os payloads resultantes
+        }
+        self.metrics = ClientMetrics()
+
+        # Timer e protocolo (compartilhados por todos os fluxos da conexão)
+        self.frame_writer = FrameWriter()  # Quadros TCP acumulados até a próxima espera por resposta
+        self.frame_reader = FrameReader()  # Bytes recebidos ainda não processados (um quadro incompleto sobrevive a um timeout)
+        self.timers = RetransmissionTimers()  # Timers de retransmissão dos pacotes em trânsito, por (fluxo, seq)
+        self.rto = RtoEstimator(settings.timeout, settings.min_rto, settings.max_rto)
+        self.congestion = create_congestion_control(settings.congestion_control, settings.initial_cwnd)
+        self.recovery_point = 0      # Perdas de envios anteriores a este pertencem ao mesmo evento de congestionamento
+        self.transmissions = 0       # Pacotes novos enviados em todos os fluxos (ordem de envio na conexão)
+        self.packets_in_flight = 0   # Pacotes enviados e ainda não confirmados em todos os fluxos
+        self.multiplexed = False     # Servidor aceitou várias mensagens (fluxos) nesta conexão
+        self.closed = False          # Servidor encerrou a conexão ou reportou erro
+        self.active_streams = []     # Fluxos com dados a enviar ou pacotes em trânsito
+        self.streams = {}            # Fluxos em andamento, por identificador
+        self.next_stream_id = 0      # Identificador do próximo fluxo (nunca reutilizado na conexão)
+        self.input_streams = []      # Arquivos abertos pelo envio em andamento
+        self.socket = None
+        self.connect(resume)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def reusable(self):
+        """Aceita outro envio: aberta, multiplexada e sem fluxos em andamento"""
+        return self.socket is not None and not self.closed and self.multiplexed and not self.active_streams
+
+    def calculate_checksum(self, data):
+        """Calcula a soma de verificação no algoritmo negociado"""
+        return compute_checksum(data, self.checksum_algorithm)
+
+    def send_message(self, message):
+        """Envia uma mensagem com framing"""
+        message_bytes = encode_packet(message, self.packet_encoding) # Serializa na codificação negociada
+        self.metrics.sent_by_type[message["type"]].inc()
+        self.metrics.bytes_sent.inc(len(message_bytes))
+        if self.transport == 'udp':
+            self.socket.send(message_bytes) # Um pacote por datagrama, sem prefixo de tamanho
+            self.stats['send_calls'] += 1
+            return
+        if self.settings.batch_sends:
+            self.frame_writer.add(message_bytes) # Sai junto com o restante da rajada antes de aguardar resposta
+            return
+        self.socket.sendall(len(message_bytes).to_bytes(4, byteorder='big')) # Envia tamanho primeiro (4 bytes)
+        self.socket.sendall(message_bytes) # Envia a mensagem
+        self.stats['send_calls'] += 2
+
+    def flush_sends(self):
+        """Envia de uma vez os quadros acumulados (a rajada da janela e as retransmissões)"""
+        calls = self.frame_writer.calls
+        try:
+            self.frame_writer.flush(self.socket)
+        finally:
+            self.stats['send_calls'] += self.frame_writer.calls - calls
+
+    def receive_message(self, timeout=None):
+        """Recebe uma mensagem com framing"""
+        sock = self.socket
+        if timeout is not None:
+            sock.settimeout(timeout)
+
+        try:
+            self.flush_sends() # Tudo que foi enfileirado precisa sair antes de esperar a resposta
+            while self.transport == 'udp':
+                data = sock.recv(MAX_DATAGRAM_SIZE)
+                self.stats['recv_calls'] += 1
+                try:
+                    message = decode_packet(data, 'json' if is_json_datagram(data) else self.packet_encoding)
+                except ValueError:
+                    continue # Datagrama inválido: tratado como perda
+                self.count_received(message, len(data))
+                if message["type"] == "handshake_ack" and self.packet_encoding != 'json' and not self.resumption_pending:
+                    continue # Resposta repetida de um handshake reenviado
+                return message
+
+            while True:
+                # Quadro completo já no buffer: tamanho (4 bytes) seguido da mensagem
+                message_data = self.frame_reader.next_frame()
+                if message_data is not None:
+                    # Com ticket, a resposta ao handshake (sempre JSON) chega antes de qualquer ACK
+                    message = decode_packet(message_data, 'json' if self.resumption_pending else self.packet_encoding) # Converte de volta para dicionário
+                    self.count_received(message, len(message_data))
+                    return message
+
+                received = self.frame_reader.read_from(sock) # Lê o que houver disponível (vários quadros de uma vez)
+                self.stats['recv_calls'] += 1
+                if not received:
+                    raise ConnectionError("Conexão fechada pelo servidor")
+        except (OSError, TimeoutError) as e:
+            if "timed out" in str(e).lower() or "timeout" in str(e).lower():
+                raise TimeoutError("Timeout ao receber mensagem")
+            raise
+
+    def count_received(self, message, size):
+        """Contabiliza um pacote recebido nas métricas"""
+        counter = self.metrics.received_by_type.get(message["type"])
+        (counter if counter is not None else self.metrics.packets_received.labels(message["type"])).inc()
+        self.metrics.bytes_received.inc(size)
+
+    def build_data_packet(self, stream_id, seq_num, segment, end=False):
+        """Criptografa o segmento (se negociado) e calcula o checksum do payload original"""
+        if self.aead_cipher is not None:
+            # A tag de autenticação substitui o checksum
+            packet = create_data_packet(seq_num, self.aead_cipher.seal(seq_num, segment, stream_id), 0)
+            packet["encrypted"] = True
+        elif self.encryption_enabled:
+            packet = create_data_packet(seq_num, caesar_encrypt(segment, self.settings.caesar_shift), self.calculate_checksum(segment))
             packet["encrypted"] = True
-        
-        print(f"\n[{get_timestamp()}] [SEND] Enviando pacote {next_seq_to_send}: '{segment}' (checksum: {checksum})")
-        send_message(s, packet)
-        
-        # Armazenar pacote enviado
-        sent_packets[next_seq_to_send] = packet
-        # Iniciar timer para este pacote
-        start_timer(next_seq_to_send)
-        
-        next_seq_to_send += 1
-    
-    # Aguardar ACKs até janela estar confirmada ou timeout
-    while base_seq < next_seq_to_send:
-        # Verificar se algum pacote expirou (timeout síncrono baseado em timestamp)
-        current_time = time.time()
-        timeout_occurred = False
-        unacknowledged_packets = [i for i in range(base_seq, next_seq_to_send) 
-                                  if i not in acknowledged_packets_global]
-        
-        # Verificar se algum pacote já expirou
-        for seq in unacknowledged_packets:
-            if seq in packet_send_times:
-                elapsed = current_time - packet_send_times[seq]
-                # Se passou TIMEOUT_DURATION segundos e ainda não foi confirmado
-                if elapsed >= TIMEOUT_DURATION:
-                    timeout_occurred = True
-                    print(f"\n[{get_timestamp()}] [TIMEOUT] Timeout para pacote {seq} após {elapsed:.2f}s (esperado: {TIMEOUT_DURATION}s) - retransmitindo...")
-                    
-                    if operation_mode == "go_back_n":
-                        print(f"[{get_timestamp()}] [GBN] Go-Back-N: Retransmitindo janela a partir de {base_seq}\n")
-                        for i in range(base_seq, next_seq_to_send):
-                            if i not in acknowledged_packets_global:
-                                retransmit_packet(i)
-                    else:
-                        retransmit_packet(seq)
-                    break  # Processar um timeout por vez
-        
-        if timeout_occurred:
-            continue  # Re-avaliar o loop após retransmissão
-        
-        # Calcular timeout restante para o próximo pacote que pode expirar
-        min_timeout = TIMEOUT_DURATION
-        earliest_packet = None
-        for seq in unacknowledged_packets:
-            if seq in packet_send_times:
-                elapsed = current_time - packet_send_times[seq]
-                remaining = TIMEOUT_DURATION - elapsed
-                if remaining > 0 and remaining < min_timeout:
-                    min_timeout = remaining
-                    earliest_packet = seq
-        
-        # Se não há pacotes aguardando ou todos já expiraram, aguardar o timeout completo
-        if min_timeout >= TIMEOUT_DURATION or earliest_packet is None:
-            # Todos os pacotes já expiraram ou não há pacotes - aguardar timeout completo
-            socket_timeout = TIMEOUT_DURATION
-            print(f"\n[{get_timestamp()}] [TIMER] Aguardando {socket_timeout}s para timeout...")
         else:
-            # Aguardar até o próximo timeout possível
-            socket_timeout = max(0.1, min_timeout)
-            elapsed_for_packet = current_time - packet_send_times[earliest_packet]
-            print(f"\n[{get_timestamp()}] [TIMER] Aguardando {socket_timeout:.2f}s até possível timeout do pacote {earliest_packet} (já decorridos {elapsed_for_packet:.2f}s de {TIMEOUT_DURATION}s)...")
-        
-        # Aguardar resposta com timeout calculado (realmente aguarda o tempo)
+            packet = create_data_packet(seq_num, segment, self.calculate_checksum(segment))
+        if stream_id:
+            packet["stream"] = stream_id  # Fluxo 0 (padrão) não é identificado no pacote
+        if end:
+            packet["end"] = True  # Último pacote da mensagem do fluxo
+        return packet
+
+    def start_timer(self, stream_id, seq_num):
+        """Arma o timer de retransmissão do pacote"""
+        self.timers.arm((stream_id, seq_num), time.monotonic())
+        if self.debug_logs:
+            log.debug("[TIMER] Timer iniciado para pacote %s (%.3fs)", self.packet_label(stream_id, seq_num), self.rto.timeout)
+
+    def stop_timer(self, stream_id, seq_num):
+        """Cancela o timer do pacote confirmado"""
+        if self.timers.cancel((stream_id, seq_num)) and self.debug_logs:
+            log.debug("[TIMER] Timer cancelado para pacote %s", self.packet_label(stream_id, seq_num))
+
+    def packet_label(self, stream_id, seq_num):
+        """Identificação do pacote nos logs ("fluxo:seq" quando há multiplexação)"""
+        return f"{stream_id}:{seq_num}" if self.multiplexed else str(seq_num)
+
+    def advertised_window(self):
+        """Soma das janelas anunciadas pelo receptor para os fluxos ativos"""
+        return sum(stream.receive_window for stream in self.active_streams)
+
+    def store_ticket(self, response):
+        """Guarda o ticket emitido pelo servidor para a próxima conexão retomar a sessão (ou descarta o usado)"""
+        session_cache = self.settings.session_cache
+        if not session_cache:
+            return
+        entry = None
+        if "ticket" in response:
+            params = {key: value for key, value in response.items()
+                      if key not in ("ticket", "ticket_lifetime", "key_share", "resumed")}
+            entry = {"ticket": response["ticket"], "expires": time.time() + response["ticket_lifetime"],
+                     "request": self.ticket_request, "response": params}
+            if self.resumption_secret is not None:
+                entry["resumption_secret"] = base64.b64encode(self.resumption_secret).decode('ascii')
+            log.info("[TICKET] Ticket de sessão guardado em %s (válido por %.0fs)", session_cache, response['ticket_lifetime'])
+        if entry is not None or self.session_ticket is not None:
+            save_ticket(session_cache, self.host, self.port, entry)
+
+    def confirm_resumption(self, response):
+        """Resposta ao handshake com ticket: guarda o novo ticket ou, se recusado, encerra com TicketRejected"""
+        self.resumption_pending = False
+        log.debug("Resposta recebida: %s", response)
+        if response.get("status") == "success" and response.get("resumed"):
+            log.info("[TICKET] Retomada confirmada pelo servidor")
+            self.stats['resumed'] = True
+            self.store_ticket(response)
+            return
+        # Os dados 0-RTT foram descartados: quem enviou repete com handshake completo (o ticket é apagado)
+        log.warning("[TICKET] Ticket recusado: %s - repetindo com handshake completo", response.get('reason', 'motivo desconhecido'))
+        save_ticket(self.settings.session_cache, self.host, self.port, None)
+        self.abort()
+        raise TicketRejected(f"Ticket recusado: {response.get('reason', 'motivo desconhecido')}")
+
+    def connect(self, resume):
+        """Abre o socket e negocia a sessão (com ticket, os dados seguem sem aguardar a resposta)"""
+        settings = self.settings
+        self.connect_start = time.time()
+
+        # Criar conexão com o servidor
+        if self.transport == 'udp':
+            self.socket = s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # Socket UDP
+            s.connect((self.host, self.port)) # Fixar o servidor como destino (e receber só dele)
+            # Cada pacote precisa caber em um datagrama sem fragmentação
+            self.datagram_payload = min(path_mtu(s), MAX_DATAGRAM_SIZE + UDP_IP_OVERHEAD) - UDP_IP_OVERHEAD - BINARY_HEADER.size
+        else:
+            self.socket = s = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # Socket TCP
+            try:
+                s.connect((self.host, self.port)) # Conectar ao servidor
+            except OSError:
+                s.close()
+                raise
+            if settings.tcp_nodelay:
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Sem Nagle: ACKs atrasados não podem segurar pacotes
+            self.datagram_payload = None
+        log.info("Conectado ao servidor %s:%s", self.host, self.port)
+        try:
+            self.handshake(resume)
+        except BaseException:
+            self.abort()
+            raise
+
+    def handshake(self, resume):
+        """Handshake - negociação inicial"""
+        settings = self.settings
+        log.info("Iniciando handshake...")
+
+        self.handshake_data = handshake_data = {
+            "type": "handshake",           # Tipo da mensagem
+            "max_message_size": settings.max_message_size,      # Tamanho máximo da mensagem
+            "max_segment_size": settings.payload_size,          # Tamanho de segmento (MSS) proposto
+            "operation_mode": settings.operation_mode,  # Modo de operação (go_back_n ou selective_repeat)
+            "encryption_enabled": self.encryption_enabled,  # Flag de criptografia
+            # Codificações aceitas para os pacotes seguintes (preferida primeiro, JSON como fallback)
+            "packet_encodings": ['binary'] if self.transport == 'udp' else list(dict.fromkeys([settings.packet_encoding, 'json'])),
+            "cumulative_ack": settings.ack_mode == 'cumulative',  # Aceita ACKs cumulativos/atrasados
+            "sack": settings.sack,  # Aceita blocos SACK (Selective Repeat)
+            # Algoritmos de integridade aceitos (preferido primeiro, soma original como fallback)
+            "checksum_algorithms": list(dict.fromkeys([settings.checksum, 'sum'])),
+            "gap_nack": settings.dup_threshold > 0,  # Aceita NACKs de lacuna (Go-Back-N)
+            "streams": True  # Aceita várias mensagens na conexão, uma por fluxo com marcador de fim
+        }
+
+        # Compressão proposta: o servidor só aceita com a codificação binária
+        if settings.compression is not None:
+            handshake_data["compressions"] = [settings.compression]
+            handshake_data["compression_mode"] = settings.compression_mode
+
+        # Adicionar cifras aceitas e shift da Cifra de César (fallback) se habilitada
+        key_exchange = None
+        if self.encryption_enabled:
+            handshake_data["ciphers"] = list(dict.fromkeys([settings.cipher, 'caesar']))
+            handshake_data["caesar_shift"] = settings.caesar_shift
+
+        # Ticket de uma sessão anterior com os mesmos parâmetros: retomar e enviar dados junto com o handshake
+        # (resume=False quando a entrada não pode ser reenviada caso o servidor recuse o ticket)
+        self.ticket_request = {**handshake_data, "transport": self.transport}
+        self.session_ticket = session_ticket = None
+        if self.stripe is not None:
+            # Conexão dedicada a uma faixa: sem retomada (o ticket seria de outra negociação)
+            handshake_data["stripe"] = self.stripe
+        elif settings.session_cache and resume:
+            self.session_ticket = session_ticket = load_ticket(settings.session_cache, self.host, self.port, self.ticket_request)
+        resume_nonce = None
+        if session_ticket is not None:
+            resume_nonce = os.urandom(RESUME_NONCE_BYTES)
+            handshake_data["ticket"] = session_ticket["ticket"]
+            handshake_data["resume_nonce"] = base64.b64encode(resume_nonce).decode('ascii')
+            log.info("[TICKET] Retomando sessão com ticket: dados enviados sem aguardar a resposta do handshake (0-RTT)")
+        elif self.encryption_enabled:
+            if settings.cipher != 'caesar':
+                # Chave pública efêmera: a chave da cifra é derivada com a do servidor, sem trafegar
+                key_exchange = KeyExchange()
+                handshake_data["key_share"] = key_exchange.key_share
+                log.info("[ENCRYPTION] Cifra %s oferecida (fallback: César com deslocamento %d)", settings.cipher, settings.caesar_shift)
+            else:
+                log.info("[ENCRYPTION] Cifra de César ativada com deslocamento: %d", settings.caesar_shift)
+
+        log.debug("Enviando: %s", handshake_data)
+        if session_ticket is not None:
+            # Parâmetros do ticket: a confirmação do servidor é tratada quando chegar, junto com os ACKs
+            self.send_message(handshake_data) # Sai na mesma rajada que os primeiros pacotes de dados
+            response = session_ticket["response"]
+            self.resumption_pending = True
+        elif self.transport == 'udp':
+            # Datagramas podem se perder: reenviar o handshake com backoff até a resposta chegar
+            attempt_timeout = self.rto.timeout
+            for attempt in range(HANDSHAKE_ATTEMPTS):
+                self.send_message(handshake_data) # Enviar handshake
+                try:
+                    response = self.receive_message(timeout=attempt_timeout) # Receber confirmação
+                    break
+                except TimeoutError:
+                    log.warning("[UDP] Sem resposta ao handshake em %.1fs - reenviando", attempt_timeout)
+                    attempt_timeout *= 2
+            else:
+                raise ConnectionError(f"Servidor não respondeu ao handshake após {HANDSHAKE_ATTEMPTS} tentativas")
+        else:
+            self.send_message(handshake_data) # Enviar handshake
+
+            # Handshake não precisa de timeout curto, usar timeout maior
+            self.socket.settimeout(10.0)  # Timeout maior para handshake
+            response = self.receive_message() # Receber confirmação (ack do servidor)
+        self.stats['handshake_s'] = time.time() - self.connect_start
+        log.debug("Resposta recebida: %s", response)
+
+        if response.get("status") != "success":
+            raise ConnectionError(f"Servidor recusou o handshake: {response.get('reason', 'motivo desconhecido')}")
+        if self.stripe is not None and not response.get("stripe"):
+            raise ConnectionError("Servidor não aceita transferência em faixas")
+
+        # Verificar se servidor confirmou criptografia
+        if self.encryption_enabled:
+            if response.get("encryption_enabled", False):
+                # Servidores antigos não informam a cifra: César
+                self.cipher = response.get("cipher", "caesar")
+                if self.cipher != 'caesar' and session_ticket is not None:
+                    secret = base64.b64decode(session_ticket["resumption_secret"])
+                    self.aead_cipher, self.resumption_secret = resume_session(secret, self.cipher, resume_nonce)
+                    log.info("[ENCRYPTION] Criptografia retomada do ticket (%s, chave nova derivada do segredo da sessão anterior)", self.cipher)
+                elif self.cipher != 'caesar' and key_exchange is not None and "key_share" in response:
+                    self.aead_cipher = key_exchange.derive(response["key_share"], self.cipher)
+                    self.resumption_secret = key_exchange.resumption_secret
+                    log.info("[ENCRYPTION] Criptografia confirmada pelo servidor (%s, chave derivada no handshake)", self.cipher)
+                else:
+                    self.cipher = 'caesar'
+                    log.info("[ENCRYPTION] Criptografia confirmada pelo servidor (shift: %d)", settings.caesar_shift)
+            else:
+                log.warning("[WARNING] Servidor não confirmou criptografia, desabilitando...")
+                self.encryption_enabled = False
+
+        # Servidores antigos não informam a codificação: manter JSON
+        self.packet_encoding = response.get("packet_encoding", "json")
+        log.info("[ENCODING] Codificação dos pacotes: %s", self.packet_encoding)
+        # Servidores antigos não informam o algoritmo: manter a soma original
+        self.checksum_algorithm = response.get("checksum_algorithm", "sum")
+        log.info("[CHECKSUM] Algoritmo de integridade: %s", self.checksum_algorithm)
+        if response.get("cumulative_ack", False):
+            log.info("[ACK] Servidor usará ACKs cumulativos")
+        if response.get("sack", False):
+            log.info("[SACK] Servidor informará blocos recebidos fora de ordem")
+        if response.get("gap_nack", False):
+            log.info("[FAST] Servidor sinalizará lacunas (retransmissão rápida após %d indicações)", settings.dup_threshold)
+
+        # Compressão confirmada pelo servidor (antigos não informam: sem compressão)
+        self.compression = response.get("compression")
+        if self.compression is not None:
+            self.compression_mode = response.get("compression_mode", 'stream')
+            log.info("[COMPRESSION] Payloads comprimidos com %s nível %d (modo %s)", self.compression, settings.compression_level, self.compression_mode)
+        elif settings.compression is not None:
+            log.warning("[WARNING] Servidor não aceitou compressão (requer codificação binária) - enviando sem compressão")
+
+        if session_ticket is None:
+            self.store_ticket(response)
+        log.info("Handshake concluído!")
+
+        # Troca de mensagens - envio dos dados
+        log.info("\n=== INICIANDO TROCA DE MENSAGENS ===")
+
+        self.max_message_size = response["max_message_size"]
+
+        # Servidores antigos não multiplexam: uma única mensagem por conexão
+        self.multiplexed = response.get("streams", False)
+        self.max_streams = response.get("max_streams", 1) if self.multiplexed else 1
+        if self.multiplexed:
+            log.info("[STREAM] Servidor aceita até %d fluxos simultâneos nesta conexão", self.max_streams)
+
+        # Servidores antigos não informam o MSS: usar o segmento original de 4 caracteres
+        self.segment_size = min(settings.payload_size, response.get("max_segment_size", DEFAULT_SEGMENT_SIZE))
+        if self.datagram_payload is not None:
+            if self.aead_cipher is not None:
+                self.datagram_payload -= AEAD_TAG_SIZE  # A tag de autenticação ocupa parte do datagrama
+            if self.multiplexed:
+                self.datagram_payload -= STREAM_ID.size  # Identificador do fluxo após o cabeçalho
+            # UDP: o segmento também não pode passar do MTU do caminho (limite em bytes, após codificação)
+            self.segment_size = min(self.segment_size, self.datagram_payload)
+            log.info("[UDP] MTU do caminho: %d bytes - até %d bytes de payload por datagrama", path_mtu(self.socket), self.datagram_payload)
+        log.info("[OK] Tamanho do segmento negociado: %d caracteres", self.segment_size)
+
+        # Implementar protocolo baseado no modo de operação
+        self.window_size = response["window_size"]  # Janela anunciada pelo servidor (por fluxo)
+        self.operation_mode = response["operation_mode"]  # Modo de operação
+        if self.operation_mode == "go_back_n":
+            log.info("[GBN] Iniciando Go-Back-N com janela de tamanho: %d", self.window_size)
+        elif self.operation_mode == "selective_repeat":
+            log.info("[SR] Iniciando Selective Repeat com janela de tamanho: %d", self.window_size)
+        else:
+            log.warning("[WARNING] Modo desconhecido: %s, usando Go-Back-N", self.operation_mode)
+            self.operation_mode = "go_back_n"
+        log.info("[CWND] Controle de congestionamento: %s (janela inicial: %d)", settings.congestion_control, self.congestion.window)
+
+        self.stats['checksum_algorithm'] = self.checksum_algorithm
+        self.stats['cipher'] = self.cipher
+        self.stats['compression'] = self.compression
+
+    def message_segments(self, kind, value):
+        """Segmentos de uma mensagem: arquivo lido sob demanda ou texto dividido de uma vez"""
+        settings = self.settings
+        if kind == 'file':
+            # Streaming: segmentos lidos sob demanda conforme a janela avança
+            self.input_streams.append(open_input(value))
+            log.info("Arquivo a ser enviado: %s", 'stdin' if value == '-' else value)
+            if self.compression is not None:
+                return compressed_segments(self.input_streams[-1], self.segment_size, self.datagram_payload, self.compression,
+                                           settings.compression_level, self.compression_mode, self.stats)
+            return read_segments(self.input_streams[-1], self.segment_size, self.datagram_payload)
+        # Texto para enviar (dividido em segmentos do tamanho negociado)
+        log.info("Texto a ser enviado: %s", value)
+        log.info("Tamanho da mensagem: %d caracteres", len(value))
+        if self.compression is not None:
+            return compressed_segments(io.StringIO(value, newline=''), self.segment_size, self.datagram_payload, self.compression,
+                                       settings.compression_level, self.compression_mode, self.stats)
+        segment_list = list(read_segments(io.StringIO(value, newline=''), self.segment_size, self.datagram_payload))
+        log.debug("Segmentos criados: %s", segment_list)
+        return iter(segment_list)
+
+    def open_streams(self, pending_messages, started):
+        """Inicia novos fluxos até o limite de fluxos simultâneos aceito pelo servidor"""
+        while pending_messages and len(self.active_streams) < self.max_streams:
+            kind, value = pending_messages.pop()
+            stream_id = self.next_stream_id
+            self.next_stream_id += 1
+            stream = StreamSender(self, stream_id, self.message_segments(kind, value), self.window_size)
+            started.append(stream)
+            self.stats['streams'] += 1
+            if self.multiplexed:
+                log.info("[STREAM] Fluxo %d iniciado", stream_id)
+            if not stream.done:
+                self.streams[stream_id] = stream
+                self.active_streams.append(stream)
+
+    def retire_streams(self):
+        """Remove os fluxos cuja mensagem foi enviada e confirmada por inteiro"""
+        for stream in self.active_streams:
+            if stream.done:
+                del self.streams[stream.stream_id]  # ACKs atrasados do fluxo passam a ser ignorados
+                if self.multiplexed:
+                    log.info("[STREAM] Fluxo %d concluído (%d pacotes, %d caracteres)", stream.stream_id, stream.next_seq, stream.sent_size)
+        self.active_streams = [stream for stream in self.active_streams if not stream.done]
+
+    def send(self, data):
+        """Envia uma mensagem (texto ou bytes) e aguarda a confirmação completa; ConnectionError se não concluiu"""
+        if isinstance(data, (bytes, bytearray)):
+            data = bytes(data).decode('utf-8', TEXT_ERRORS)
+        if not self.transfer([('text', data)]):
+            raise ConnectionError("Mensagem não confirmada: conexão encerrada pelo servidor")
+
+    def send_file(self, path):
+        """Envia um arquivo ("-" para stdin) em streaming e aguarda a confirmação completa"""
+        if not self.transfer([('file', path)]):
+            raise ConnectionError("Arquivo não confirmado: conexão encerrada pelo servidor")
+
+    def transfer(self, messages):
+        """Envia as mensagens ('text' ou 'file', valor), cada uma em seu fluxo; True se todas foram confirmadas
+
+        ValueError se um texto excede o limite negociado; ConnectionError se o servidor não multiplexa e
+        a conexão já foi usada (ou há várias mensagens).
+        """
+        if self.socket is None:
+            raise ConnectionError("Conexão já encerrada")
+        if not self.multiplexed and (len(messages) > 1 or self.next_stream_id > 0):
+            raise ConnectionError(f"Servidor não suporta fluxos multiplexados: não é possível enviar "
+                                  f"{len(messages) + self.next_stream_id} mensagens em uma conexão")
+        # Verificar se alguma mensagem excede o limite máximo (não truncar: o servidor recusaria o excedente)
+        for kind, value in messages:
+            if kind == 'text' and len(value) > self.max_message_size:
+                raise ValueError(f"Mensagem de {len(value)} caracteres excede o limite negociado de {self.max_message_size} caracteres")
+        log.info("[OK] Mensagens dentro do limite de %d caracteres", self.max_message_size)
+
+        # Mostrar configuração de simulação se houver
+        settings = self.settings
+        if settings.drop_packets or settings.corrupt_packets:
+            lines = [f"\n[SIMULATION] Simulação de erros ativada{' (em cada fluxo)' if len(messages) > 1 else ''}:"]
+            if settings.drop_packets:
+                lines.append(f"  - Pacotes a perder: {sorted(settings.drop_packets)}")
+            if settings.corrupt_packets:
+                lines.append(f"  - Pacotes a corromper: {sorted(settings.corrupt_packets)}")
+            log.info("\n".join(lines))
+
+        pending_messages = list(reversed(messages))  # Mensagens aguardando um fluxo livre
+        started = []  # Fluxos iniciados por este envio
+        transfer_start = time.time()
         try:
-            response = receive_message(s, timeout=socket_timeout)
-            ack_seq = response["seq_num"]
-            
-            if response["type"] == "ack":
-                elapsed_time = time.time() - packet_send_times.get(ack_seq, time.time())
-                print(f"\n[{get_timestamp()}] [ACK] ACK recebido para pacote {ack_seq} (tempo decorrido: {elapsed_time:.2f}s)")
-                # Parar timer do pacote confirmado
-                stop_timer(ack_seq)
-                # Marcar pacote como confirmado
-                acknowledged_packets_global.add(ack_seq)
-                
-                # Mover janela se base foi confirmada
-                while base_seq in acknowledged_packets_global:
-                    base_seq += 1
-                    print(f"[{get_timestamp()}] [WINDOW] Janela movida. Base agora: {base_seq}\n")
-                    
-            elif response["type"] == "nack":
-                print(f"\n[{get_timestamp()}] [NACK] NACK recebido para pacote {ack_seq}\n")
-                
-                if operation_mode == "go_back_n":
-                    for i in range(base_seq, next_seq_to_send):
-                        stop_timer(i)
-                    print(f"[{get_timestamp()}] [GBN] Go-Back-N: Retransmitindo janela a partir de {base_seq}\n")
-                    for i in range(base_seq, next_seq_to_send):
-                        retransmit_packet(i)
-                elif operation_mode == "selective_repeat":
-                    print(f"[{get_timestamp()}] [SR] Selective Repeat: Retransmitindo apenas pacote {ack_seq}\n")
-                    retransmit_packet(ack_seq)
-                
-        except (TimeoutError, OSError) as e:
-            # Timeout ocorreu - continuar loop para verificar timestamps
-            error_str = str(e).lower()
-            if isinstance(e, TimeoutError) or "timed out" in error_str or "timeout" in error_str:
-                # Continue loop to check for expired packets
-                if base_seq < next_seq_to_send:
-                    continue
-                break
-            print(f"Conexão encerrada pelo servidor: {e}")
-            break
-        except (ConnectionError, json.JSONDecodeError) as e:
-            print(f"Conexão encerrada pelo servidor: {e}")
-            break
-
-print("\n=== TROCA DE MENSAGENS CONCLUÍDA ===")
-
-# Mostrar estatísticas de simulação
-if packets_to_drop or packets_to_corrupt:
-    print(f"\n[SIMULATION] Estatísticas de simulação:")
-    print(f"  - Total de pacotes: {simulation_stats['total_packets']}")
-    print(f"  - Pacotes perdidos: {simulation_stats['packets_dropped']}")
-    print(f"  - Pacotes corrompidos: {simulation_stats['packets_corrupted']}")
-
-s.close() # Fechar conexão
-print("Desconectado")
\ No newline at end of file
+            self.open_streams(pending_messages, started)
+            self.metrics.cwnd.record(self.congestion.window)
+            self.metrics.rwnd.record(self.advertised_window())
+            self.run(pending_messages, started)
+
+            if self.resumption_pending and not self.closed:
+                # Nenhum ACK esperado (mensagens vazias): ainda assim guardar o novo ticket
+                try:
+                    response = self.receive_message(timeout=self.rto.timeout)
+                except (TimeoutError, OSError, ValueError):
+                    log.warning("[WARNING] Servidor não confirmou a retomada da sessão")
+                else:
+                    self.confirm_resumption(response)
+        finally:
+            for input_stream in self.input_streams:
+                input_stream.close()
+            self.input_streams = []
+            self.stats['elapsed_s'] += time.time() - transfer_start
+            self.update_stats(started)
+        return not self.closed and not pending_messages and all(stream.done for stream in started)
+
+    def run(self, pending_messages, started):
+        """Laço de envio: preenche as janelas dos fluxos e processa ACKs e timeouts até todos concluírem"""
+        stats = self.stats
+        rto = self.rto
+        congestion = self.congestion
+        timers = self.timers
+        # Enviar pacotes dentro da janela
+        while not self.closed and self.active_streams:
+            # Preencher a janela alternando entre os fluxos (lendo o próximo segmento apenas quando há espaço)
+            # Em trânsito: no máximo a janela de congestionamento na conexão e a anunciada pelo receptor em cada fluxo
+            progressed = True
+            while progressed and not self.closed:
+                progressed = False
+                for stream in self.active_streams:
+                    if self.packets_in_flight >= congestion.window or self.closed:
+                        break
+                    if stream.can_send():
+                        progressed = stream.send_next() or progressed
+
+            # Aguardar ACKs até a janela estar confirmada ou timeout
+            while self.packets_in_flight > 0 and not self.closed:
+                # O timer mais antigo é o próximo a expirar (todos usam o mesmo RTO)
+                current_time = time.monotonic()
+                earliest = timers.earliest()
+                if earliest is not None and current_time - earliest[0] >= rto.timeout:
+                    stream_id, seq = earliest[1]
+                    if self.debug_logs:
+                        log.debug("[TIMEOUT] Timeout para pacote %s após %.2fs (RTO: %.3fs) - retransmitindo...",
+                                  self.packet_label(stream_id, seq), current_time - earliest[0], rto.timeout)
+                    stats['timeouts'] += 1
+                    if rto.backoff(current_time):  # Backoff antes de reiniciar os timers dos retransmitidos
+                        self.metrics.rto.observe(rto.timeout)
+                        congestion.on_timeout(current_time)
+                        self.metrics.cwnd.record(congestion.window)
+                        self.recovery_point = self.transmissions
+                        log.info("[CWND] Timeout - janela de congestionamento: %d", congestion.window)
+                    if self.resumption_pending and self.transport == 'udp':
+                        self.send_message(self.handshake_data) # Sem o handshake o servidor descarta os dados: reenviar
+                    self.streams[stream_id].on_timeout(seq)
+                    continue  # Processar um timeout por vez e reavaliar
+
+                if earliest is None:
+                    # Nenhum timer ativo - aguardar um RTO completo
+                    socket_timeout = rto.timeout
+                    log.debug("[TIMER] Aguardando %.3fs para timeout...", socket_timeout)
+                else:
+                    # Aguardar até o próximo timeout possível
+                    elapsed_for_packet = current_time - earliest[0]
+                    socket_timeout = max(0.001, rto.timeout - elapsed_for_packet)
+                    if self.debug_logs:
+                        log.debug("[TIMER] Aguardando %.2fs até possível timeout do pacote %s (já decorridos %.2fs de %.3fs)...",
+                                  socket_timeout, self.packet_label(*earliest[1]), elapsed_for_packet, rto.timeout)
+
+                # Aguardar resposta com timeout calculado (realmente aguarda o tempo)
+                try:
+                    response = self.receive_message(timeout=socket_timeout)
+                    if response["type"] == "handshake_ack":
+                        if self.resumption_pending:
+                            self.confirm_resumption(response)
+                        continue  # Resposta repetida de um handshake reenviado
+                    if stats['first_ack_s'] is None and response["type"] == "ack":
+                        stats['first_ack_s'] = time.time() - self.connect_start
+                    if response["type"] == "error":
+                        log.error("[ERROR] Servidor encerrou a sessão (pacote %s): %s", response['seq_num'], response.get('reason'))
+                        self.closed = True
+                        break
+
+                    stream = self.streams.get(response.get("stream", 0))
+                    if stream is None:
+                        continue  # Resposta de um fluxo desconhecido ou já concluído: ignorar
+                    # Janela deslizou: voltar a preencher com novos segmentos antes de esperar o restante
+                    if stream.handle_response(response) and (pending_messages or any(not other.input_exhausted for other in self.active_streams)):
+                        break
+
+                except TicketRejected:
+                    raise
+                except (TimeoutError, OSError) as e:
+                    # Timeout ocorreu - continuar loop para verificar timestamps
+                    error_str = str(e).lower()
+                    if isinstance(e, TimeoutError) or "timed out" in error_str or "timeout" in error_str:
+                        continue  # Continue loop to check for expired packets
+                    log.warning("Conexão encerrada pelo servidor: %s", e)
+                    self.closed = True
+                    break
+                except (ConnectionError, json.JSONDecodeError) as e:
+                    log.warning("Conexão encerrada pelo servidor: %s", e)
+                    self.closed = True
+                    break
+
+            self.retire_streams()
+            self.open_streams(pending_messages, started)  # Fluxos concluídos liberam lugar para as mensagens seguintes
+
+    def update_stats(self, started):
+        """Atualiza as estatísticas de RTO, janelas e fluxos após um envio"""
+        stats = self.stats
+        rto = self.rto
+        congestion = self.congestion
+        stats['rtt_samples'] = rto.samples
+        stats['srtt_s'] = rto.srtt
+        stats['rto_s'] = rto.timeout
+        if self.settings.congestion_control != 'none':
+            stats['cwnd'] = congestion.cwnd
+            stats['max_cwnd'] = congestion.max_cwnd
+            stats['ssthresh'] = congestion.ssthresh if congestion.ssthresh != float('inf') else None
+        stats['congestion_events'] = congestion.loss_events
+        stats['receive_window'] = max((stream.receive_window for stream in started), default=self.window_size)
+
+    def peer_closed(self):
+        """Conexão ociosa já encerrada pelo servidor? (TCP: fim de arquivo pendente; UDP não tem como saber)"""
+        if self.socket is None or self.closed:
+            return True
+        if self.transport == 'udp':
+            return False
+        try:
+            self.socket.setblocking(False)
+            return self.socket.recv(1, socket.MSG_PEEK) == b''
+        except (BlockingIOError, InterruptedError):
+            return False  # Nada a ler: a conexão continua aberta
+        except OSError:
+            return True
+        finally:
+            self.socket.setblocking(True)
+
+    def close(self):
+        """Encerra a conexão (sobre UDP avisa o servidor com FIN e aguarda a confirmação)"""
+        if self.socket is None:
+            return
+        if self.transport == 'udp' and not self.closed:
+            # Sem conexão para fechar: avisar o servidor com FIN e aguardar a confirmação
+            fin_timeout = self.rto.timeout
+            for attempt in range(HANDSHAKE_ATTEMPTS):
+                self.send_message({"type": "fin", "seq_num": self.transmissions})
+                try:
+                    deadline = time.monotonic() + fin_timeout
+                    while self.receive_message(timeout=max(0.001, deadline - time.monotonic()))["type"] != "fin":
+                        pass # ACKs atrasados ainda a caminho
+                    log.info("[UDP] Encerramento confirmado pelo servidor")
+                    break
+                except (TimeoutError, OSError):
+                    fin_timeout *= 2
+            else:
+                log.warning("[WARNING] Servidor não confirmou o encerramento")
+        else:
+            try:
+                self.flush_sends() # Quadros ainda acumulados (ex.: handshake 0-RTT sem dados)
+            except OSError:
+                pass
+        self.abort()
+
+    def abort(self):
+        """Fecha o socket sem encerramento ordenado"""
+        if self.socket is not None:
+            self.socket.close() # Fechar conexão
+            self.socket = None
+        self.closed = True
+
+def stripe_ranges(total, count, peek):
+    """Divide total bytes em até count faixas contíguas (deslocamento, comprimento)
+
+    Cada corte avança até o início de um caractere UTF-8 (peek(deslocamento) devolve os bytes seguintes):
+    cada faixa vira texto sozinha, sem caracteres partidos entre duas conexões.
+    """
+    ranges = []
+    start = 0
+    for index in range(1, count):
+        cut = max(start, total * index // count)
+        head = peek(cut)
+        skip = 0
+        while skip < len(head) and head[skip] & 0xC0 == 0x80:  # Byte de continuação
+            skip += 1
+        cut += skip
+        if cut > start:
+            ranges.append((start, cut - start))
+            start = cut
+    if start < total or not ranges:
+        ranges.append((start, total - start))
+    return ranges
+
+def send_striped(host, port, data=None, path=None, settings=None, stripes=DEFAULT_STRIPES):
+    """Envia uma mensagem (texto, bytes ou arquivo) em faixas, cada uma por uma conexão, em paralelo
+
+    Todas as conexões concluem o handshake antes de qualquer dado sair, e o servidor junta as faixas pelo
+    deslocamento. Devolve as conexões (já encerradas) para as estatísticas; ConnectionError se alguma faixa
+    não foi confirmada.
+    """
+    if path is not None:
+        total = os.path.getsize(path)
+        with open(path, 'rb') as source:
+            def peek(offset):
+                source.seek(offset)
+                return source.read(3)
+            ranges = stripe_ranges(total, stripes, peek)
+
+        def read_range(offset, length):
+            with open(path, 'rb') as source:
+                source.seek(offset)
+                return source.read(length)
+    else:
+        payload = data.encode('utf-8', TEXT_ERRORS) if isinstance(data, str) else bytes(data)
+        total = len(payload)
+        ranges = stripe_ranges(total, stripes, lambda offset: payload[offset:offset + 3])
+
+        def read_range(offset, length):
+            return payload[offset:offset + length]
+
+    transfer = os.urandom(8).hex()
+    log.info("[STRIPE] Transferência %s: %d bytes em %d faixas", transfer, total, len(ranges))
+
+    def open_stripe(offset, length):
+        stripe = {"transfer": transfer, "offset": offset, "length": length, "total": total}
+        return Connection(host, port, settings, resume=False, stripe=stripe)
+
+    def send_stripe(connection):
+        connection.send(read_range(connection.stripe["offset"], connection.stripe["length"]))
+        log.info("[STRIPE] Faixa %d-%d confirmada", connection.stripe["offset"],
+                 connection.stripe["offset"] + connection.stripe["length"])
+
+    with ThreadPoolExecutor(len(ranges)) as executor:
+        futures = [executor.submit(open_stripe, offset, length) for offset, length in ranges]
+        connections = []
+        error = None
+        for future in futures:
+            try:
+                connections.append(future.result())
+            except (OSError, ValueError) as e:
+                error = error or e
+        if error is not None:
+            for connection in connections:
+                connection.abort()
+            raise error
+        # Todas as faixas terminam (ou falham) antes do encerramento das conexões
+        errors = [future.exception() for future in [executor.submit(send_stripe, connection) for connection in connections]]
+    for connection in connections:
+        connection.close()
+    error = next((error for error in errors if error is not None), None)
+    if error is not None:
+        raise error
+    return connections
+
+def log_summary(connection, settings):
+    """Mostra as estatísticas da transferência ao final da execução"""
+    stats = connection.stats
+    rto = connection.rto
+    congestion = connection.congestion
+    log.info("\n=== TROCA DE MENSAGENS CONCLUÍDA ===")
+
+    lines = ["\n[STATS] Estatísticas de transferência:",
+             f"  - Caracteres enviados: {stats['payload_chars']}",
+             f"  - Pacotes de dados: {stats['data_packets_sent']} (+{stats['retransmissions']} retransmissões)",
+             f"  - ACKs recebidos: {stats['acks_received']} (NACKs: {stats['nacks_received']}, lacunas: {stats['gap_nacks_received']})",
+             f"  - Retransmissões rápidas: {stats['fast_retransmits']}"]
+    if stats['retransmissions']:
+        causes = ', '.join(f"{cause}: {counter.value}"
+                           for (cause,), counter in connection.metrics.registry.families['retransmissions_total'].children.items())
+        lines.append(f"  - Retransmissões por causa: {causes}")
+    srtt_display = f"{rto.srtt * 1000:.2f}ms" if rto.srtt is not None else "sem amostras"
+    lines.append(f"  - RTO final: {rto.timeout:.3f}s (SRTT: {srtt_display}, {rto.samples} amostras, {stats['timeouts']} timeouts)")
+    if settings.congestion_control != 'none':
+        lines.append(f"  - Janela de congestionamento ({settings.congestion_control}): {congestion.window} (máxima: {int(congestion.max_cwnd)}, {congestion.loss_events} eventos de perda)")
+    lines.append(f"  - Janela anunciada pelo receptor: {stats['receive_window']}")
+    if connection.compression is not None:
+        lines.append(f"  - Compressão ({connection.compression} {connection.compression_mode}, nível {settings.compression_level}): "
+                     f"{stats['uncompressed_bytes']} -> {stats['compressed_bytes']} bytes"
+                     f" ({stats['compressed_bytes'] / max(1, stats['uncompressed_bytes']):.1%})")
+    if connection.multiplexed:
+        lines.append(f"  - Fluxos: {stats['streams']} (até {connection.max_streams} simultâneos)")
+    packets_sent = stats['data_packets_sent'] + stats['retransmissions']
+    lines.append(f"  - Chamadas send/recv: {stats['send_calls']}/{stats['recv_calls']}"
+                 f" ({stats['send_calls'] / max(1, packets_sent):.3f} send por pacote de dados)")
+    lines.append(f"  - Tempo de transferência: {stats['elapsed_s']:.3f}s")
+    if stats['first_ack_s'] is not None:
+        lines.append(f"  - Conexão até o primeiro ACK: {stats['first_ack_s'] * 1000:.2f}ms"
+                     f" (handshake: {stats['handshake_s'] * 1000:.2f}ms{', retomado com ticket' if stats['resumed'] else ''})")
+    log.info("\n".join(lines))
+
+def run_striped(args, settings, kind, value):
+    """CLI com --stripes: envia a mensagem em faixas e mostra as estatísticas somadas das conexões"""
+    start = time.time()
+    try:
+        connections = send_striped(args.host, args.port, value if kind == 'text' else None,
+                                   value if kind == 'file' else None, settings, args.stripes)
+    except (OSError, ValueError) as e:
+        log.error("[ERROR] %s", e)
+        raise SystemExit(1)
+    elapsed = time.time() - start
+
+    total = connections[0].stripe["total"]
+    stats = [connection.stats for connection in connections]
+    lines = ["\n[STATS] Transferência em faixas:",
+             f"  - Faixas (conexões paralelas): {len(connections)}",
+             f"  - Bytes: {total} em {elapsed:.3f}s ({total / max(elapsed, 1e-9) / 1024:.1f} KiB/s)",
+             f"  - Pacotes de dados: {sum(s['data_packets_sent'] for s in stats)} "
+             f"(+{sum(s['retransmissions'] for s in stats)} retransmissões, {sum(s['timeouts'] for s in stats)} timeouts)"]
+    for connection in connections:
+        stripe = connection.stripe
+        lines.append(f"  - Faixa {stripe['offset']}-{stripe['offset'] + stripe['length']}: "
+                     f"{connection.stats['elapsed_s']:.3f}s, {connection.stats['retransmissions']} retransmissões")
+    log.info("\n".join(lines))
+
+    if args.stats_json:
+        with open(args.stats_json, 'w') as stats_file:
+            json.dump({"stripes": len(connections), "bytes": total, "elapsed_s": elapsed,
+                       "data_packets_sent": sum(s['data_packets_sent'] for s in stats),
+                       "retransmissions": sum(s['retransmissions'] for s in stats),
+                       "timeouts": sum(s['timeouts'] for s in stats),
+                       "connections": [{**connection.stripe, **connection.stats} for connection in connections]},
+                      stats_file, indent=2)
+
+def main():
+    # ===== CONFIGURAÇÕES DO CLIENTE (via CLI) =====
+    parser = argparse.ArgumentParser(description='Cliente do Protocolo de Transporte Confiável')
+    parser.add_argument('--host', type=str, default='localhost', help='Endereço do servidor (padrão: localhost)')
+    parser.add_argument('--port', type=int, default=8080, help='Porta do servidor (padrão: 8080)')
+    parser.add_argument('--max-message-size', type=parse_size, default=DEFAULT_MAX_MESSAGE_SIZE,
+                        help='Tamanho máximo da mensagem em caracteres, aceita sufixos K/M/G (padrão: 1G)')
+    parser.add_argument('--operation-mode', type=str, default='go_back_n',
+                        choices=['go_back_n', 'selective_repeat'],
+                        help='Modo de operação: go_back_n ou selective_repeat (padrão: go_back_n)')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='Timeout de retransmissão inicial em segundos, adaptado ao RTT medido (padrão: 1.0)')
+    parser.add_argument('--min-rto', type=float, default=0.2, help='Limite inferior do timeout adaptativo (padrão: 0.2)')
+    parser.add_argument('--max-rto', type=float, default=60.0, help='Limite superior do timeout adaptativo (padrão: 60.0)')
+    parser.add_argument('--text', type=str, action='append', default=None,
+                        help='Texto a ser enviado; repetido, cada texto é uma mensagem em seu próprio fluxo')
+    parser.add_argument('--file', type=str, action='append', default=None,
+                        help='Arquivo enviado em streaming, "-" para stdin; repetido, um fluxo por arquivo (substitui o texto padrão)')
+    parser.add_argument('--payload-size', type=parse_size, default=None,
+                        help=f'Tamanho do segmento/payload proposto no handshake (padrão: {DEFAULT_PAYLOAD_SIZES["tcp"]} no TCP, '
+                             f'{DEFAULT_PAYLOAD_SIZES["udp"]} no UDP; máximo: {MAX_SEGMENT_SIZE})')
+    parser.add_argument('--enable-encryption', action='store_true',
+                        help='Ativar criptografia dos payloads')
+    parser.add_argument('--cipher', type=str, default=CIPHERS[0], choices=CIPHERS,
+                        help=f'Cifra preferida com --enable-encryption, com César como fallback (padrão: {CIPHERS[0]})')
+    parser.add_argument('--caesar-shift', type=int, default=1,
+                        help='Número de deslocamento para Cifra de César (padrão: 1)')
+    parser.add_argument('--drop-packets', type=str, default='',
+                        help='Pacotes a perder (ex: "2,5,10" ou "2-5" para intervalo)')
+    parser.add_argument('--corrupt-packets', type=str, default='',
+                        help='Pacotes a corromper (ex: "3,7" ou "3-7" para intervalo)')
+    parser.add_argument('--ack-mode', type=str, default='cumulative', choices=['cumulative', 'individual'],
+                        help='Solicitar ACKs cumulativos/atrasados ou um ACK por pacote (padrão: cumulative)')
+    parser.add_argument('--dup-threshold', type=int, default=3,
+                        help='Indicações de lacuna antes da retransmissão rápida, 0 desativa (padrão: 3)')
+    parser.add_argument('--congestion-control', type=str, default='reno', choices=CONGESTION_CONTROLS,
+                        help='Controle de congestionamento: reno (slow start + AIMD), cubic ou none (padrão: reno)')
+    parser.add_argument('--initial-cwnd', type=int, default=4,
+                        help='Janela de congestionamento inicial em pacotes (padrão: 4)')
+    parser.add_argument('--sack', action=argparse.BooleanOptionalAction, default=True,
+                        help='Solicitar blocos SACK nos ACKs do Selective Repeat (padrão: ativado)')
+    parser.add_argument('--tcp-nodelay', action=argparse.BooleanOptionalAction, default=True,
+                        help='Desativar o algoritmo de Nagle no TCP (padrão: ativado)')
+    parser.add_argument('--batch-sends', action=argparse.BooleanOptionalAction, default=True,
+                        help='Enviar cada rajada da janela em uma única chamada sendmsg (padrão: ativado)')
+    parser.add_argument('--stats-json', type=str, default=None,
+                        help='Gravar estatísticas da transferência em um arquivo JSON')
+    parser.add_argument('--packet-encoding', type=str, default='binary', choices=PACKET_ENCODINGS,
+                        help='Codificação preferida dos pacotes de dados: binary ou json (padrão: binary)')
+    parser.add_argument('--checksum', type=str, default=CHECKSUM_ALGORITHMS[0], choices=CHECKSUM_ALGORITHMS,
+                        help=f'Algoritmo de integridade preferido, com a soma original como fallback (padrão: {CHECKSUM_ALGORITHMS[0]})')
+    parser.add_argument('--transport', type=str, default='tcp', choices=TRANSPORTS,
+                        help='Transporte: tcp ou udp, onde a confiabilidade fica só com o protocolo (padrão: tcp)')
+    parser.add_argument('--session-cache', type=str, default=None,
+                        help='Arquivo de tickets de sessão: retoma a sessão anterior e envia dados junto com o handshake (0-RTT)')
+    parser.add_argument('--compression', type=str, default='none', choices=('none', *COMPRESSIONS),
+                        help='Comprimir os payloads antes do checksum/cifra (requer codificação binária) (padrão: none)')
+    parser.add_argument('--compression-level', type=int, default=None,
+                        help='Nível de compressão: zlib/lzma 0-9, bz2 1-9 (padrão: 6 para zlib/lzma, 9 para bz2)')
+    parser.add_argument('--compression-mode', type=str, default='stream', choices=COMPRESSION_MODES,
+                        help='stream: um compressor por mensagem (melhor taxa); segment: cada pacote descomprimido sozinho (padrão: stream)')
+    parser.add_argument('--stripes', type=int, default=1,
+                        help='Dividir a mensagem em N faixas enviadas por N conexões em paralelo (padrão: 1, desativado)')
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    configure_logging(args)
+    try:
+        settings = ClientSettings(args.max_message_size, args.operation_mode, args.timeout, args.min_rto, args.max_rto,
+                                  args.payload_size, args.enable_encryption, args.cipher, args.caesar_shift,
+                                  parse_packet_list(args.drop_packets), parse_packet_list(args.corrupt_packets),
+                                  args.ack_mode, args.dup_threshold, args.congestion_control, args.initial_cwnd,
+                                  args.sack, args.tcp_nodelay, args.batch_sends, args.packet_encoding, args.checksum,
+                                  args.transport, args.session_cache,
+                                  None if args.compression == 'none' else args.compression,
+                                  args.compression_level, args.compression_mode)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Mensagens a enviar, uma por fluxo: textos primeiro, depois arquivos
+    messages = [('text', text) for text in (args.text or ([] if args.file else [DEFAULT_TEXT]))]
+    messages += [('file', path) for path in (args.file or [])]
+    if args.stripes > 1:
+        if len(messages) != 1 or messages[0] == ('file', '-'):
+            parser.error("--stripes envia uma única mensagem: um --text ou um --file (não stdin)")
+        run_striped(args, settings, *messages[0])
+        return
+
+    try:
+        # stdin não pode ser relido caso o servidor recuse o ticket e a transferência precise recomeçar
+        connection = Connection(args.host, args.port, settings, resume=('file', '-') not in messages)
+        try:
+            completed = connection.transfer(messages)
+        except TicketRejected:
+            # Os dados 0-RTT foram descartados: nova conexão com handshake completo (as entradas são relidas do início)
+            connection.close()
+            connection = Connection(args.host, args.port, settings, resume=False)
+            completed = connection.transfer(messages)
+        finally:
+            connection.close()
+    except (OSError, ValueError) as e:
+        log.error("[ERROR] %s", e)
+        raise SystemExit(1)
+
+    log_summary(connection, settings)
+
+    if args.stats_json:
+        with open(args.stats_json, 'w') as stats_file:
+            json.dump({**connection.stats, **connection.simulation_stats, 'metrics': connection.metrics.registry.snapshot()},
+                      stats_file, indent=2)
+
+    # Mostrar estatísticas de simulação
+    if settings.drop_packets or settings.corrupt_packets:
+        simulation_stats = connection.simulation_stats
+        log.info("\n[SIMULATION] Estatísticas de simulação:\n  - Total de pacotes: %d\n  - Pacotes perdidos: %d\n  - Pacotes corrompidos: %d",
+                 simulation_stats['total_packets'], simulation_stats['packets_dropped'], simulation_stats['packets_corrupted'])
+
+    if not completed:
+        log.error("[ERROR] Transferência não concluída: o servidor não confirmou todas as mensagens")
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import zlib
+import codecs
+
+from protocol import TEXT_ERRORS
+
+try:
+    import bz2   # Opcionais: builds do Python sem libbz2/liblzma não os têm
+except ImportError:
+    bz2 = None
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# Compressão do payload negociada no handshake: no cliente entre a leitura da entrada e a divisão em
+# segmentos (antes do checksum e da cifra); no servidor na entrega em ordem, antes de gravar a mensagem
+
+# Algoritmos disponíveis (em ordem de preferência) e níveis aceitos: (mínimo, máximo, padrão)
+COMPRESSION_LEVELS = {'zlib': (0, 9, 6), 'lzma': (0, 9, 6), 'bz2': (1, 9, 9)}
+COMPRESSIONS = tuple(name for name, module in (('zlib', zlib), ('lzma', lzma), ('bz2', bz2)) if module is not None)
+COMPRESSION_MODES = ('stream', 'segment')  # Um compressor para a mensagem inteira ou um por segmento
+
+STREAM_READ_SIZE = 64 * 1024  # Caracteres lidos da entrada por chamada ao compressor (modo stream)
+MAX_READ_FACTOR = 64          # Modo segment: lê até 64x o segmento quando a taxa de compressão permite
+MAX_UTF8_BYTES = 4            # Bytes por caractere no pior caso (limite da descompressão)
+MIN_COMPRESSED_SEGMENT = 64   # Modo segment: abaixo disso os cabeçalhos do formato já anulam o ganho (envio cru)
+# lzma: o dicionário é escolhido por quem comprime e alocado por quem descomprime. Modo stream limita a memória
+# do descompressor (dicionário do nível 9, 64 MiB, com folga); modo segment usa LZMA2 cru com dicionário fixo
+LZMA_MEMLIMIT = 80 * 1024 * 1024
+LZMA_SEGMENT_DICT_SIZE = 1024 * 1024
+
+# Modo segment: o primeiro caractere do payload diz se o restante foi comprimido
+SEGMENT_RAW = '\x00'
+SEGMENT_COMPRESSED = '\x01'
+
+def choose_compression(offered):
+    """Primeiro algoritmo oferecido que também é suportado (None: sem compressão)"""
+    for name in offered:
+        if name in COMPRESSIONS:
+            return name
+    return None
+
+def default_level(name):
+    return COMPRESSION_LEVELS[name][2]
+
+def lzma_segment_filters(level=None):
+    """LZMA2 cru do modo segment: sem o contêiner XZ e com dicionário pequeno, montado a cada pacote"""
+    options = {"id": lzma.FILTER_LZMA2, "dict_size": LZMA_SEGMENT_DICT_SIZE}
+    if level is not None:
+        options["preset"] = level
+    return [options]
+
+def create_compressor(name, level, segment=False):
+    """Compressor incremental (compress/flush) do algoritmo; segment: formato de um segmento independente"""
+    if name == 'zlib':
+        return zlib.compressobj(level)
+    if name == 'bz2':
+        return bz2.BZ2Compressor(level)
+    if segment:
+        return lzma.LZMACompressor(format=lzma.FORMAT_RAW, filters=lzma_segment_filters(level))
+    return lzma.LZMACompressor(preset=level)
+
+def create_decompressor(name, segment=False):
+    if name == 'zlib':
+        return zlib.decompressobj()
+    if name == 'bz2':
+        return bz2.BZ2Decompressor()
+    if segment:
+        return lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=lzma_segment_filters())
+    return lzma.LZMADecompressor(memlimit=LZMA_MEMLIMIT)
+
+def compress(name, level, data):
+    """Comprime um segmento independente (modo segment)"""
+    compressor = create_compressor(name, level, segment=True)
+    return compressor.compress(data) + compressor.flush()
+
+def decompress_limited(decompressor, data, limit):
+    """Descomprime no máximo limit bytes; ValueError se a saída passaria disso (bomba de descompressão)
+
+    Também ValueError se o formato pedir mais memória que o limite do descompressor (dicionário lzma enorme).
+    """
+    try:
+        output = decompressor.decompress(data, max_length=limit + 1)
+    except (zlib.error, OSError, EOFError, MemoryError, getattr(lzma, 'LZMAError', OSError)) as e:
+        raise ValueError(f"dados comprimidos inválidos: {e}") from None
+    if len(output) > limit:
+        raise ValueError(f"dados descomprimidos excedem {limit} bytes")
+    return output
+
+def compressed_segments(stream, segment_size, max_bytes, name, level, mode, totals):
+    """Segmentos já comprimidos de uma entrada em texto; totals acumula bytes de entrada e de saída
+
+    Cada segmento cabe no MSS (caracteres) e, com max_bytes (UDP), no datagrama: bytes comprimidos viajam
+    como surrogates, um caractere por byte no máximo.
+    """
+    limit = segment_size if max_bytes is None else min(segment_size, max_bytes)
+    if mode == 'stream':
+        return stream_segments(stream, limit, create_compressor(name, level), totals)
+    return independent_segments(stream, segment_size, max_bytes, limit, name, level, totals)
+
+def stream_segments(stream, limit, compressor, totals):
+    """Um compressor para a mensagem inteira; a saída é cortada em segmentos cheios"""
+    pending = b''
+    while True:
+        text = stream.read(max(limit, STREAM_READ_SIZE))
+        if text:
+            data = text.encode('utf-8', TEXT_ERRORS)
+            totals['uncompressed_bytes'] += len(data)
+            pending += compressor.compress(data)
+        else:
+            pending += compressor.flush()
+        offset = 0
+        while len(pending) - offset >= limit or (not text and offset < len(pending)):
+            piece = pending[offset:offset + limit]
+            offset += len(piece)
+            totals['compressed_bytes'] += len(piece)
+            yield piece.decode('utf-8', TEXT_ERRORS)
+        pending = pending[offset:]
+        if not text:
+            return
+
+def independent_segments(stream, segment_size, max_bytes, limit, name, level, totals):
+    """Cada segmento comprimido sozinho (ou enviado cru se não diminuir), lendo o quanto a taxa permite"""
+    budget = segment_size - 1
+    pending = ''
+    while True:
+        raw = pending + stream.read(max(0, budget - len(pending)))
+        if not raw:
+            return
+        pending = ''
+        while True:
+            data = raw.encode('utf-8', TEXT_ERRORS)
+            packed = compress(name, level, data) if limit >= MIN_COMPRESSED_SEGMENT else data
+            if len(packed) < len(data) and len(packed) + 1 <= limit:
+                segment = SEGMENT_COMPRESSED + packed.decode('utf-8', TEXT_ERRORS)
+                break
+            if len(raw) + 1 <= segment_size and (max_bytes is None or len(data) + 1 <= max_bytes):
+                segment = SEGMENT_RAW + raw
+                break
+            # Não coube: metade agora, o restante abre o próximo segmento
+            cut = max(1, len(raw) // 2)
+            raw, pending = raw[:cut], raw[cut:] + pending
+        totals['uncompressed_bytes'] += len(data)
+        totals['compressed_bytes'] += len(segment.encode('utf-8', TEXT_ERRORS))
+        yield segment
+        if segment[0] == SEGMENT_COMPRESSED:
+            # Próxima leitura proporcional à taxa observada (com folga), para encher o segmento
+            budget = min(segment_size * MAX_READ_FACTOR, max(segment_size - 1, int(len(raw) * limit / (len(packed) + 1) * 0.9)))
+        else:
+            budget = segment_size - 1
+
+class PayloadDecoder:
+    """Descompressão no receptor, aplicada aos segmentos de um fluxo na ordem de entrega"""
+
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.decompressor = create_decompressor(name) if mode == 'stream' else None
+        # Um caractere UTF-8 pode ficar dividido entre dois segmentos: o decodificador guarda os bytes
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')(TEXT_ERRORS)
+        self.compressed_bytes = 0
+
+    def decode(self, payload, limit):
+        """Texto original do segmento; ValueError se inválido ou maior que limit bytes"""
+        data = payload.encode('utf-8', TEXT_ERRORS)
+        self.compressed_bytes += len(data)
+        if self.mode == 'stream':
+            if self.decompressor.eof:
+                raise ValueError("dados após o fim do fluxo comprimido")
+            return self.text_decoder.decode(decompress_limited(self.decompressor, data, limit))
+        marker, body = payload[:1], payload[1:]
+        if marker == SEGMENT_RAW:
+            return body
+        if marker != SEGMENT_COMPRESSED:
+            raise ValueError("segmento sem marcador de compressão")
+        decompressor = create_decompressor(self.name, segment=True)
+        output = decompress_limited(decompressor, data[1:], limit)
+        if not decompressor.eof:
+            raise ValueError("segmento comprimido incompleto")
+        return output.decode('utf-8', TEXT_ERRORS)
+
+    def finish(self):
+        """Fim da mensagem: bytes ainda retidos pelo decodificador; ValueError se o fluxo comprimido não terminou"""
+        if self.mode == 'stream' and not self.decompressor.eof:
+            raise ValueError("fluxo comprimido terminou incompleto")
+        return self.text_decoder.decode(b'', final=True)
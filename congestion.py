@@ -0,0 +1,106 @@
+# Controle de congestionamento do remetente (janela em pacotes)
+
+CONGESTION_CONTROLS = ('reno', 'cubic', 'none')
+
+class Reno:
+    """Slow start seguido de AIMD: +1 pacote por RTT, metade da janela a cada perda"""
+
+    BETA = 0.5  # Fração da janela mantida após uma perda
+
+    def __init__(self, initial_window=4):
+        self.cwnd = float(initial_window)
+        self.ssthresh = float('inf')
+        self.max_cwnd = self.cwnd
+        self.loss_events = 0
+
+    @property
+    def window(self):
+        """Pacotes que podem estar em trânsito"""
+        return max(1, int(self.cwnd))
+
+    def on_ack(self, acked, now, srtt):
+        """Janela avançou: `acked` pacotes novos confirmados"""
+        if self.cwnd < self.ssthresh:
+            self.cwnd += acked  # Slow start: dobra a cada RTT
+        else:
+            self.grow(acked, now, srtt)
+        self.max_cwnd = max(self.max_cwnd, self.cwnd)
+
+    def grow(self, acked, now, srtt):
+        """Prevenção de congestionamento: aumento aditivo"""
+        self.cwnd += acked / self.cwnd
+
+    def on_loss(self, now):
+        """Perda detectada sem timeout (retransmissão rápida): redução multiplicativa"""
+        self.loss_events += 1
+        self.ssthresh = max(2.0, self.cwnd * self.BETA)
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self, now):
+        """Timeout: volta ao slow start com uma janela de 1 pacote"""
+        self.loss_events += 1
+        self.ssthresh = max(2.0, self.cwnd * self.BETA)
+        self.cwnd = 1.0
+
+class Cubic(Reno):
+    """CUBIC (RFC 9438): crescimento em função do tempo desde a última perda"""
+
+    BETA = 0.7
+    C = 0.4
+
+    def __init__(self, initial_window=4):
+        super().__init__(initial_window)
+        self.w_max = self.cwnd
+        self.epoch_start = None
+        self.k = 0.0
+        self.w_est = self.cwnd
+
+    def grow(self, acked, now, srtt):
+        """Segue a curva cúbica, sem ficar abaixo da estimativa equivalente ao Reno"""
+        if self.epoch_start is None:
+            self.epoch_start = now
+            self.w_max = max(self.w_max, self.cwnd)
+            self.k = ((self.w_max - self.cwnd) / self.C) ** (1 / 3)
+            self.w_est = self.cwnd
+        t = now - self.epoch_start + (srtt or 0.0)
+        target = self.C * (t - self.k) ** 3 + self.w_max
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd) / self.cwnd * acked
+        else:
+            self.cwnd += 0.01 * acked / self.cwnd
+        self.w_est += 3 * (1 - self.BETA) / (1 + self.BETA) * acked / self.cwnd
+        self.cwnd = max(self.cwnd, self.w_est)
+
+    def on_loss(self, now):
+        self.w_max = self.cwnd
+        self.epoch_start = None
+        super().on_loss(now)
+
+    def on_timeout(self, now):
+        self.w_max = self.cwnd
+        self.epoch_start = None
+        super().on_timeout(now)
+
+class NoCongestionControl(Reno):
+    """Sem controle de congestionamento: apenas a janela anunciada pelo receptor limita o envio"""
+
+    def __init__(self, initial_window=4):
+        super().__init__(float('inf'))
+
+    @property
+    def window(self):
+        return float('inf')
+
+    def on_ack(self, acked, now, srtt):
+        pass
+
+    def on_loss(self, now):
+        self.loss_events += 1
+
+    def on_timeout(self, now):
+        self.loss_events += 1
+
+def create_congestion_control(name, initial_window=4):
+    """Instancia o algoritmo pelo nome usado na linha de comando"""
+    algorithms = {'reno': Reno, 'cubic': Cubic, 'none': NoCongestionControl}
+    return algorithms[name](initial_window)
@@ -0,0 +1,76 @@
+import sys
+import json
+import signal
+import logging
+from collections import deque
+
+# Logs com níveis e formatação preguiçosa: mensagens abaixo do nível nem chegam a ser formatadas
+
+LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+LOG_FORMATS = ('text', 'json')
+TEXT_FORMAT = '%(message)s'
+TIMESTAMPED_FORMAT = '%(asctime)s.%(msecs)03d %(message)s' # Nível debug: horário de cada evento por pacote
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha: horário, nível, componente e mensagem"""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 6), "level": record.levelname.lower(), "logger": record.name,
+                 "msg": record.getMessage()}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class RingBufferHandler(logging.Handler):
+    """Guarda os últimos registros sem formatá-los; a formatação só acontece no despejo"""
+
+    def __init__(self, capacity, stream):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.stream = stream
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, *_):
+        """Escreve os registros guardados e esvazia o buffer (também com SIGUSR1)"""
+        while self.records:
+            self.stream.write(self.format(self.records.popleft()) + '\n')
+        self.stream.flush()
+
+    def flush(self):
+        # Chamado por logging.shutdown() ao sair do processo: os registros guardados não se perdem
+        self.dump()
+
+def add_logging_arguments(parser):
+    """Opções de log comuns ao cliente e ao servidor"""
+    parser.add_argument('--log-level', type=str, default='info', choices=LOG_LEVELS,
+                        help='Nível mínimo dos logs: debug mostra cada pacote (padrão: info)')
+    parser.add_argument('--quiet', action='store_true', help='Apenas avisos e erros (equivale a --log-level warning)')
+    parser.add_argument('--log-format', type=str, default='text', choices=LOG_FORMATS,
+                        help='Formato dos logs: text ou json (um objeto por linha) (padrão: text)')
+    parser.add_argument('--log-file', type=str, default=None, help='Gravar os logs neste arquivo em vez da saída padrão')
+    parser.add_argument('--log-ring', type=int, default=0,
+                        help='Guardar só os últimos N registros em memória e escrevê-los ao sair ou com SIGUSR1 (padrão: desativado)')
+
+def configure_logging(args):
+    """Configura o logger raiz conforme as opções de linha de comando (chamar após redirecionar stdout)"""
+    level = logging.WARNING if args.quiet else LOG_LEVELS[args.log_level]
+    # Campos que nenhum formato usa: não coletá-los em cada registro (linha de origem, thread, processo)
+    logging._srcfile = None
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    stream = open(args.log_file, 'a', encoding='utf-8', errors='backslashreplace') if args.log_file else sys.stdout
+    if args.log_format == 'json':
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(TIMESTAMPED_FORMAT if level <= logging.DEBUG else TEXT_FORMAT, '%H:%M:%S')
+    if args.log_ring > 0:
+        handler = RingBufferHandler(args.log_ring, stream)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, handler.dump)
+    else:
+        handler = logging.StreamHandler(stream)
+    handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -0,0 +1,339 @@
+import os
+import json
+import stat
+import time
+import socket
+import selectors
+from bisect import bisect_left
+from collections import deque
+
+# Métricas em memória (contadores, medidores, histogramas e séries temporais) exportadas em texto Prometheus ou JSON
+
+NAMESPACE = 'transport'  # Prefixo dos nomes no formato Prometheus
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OCCUPANCY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+SERIES_CAPACITY = 1024   # Amostras guardadas por série temporal (as mais antigas são descartadas)
+MAX_REQUEST_BYTES = 8192 # Maior pedido HTTP aceito pelo endpoint de métricas
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Counter:
+    """Valor que só cresce (pacotes, bytes, eventos)"""
+    __slots__ = ('value',)
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Gauge:
+    """Valor atual que sobe e desce; com function, lido apenas na exportação"""
+    __slots__ = ('value', 'function')
+    kind = 'gauge'
+
+    def __init__(self, function=None):
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def snapshot(self):
+        return self.function() if self.function is not None else self.value
+
+class Histogram:
+    """Distribuição em faixas cumulativas (le), com soma e contagem das observações"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+    kind = 'histogram'
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Última posição: acima da maior faixa (+Inf)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Pares (limite, observações até o limite), terminando em +Inf"""
+        total = 0
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            yield bound, total
+
+    def snapshot(self):
+        return {"buckets": {format_bound(bound): total for bound, total in self.cumulative()},
+                "sum": self.sum, "count": self.count}
+
+class TimeSeries:
+    """Valor acompanhado ao longo do tempo: guarda (segundos desde a criação, valor) a cada mudança"""
+    __slots__ = ('start', 'value', 'samples')
+    kind = 'gauge'  # No Prometheus aparece como medidor (o valor atual); o JSON traz as amostras
+
+    def __init__(self, capacity=SERIES_CAPACITY):
+        self.start = time.monotonic()
+        self.value = None
+        self.samples = deque(maxlen=capacity)
+
+    def record(self, value):
+        if value != self.value:
+            self.value = value
+            self.samples.append((round(time.monotonic() - self.start, 6), value))
+
+    def snapshot(self):
+        return {"value": self.value, "samples": [list(sample) for sample in self.samples]}
+
+class MetricFamily:
+    """Métrica com rótulos: uma instância por combinação de valores (criada no primeiro uso)"""
+
+    def __init__(self, name, help, factory, labelnames):
+        self.name = name
+        self.help = help
+        self.factory = factory
+        self.labelnames = labelnames
+        self.children = {}
+        self.kind = factory().kind
+
+    def labels(self, *values):
+        """Instância da métrica para os valores de rótulo (guardar a referência evita a busca por pacote)"""
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+class MetricsRegistry:
+    """Todas as métricas de um processo, na ordem de registro"""
+
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+        self.families = {}
+
+    def register(self, name, help, factory, labelnames=()):
+        """Registra uma família; sem rótulos devolve diretamente a única instância"""
+        if name in self.families:
+            raise ValueError(f"Métrica já registrada: {name}")
+        family = self.families[name] = MetricFamily(name, help, factory, tuple(labelnames))
+        return family if labelnames else family.labels()
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(name, help, Counter, labelnames)
+
+    def gauge(self, name, help, labelnames=(), function=None):
+        return self.register(name, help, lambda: Gauge(function), labelnames)
+
+    def histogram(self, name, help, buckets=RTT_BUCKETS, labelnames=()):
+        return self.register(name, help, lambda: Histogram(buckets), labelnames)
+
+    def series(self, name, help, capacity=SERIES_CAPACITY):
+        return self.register(name, help, lambda: TimeSeries(capacity))
+
+    def snapshot(self):
+        """Valores atuais em estruturas serializáveis em JSON"""
+        result = {}
+        for name, family in self.families.items():
+            values = [{"labels": dict(zip(family.labelnames, label_values)), "value": child.snapshot()}
+                      for label_values, child in family.children.items()]
+            result[name] = {"type": family.kind, "help": family.help, "values": values}
+        return result
+
+    def to_json(self):
+        return render_json(self.snapshot())
+
+    def to_prometheus(self):
+        return render_prometheus(self.snapshot(), self.namespace)
+
+class SnapshotView:
+    """Métricas já exportadas por outros processos (ex.: combinadas pelo supervisor), servidas pelo MetricsEndpoint"""
+
+    def __init__(self, snapshot, namespace=NAMESPACE):
+        self.snapshot = snapshot  # Função que devolve o snapshot atual
+        self.namespace = namespace
+
+    def to_json(self):
+        return render_json(self.snapshot())
+
+    def to_prometheus(self):
+        return render_prometheus(self.snapshot(), self.namespace)
+
+def render_json(snapshot):
+    return json.dumps({"timestamp": time.time(), "metrics": snapshot}, indent=2)
+
+def render_prometheus(snapshot, namespace=NAMESPACE):
+    """Formato de exposição em texto do Prometheus (versão 0.0.4)"""
+    lines = []
+    for name, metric in snapshot.items():
+        full_name = f"{namespace}_{name}" if namespace else name
+        lines.append(f"# HELP {full_name} {metric['help']}")
+        lines.append(f"# TYPE {full_name} {metric['type']}")
+        for entry in metric["values"]:
+            labels, value = entry["labels"], entry["value"]
+            if metric["type"] == 'histogram':
+                for bound, total in value["buckets"].items():
+                    lines.append(f"{full_name}_bucket{format_labels({**labels, 'le': bound})} {total}")
+                lines.append(f"{full_name}_sum{format_labels(labels)} {format_value(value['sum'])}")
+                lines.append(f"{full_name}_count{format_labels(labels)} {value['count']}")
+            else:
+                if isinstance(value, dict):
+                    value = value["value"]  # Série temporal: só o valor atual
+                if value is not None:
+                    lines.append(f"{full_name}{format_labels(labels)} {format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+def merge_snapshots(snapshots):
+    """Soma snapshots de vários processos, por nome e rótulos
+
+    Contadores, medidores e histogramas somam; séries temporais somam o valor atual e perdem as amostras
+    (os instantes de processos diferentes não se alinham).
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {"type": metric["type"], "help": metric["help"], "values": []}
+            entries = {tuple(sorted(entry["labels"].items())): entry for entry in target["values"]}
+            for entry in metric["values"]:
+                existing = entries.get(tuple(sorted(entry["labels"].items())))
+                if existing is None:
+                    target["values"].append({"labels": dict(entry["labels"]), "value": add_values(None, entry["value"])})
+                else:
+                    existing["value"] = add_values(existing["value"], entry["value"])
+    return merged
+
+def add_values(total, value):
+    """Soma de dois valores de snapshot do mesmo tipo (None é neutro)"""
+    if value is None:
+        return total
+    if isinstance(value, dict):
+        if "buckets" in value:
+            if total is None:
+                return {"buckets": dict(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+            return {"buckets": {bound: total["buckets"].get(bound, 0) + count for bound, count in value["buckets"].items()},
+                    "sum": total["sum"] + value["sum"], "count": total["count"] + value["count"]}
+        current = add_values(None if total is None else total["value"], value["value"])
+        return {"value": current, "samples": []}
+    return value if total is None else total + value
+
+def format_bound(bound):
+    """Limite de faixa como o Prometheus escreve (+Inf para a última)"""
+    return '+Inf' if bound == float('inf') else format_value(bound)
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+class MetricsEndpoint:
+    """Endpoint HTTP mínimo (TCP ou socket Unix) atendido pelo laço de eventos do servidor
+
+    GET /metrics devolve o texto Prometheus; GET /metrics.json (ou ?format=json) o snapshot em JSON.
+    Cada pedido recebe uma resposta e a conexão é fechada.
+    """
+
+    def __init__(self, registry, address, unix=False):
+        self.registry = registry
+        self.unix = unix
+        if unix:
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.unlink(address)  # Socket deixado por uma execução anterior
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.address = address
+        self.pending = {}  # Conexão -> [bytes do pedido recebidos, resposta ainda não enviada]
+
+    def register(self, selector):
+        selector.register(self.listener, selectors.EVENT_READ, self)
+
+    def service(self, selector, sock, mask):
+        """Aceita conexões, lê pedidos completos e envia as respostas sem bloquear o laço"""
+        if sock is self.listener:
+            while True:
+                try:
+                    conn, _ = self.listener.accept()
+                except (BlockingIOError, InterruptedError):
+                    return
+                conn.setblocking(False)
+                self.pending[conn] = [b'', None]
+                selector.register(conn, selectors.EVENT_READ, self)
+        state = self.pending[sock]
+        try:
+            if state[1] is None and mask & selectors.EVENT_READ:
+                data = sock.recv(MAX_REQUEST_BYTES)
+                if not data:
+                    return self.close(selector, sock)
+                state[0] += data
+                if b'\r\n\r\n' not in state[0] and len(state[0]) < MAX_REQUEST_BYTES:
+                    return  # Cabeçalhos ainda incompletos
+                state[1] = self.respond(state[0])
+                selector.modify(sock, selectors.EVENT_WRITE, self)
+            if state[1] is not None:
+                sent = sock.send(state[1])
+                state[1] = state[1][sent:]
+                if not state[1]:
+                    self.close(selector, sock)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self.close(selector, sock)
+
+    def respond(self, request):
+        """Resposta HTTP completa para o pedido recebido"""
+        parts = request.split(b'\r\n', 1)[0].split()
+        if len(parts) < 2 or parts[0] not in (b'GET', b'HEAD'):
+            return http_response(405, 'text/plain', 'Apenas GET\n')
+        path, _, query = parts[1].decode('latin-1').partition('?')
+        if path == '/metrics.json' or (path == '/metrics' and 'format=json' in query):
+            body, content_type = self.registry.to_json(), 'application/json'
+        elif path in ('/', '/metrics'):
+            body, content_type = self.registry.to_prometheus(), PROMETHEUS_CONTENT_TYPE
+        else:
+            return http_response(404, 'text/plain', 'Caminhos: /metrics e /metrics.json\n')
+        return http_response(200, content_type, body, head=parts[0] == b'HEAD')
+
+    def close(self, selector, sock):
+        self.pending.pop(sock, None)
+        selector.unregister(sock)
+        sock.close()
+
+    def shutdown(self):
+        """Fecha o endpoint (e remove o socket Unix)"""
+        for conn in self.pending:
+            conn.close()
+        self.pending.clear()
+        self.listener.close()
+        if self.unix:
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+def http_response(status, content_type, body, head=False):
+    reasons = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed'}
+    payload = body.encode('utf-8')
+    header = (f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: {content_type}\r\n"
+              f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n").encode('ascii')
+    return header + (b'' if head else payload)
@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from client import Connection, TicketRejected
+
+# Pool de conexões do cliente: conexões com o handshake concluído ficam abertas e são reutilizadas
+# entre envios (sem novo connect nem handshake por mensagem)
+
+log = logging.getLogger('pool')
+
+DEFAULT_POOL_SIZE = 4    # Conexões simultâneas por pool
+DEFAULT_MAX_IDLE = 30.0  # Segundos que uma conexão pode ficar ociosa (abaixo do idle-timeout padrão do servidor UDP)
+
+class ConnectionPool:
+    """Conexões com o mesmo servidor, emprestadas a um envio por vez e devolvidas abertas
+
+    Conexões ociosas são reutilizadas da mais recente para a mais antiga (a mais "quente" primeiro);
+    as que passaram de max_idle ou foram encerradas pelo servidor são descartadas. Thread-safe.
+    """
+
+    def __init__(self, host='localhost', port=8080, settings=None, size=DEFAULT_POOL_SIZE, max_idle=DEFAULT_MAX_IDLE):
+        self.host = host
+        self.port = port
+        self.settings = settings
+        self.max_idle = max_idle
+        self.idle = []    # (instante da devolução, conexão): as mais antigas no início
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)  # Conexões emprestadas (as ociosas não ocupam lugar)
+        self.closed = False
+        self.stats = {'connections_opened': 0, 'connections_reused': 0, 'connections_discarded': 0,
+                      'messages_sent': 0, 'resends': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def acquire(self, timeout=None):
+        """Empresta uma conexão: a ociosa mais recente ainda aberta ou uma nova (bloqueia com todas em uso)"""
+        if not self.slots.acquire(timeout=timeout):
+            raise TimeoutError("Nenhuma conexão do pool ficou livre a tempo")
+        try:
+            self.prune()
+            connection = self.take_idle()
+            if connection is None:
+                connection = Connection(self.host, self.port, self.settings)
+                self.count('connections_opened')
+            else:
+                self.count('connections_reused')
+            return connection
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def take_idle(self):
+        """Conexão ociosa mais recente que o servidor ainda não encerrou (None se não houver)"""
+        while True:
+            with self.lock:
+                if self.closed:
+                    raise ConnectionError("Pool de conexões encerrado")
+                if not self.idle:
+                    return None
+                _, connection = self.idle.pop()
+            if not connection.peer_closed():
+                return connection
+            log.info("[POOL] Conexão ociosa encerrada pelo servidor - descartando")
+            self.discard(connection)
+
+    def prune(self):
+        """Fecha as conexões ociosas há mais de max_idle"""
+        deadline = time.monotonic() - self.max_idle
+        with self.lock:
+            expired = 0
+            while expired < len(self.idle) and self.idle[expired][0] < deadline:
+                expired += 1
+            stale = [connection for _, connection in self.idle[:expired]]
+            del self.idle[:expired]
+        for connection in stale:
+            self.discard(connection)
+
+    def release(self, connection):
+        """Devolve a conexão emprestada: volta para as ociosas se puder ser reutilizada, senão é fechada"""
+        try:
+            with self.lock:
+                if connection.reusable and not self.closed:
+                    self.idle.append((time.monotonic(), connection))
+                    return
+            self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        """Fecha uma conexão que não volta para o pool"""
+        self.count('connections_discarded')
+        try:
+            connection.close()
+        except OSError as e:
+            log.debug("[POOL] Erro ao fechar conexão descartada: %s", e)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Conexão emprestada durante o bloco with (devolvida mesmo se o bloco falhar)"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def send(self, data, timeout=None):
+        """Envia uma mensagem por uma conexão do pool e aguarda a confirmação completa
+
+        Uma conexão reutilizada que falha antes de qualquer ACK (o servidor a fechou enquanto ociosa)
+        é descartada e o envio repetido em outra; o mesmo vale para um ticket recusado.
+        """
+        while True:
+            with self.connection(timeout) as connection:
+                reused = connection.next_stream_id > 0
+                acks = connection.stats['acks_received']
+                try:
+                    connection.send(data)
+                except TicketRejected:
+                    pass  # Ticket apagado: a próxima conexão faz o handshake completo
+                except OSError as e:
+                    if not reused or connection.stats['acks_received'] != acks:
+                        raise
+                    log.info("[POOL] Conexão reutilizada falhou sem confirmar nada (%s) - reenviando por outra", e)
+                else:
+                    self.count('messages_sent')
+                    return
+            self.count('resends')
+
+    def close(self):
+        """Fecha as conexões ociosas; as emprestadas são fechadas quando devolvidas"""
+        with self.lock:
+            self.closed = True
+            idle = [connection for _, connection in self.idle]
+            self.idle = []
+        for connection in idle:
+            self.discard(connection)
@@ -0,0 +1,418 @@
+import sys
+import json
+import zlib
+import array
+import struct
+
+try:
+    from crc32c import crc32c  # CRC32C (Castagnoli) em C, opcional: pip install crc32c
+except ImportError:
+    crc32c = None
+
+# Formatos de pacote compartilhados entre cliente e servidor
+
+# Codificações suportadas para os pacotes após o handshake (em ordem de preferência)
+# O handshake e sua resposta são sempre em JSON, pois é neles que a codificação é negociada
+PACKET_ENCODINGS = ('binary', 'json')
+
+# Limites negociados no handshake (em caracteres)
+DEFAULT_SEGMENT_SIZE = 4               # Segmento do protocolo original (clientes/servidores antigos)
+MAX_SEGMENT_SIZE = 64 * 1024           # Maior segmento negociável (64 KiB)
+DEFAULT_MAX_MESSAGE_SIZE = 1024 ** 3   # Limite padrão de mensagem (1 GiB)
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# Cabeçalho binário fixo: tipo (1), flags (1), número de sequência (4), checksum (4), tamanho do payload (4)
+BINARY_HEADER = struct.Struct('!BBIII')
+
+# Espaço de números de sequência no fio: módulo 2^32, o tamanho do campo; as pontas contam sem limite e
+# recuperam o número completo a partir da própria janela (a janela precisa ser menor que metade do espaço)
+SEQ_SPACE = 1 << 32
+SEQ_MASK = SEQ_SPACE - 1
+
+# Bloco SACK no formato binário: início e fim (inclusive) de um intervalo recebido fora de ordem
+SACK_BLOCK = struct.Struct('!II')
+MAX_SACK_BLOCKS = 8 # Blocos por ACK (o que contém o pacote mais recente vem primeiro)
+
+PACKET_TYPES = {"data": 1, "ack": 2, "nack": 3, "error": 4, "fin": 5}
+PACKET_TYPE_NAMES = {code: name for name, code in PACKET_TYPES.items()}
+
+FLAG_ENCRYPTED = 0x01  # Payload criptografado
+FLAG_CUMULATIVE = 0x02 # ACK cumulativo (confirma todos os pacotes até seq_num)
+FLAG_SACK = 0x04       # ACK com blocos SACK no lugar do payload
+FLAG_GAP = 0x08        # NACK de lacuna (pacote esperado não chegou), não de checksum
+FLAG_WINDOW = 0x10     # ACK/NACK anuncia a janela de recepção no campo do checksum
+FLAG_STREAM = 0x20     # Identificador do fluxo (4 bytes) logo após o cabeçalho; ausente = fluxo 0
+FLAG_END = 0x40        # Último pacote de dados da mensagem do fluxo (marcador de fim)
+
+# Identificador do fluxo no formato binário (conexões multiplexadas)
+STREAM_ID = struct.Struct('!I')
+
+# Buffer de leitura dos quadros TCP: começa pequeno e dobra enquanto as leituras o enchem
+INITIAL_READ_BUFFER = 16 * 1024
+MAX_READ_BUFFER = 1024 * 1024
+
+# Maior quadro aceito: o prefixo de tamanho vem do outro lado, antes de qualquer autenticação
+MAX_HANDSHAKE_FRAME = 64 * 1024  # Handshake, sua resposta, ACKs e erros (JSON com chaves e ticket cabe com folga)
+FRAME_OVERHEAD = 1024            # Cabeçalho, fluxo, campos JSON e tag de autenticação de um pacote de dados
+MAX_CHAR_BYTES = {'binary': 4, 'json': 24}  # Bytes por caractere do segmento no pior caso (JSON: cifrado e escapado)
+
+# Buffers por chamada sendmsg (IOV_MAX do Linux)
+MAX_SEND_BUFFERS = 1024
+
+# Transporte em datagramas (UDP): cada pacote ocupa um datagrama, sem o prefixo de tamanho
+TRANSPORTS = ('tcp', 'udp')
+MAX_DATAGRAM_SIZE = 65507  # Maior payload UDP sobre IPv4
+UDP_IP_OVERHEAD = 28       # Cabeçalhos IPv4 (20) + UDP (8)
+
+# Bytes que não são UTF-8 válido (arquivos/stdin) viajam como surrogates e voltam intactos
+TEXT_ERRORS = 'surrogateescape'
+
+# Codificação em que cada caractere vira um inteiro de 4 bytes na ordem nativa (soma original em C)
+CODE_POINTS = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+def legacy_sum(text):
+    """Checksum original: soma dos códigos dos caracteres módulo 256 (clientes/servidores antigos)"""
+    return sum(memoryview(text.encode(CODE_POINTS, 'surrogatepass')).cast('I')) % 256
+
+def internet_checksum(data):
+    """Checksum da Internet (RFC 1071): complemento de 1 da soma de palavras de 16 bits"""
+    if len(data) % 2:
+        data += b'\0'
+    # A soma em complemento de 1 independe da ordem dos bytes: somar na ordem nativa e trocar no fim
+    total = sum(array.array('H', data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    total = ~total & 0xFFFF
+    if sys.byteorder == 'little':
+        total = ((total & 0xFF) << 8) | (total >> 8)
+    return total
+
+# Algoritmos de integridade negociáveis (em ordem de preferência); todos exceto "sum" usam os bytes UTF-8
+CHECKSUM_FUNCTIONS = {
+    'crc32': zlib.crc32,
+    'adler32': zlib.adler32,
+    'internet': internet_checksum,
+}
+if crc32c is not None:
+    CHECKSUM_FUNCTIONS = {'crc32c': crc32c, **CHECKSUM_FUNCTIONS}
+CHECKSUM_ALGORITHMS = (*CHECKSUM_FUNCTIONS, 'sum')
+
+def compute_checksum(text, algorithm='sum'):
+    """Checksum do payload (antes da criptografia) no algoritmo negociado"""
+    if algorithm == 'sum':
+        return legacy_sum(text)
+    return CHECKSUM_FUNCTIONS[algorithm](text.encode('utf-8', TEXT_ERRORS))
+
+def frame(data):
+    """Adiciona o prefixo de tamanho (4 bytes) ao conteúdo"""
+    return len(data).to_bytes(4, byteorder='big') + data
+
+def receive_exactly(sock, size):
+    """Lê exatamente `size` bytes com recv_into em um buffer pré-alocado"""
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Conexão fechada durante recebimento de dados")
+        received += count
+    return data
+
+def max_frame_size(segment_size, encoding):
+    """Maior quadro válido após o handshake: um segmento do MSS negociado no pior caso da codificação"""
+    return max(MAX_HANDSHAKE_FRAME, FRAME_OVERHEAD + MAX_CHAR_BYTES[encoding] * segment_size)
+
+def check_frame_size(size, limit):
+    """ValueError se o prefixo de tamanho não couber no limite (antes de alocar o buffer)"""
+    if size <= 0:
+        raise ValueError("Tamanho de mensagem inválido")
+    if size > limit:
+        raise ValueError(f"Quadro de {size} bytes excede o limite de {limit}")
+
+class FrameReader:
+    """Quadros com prefixo de tamanho lidos com recv_into em um buffer reutilizável
+
+    Cada leitura pode trazer vários quadros; eles são entregues como fatias (memoryview) do próprio
+    buffer, sem cópia, e só valem até a próxima leitura. Quadros maiores que max_frame são recusados
+    (ValueError) antes de o buffer crescer.
+    """
+
+    def __init__(self, capacity=INITIAL_READ_BUFFER, max_frame=MAX_HANDSHAKE_FRAME):
+        self.max_frame = max_frame  # Ajustado pelo dono do leitor ao fim do handshake
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0        # Início dos bytes ainda não consumidos
+        self.end = 0          # Fim dos bytes recebidos
+        self.filled = False   # A última leitura ocupou todo o espaço livre (buffer pequeno para o fluxo)
+
+    def next_frame(self):
+        """Próximo quadro completo já recebido (sem o prefixo), ou None"""
+        available = self.end - self.start
+        if available < 4:
+            return None
+        size = int.from_bytes(self.view[self.start:self.start + 4], byteorder='big')
+        check_frame_size(size, self.max_frame)
+        if available < 4 + size:
+            return None  # Quadro incompleto, aguardar mais dados
+        begin = self.start + 4
+        self.start = begin + size
+        return self.view[begin:self.start]
+
+    def reserve(self):
+        """Abre espaço no fim do buffer: move o quadro incompleto para o início e cresce se necessário"""
+        pending = self.end - self.start
+        needed = 4
+        if pending >= 4:
+            size = int.from_bytes(self.view[self.start:self.start + 4], byteorder='big')
+            check_frame_size(size, self.max_frame)
+            needed += size
+        capacity = len(self.buffer)
+        if self.filled and capacity < MAX_READ_BUFFER:
+            capacity *= 2
+        capacity = max(capacity, needed)
+        if capacity != len(self.buffer):
+            buffer = bytearray(capacity)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        elif self.start:
+            self.view[:pending] = self.view[self.start:self.end]
+        self.start, self.end = 0, pending
+
+    def read_from(self, sock):
+        """Uma chamada recv_into no espaço livre; devolve os bytes lidos (0: conexão fechada)"""
+        self.reserve()
+        free = len(self.buffer) - self.end
+        received = sock.recv_into(self.view[self.end:])
+        self.end += received
+        self.filled = received == free
+        return received
+
+class FrameWriter:
+    """Quadros com prefixo de tamanho acumulados e enviados juntos com sendmsg (scatter-gather)
+
+    Prefixos e mensagens seguem como buffers separados, sem concatenação; escritas parciais são retomadas
+    e o que não foi enviado (ex.: timeout do socket) continua na fila para o próximo flush.
+    """
+
+    def __init__(self):
+        self.buffers = []  # Prefixos e mensagens ainda não enviados, em ordem
+        self.calls = 0     # Chamadas de sistema de envio feitas
+
+    def add(self, data):
+        """Enfileira uma mensagem serializada com o seu prefixo de tamanho"""
+        self.buffers += (len(data).to_bytes(4, byteorder='big'), data)
+
+    def flush(self, sock):
+        """Envia todos os quadros pendentes, normalmente em uma única chamada"""
+        if not hasattr(sock, 'sendmsg'):
+            # Plataformas sem sendmsg (Windows): um único buffer contíguo
+            self.buffers[:] = [b''.join(self.buffers)]
+        while self.buffers:
+            if len(self.buffers) == 1:
+                sent = sock.send(self.buffers[0])
+            else:
+                sent = sock.sendmsg(self.buffers[:MAX_SEND_BUFFERS])
+            self.calls += 1
+            done = 0
+            while done < len(self.buffers) and sent >= len(self.buffers[done]):
+                sent -= len(self.buffers[done])
+                done += 1
+            del self.buffers[:done]
+            if sent:
+                self.buffers[0] = memoryview(self.buffers[0])[sent:]
+
+class SequenceRing:
+    """Buffer circular de capacidade fixa indexado por seq % capacidade, com mapa das posições ocupadas
+
+    Guarda os pacotes de uma janela [base, base + capacidade): memória fixa e acesso por índice, sem hashing.
+    O número completo guardado em cada posição evita confundir pacotes separados por uma volta do buffer.
+    """
+    __slots__ = ('capacity', 'values', 'seqs', 'present', 'count')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = [None] * capacity
+        self.seqs = [-1] * capacity            # Número de sequência de cada posição (-1: livre)
+        self.present = bytearray(capacity)     # Mapa de ocupação: 1 nas posições com pacote
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, seq):
+        return self.seqs[seq % self.capacity] == seq
+
+    def put(self, seq, value):
+        """Guarda o pacote na posição de seq (quem chama garante seq dentro da janela)"""
+        index = seq % self.capacity
+        if not self.present[index]:
+            self.present[index] = 1
+            self.count += 1
+        self.seqs[index] = seq
+        self.values[index] = value
+
+    def get(self, seq, default=None):
+        index = seq % self.capacity
+        return self.values[index] if self.seqs[index] == seq else default
+
+    def pop(self, seq, default=None):
+        """Remove e devolve o pacote de seq (default se a posição guarda outro número ou está livre)"""
+        index = seq % self.capacity
+        if self.seqs[index] != seq:
+            return default
+        value = self.values[index]
+        self.values[index] = None
+        self.seqs[index] = -1
+        self.present[index] = 0
+        self.count -= 1
+        return value
+
+    def clear(self):
+        self.values = [None] * self.capacity
+        self.seqs = [-1] * self.capacity
+        self.present = bytearray(self.capacity)
+        self.count = 0
+
+    def sequences(self, base):
+        """Números guardados em ordem crescente, para uma janela que começa em base"""
+        start = base % self.capacity
+        present, seqs = self.present, self.seqs
+        for begin, end in ((start, self.capacity), (0, start)):
+            index = present.find(1, begin, end)  # Busca em C no mapa de ocupação
+            while index != -1:
+                yield seqs[index]
+                index = present.find(1, index + 1, end)
+
+def unwrap_seq(wire_seq, reference):
+    """Número completo mais próximo de reference (ex.: o próximo esperado) com o valor wire_seq no fio"""
+    candidate = reference - (reference & SEQ_MASK) + wire_seq
+    if candidate - reference > SEQ_SPACE // 2:
+        candidate -= SEQ_SPACE
+    elif reference - candidate > SEQ_SPACE // 2:
+        candidate += SEQ_SPACE
+    return candidate if candidate >= 0 else candidate + SEQ_SPACE
+
+def parse_size(value):
+    """Converte tamanhos como '100', '64K', '16M' ou '1G' para número de caracteres"""
+    text = str(value).strip().upper()
+    multiplier = 1
+    if text and text[-1] in SIZE_SUFFIXES:
+        multiplier = SIZE_SUFFIXES[text[-1]]
+        text = text[:-1]
+    size = int(text) * multiplier
+    if size <= 0:
+        raise ValueError(f"Tamanho deve ser positivo: {value}")
+    return size
+
+def is_positive_int(value):
+    """Verifica se um valor recebido no handshake é um inteiro positivo"""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def is_name_list(value):
+    """Verifica se um valor recebido no handshake é uma lista de nomes (codificações, algoritmos, cifras)"""
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def choose_packet_encoding(offered):
+    """Escolhe a primeira codificação oferecida que também é suportada (JSON como fallback)"""
+    for encoding in offered:
+        if encoding in PACKET_ENCODINGS:
+            return encoding
+    return 'json'
+
+def is_json_datagram(data):
+    """Handshake e sua resposta são sempre JSON, mesmo depois de negociada a codificação binária"""
+    return data[:1] == b'{'
+
+def choose_checksum_algorithm(offered):
+    """Escolhe o primeiro algoritmo oferecido que também é suportado (soma original como fallback)"""
+    for algorithm in offered:
+        if algorithm in CHECKSUM_ALGORITHMS:
+            return algorithm
+    return 'sum'
+
+def encode_packet(packet, encoding='json'):
+    """Serializa um pacote (dicionário) na codificação negociada"""
+    if encoding != 'binary':
+        sack = packet.get("sack") if packet["type"] == "ack" else None  # No handshake "sack" é a opção negociada
+        if packet.get("seq_num", 0) > SEQ_MASK or (sack and any(end > SEQ_MASK for _, end in sack)):
+            # Mesmo espaço de sequência do formato binário (só copia o pacote quando há o que reduzir)
+            packet = dict(packet, seq_num=packet["seq_num"] & SEQ_MASK)
+            if sack:
+                packet["sack"] = [[start & SEQ_MASK, end & SEQ_MASK] for start, end in sack]
+        return json.dumps(packet).encode('utf-8')
+
+    flags = FLAG_ENCRYPTED if packet.get("encrypted") else 0
+    if packet.get("cumulative"):
+        flags |= FLAG_CUMULATIVE
+    if packet.get("gap"):
+        flags |= FLAG_GAP
+    if packet.get("end"):
+        flags |= FLAG_END
+    stream_id = b''
+    if packet.get("stream"):
+        flags |= FLAG_STREAM
+        stream_id = STREAM_ID.pack(packet["stream"])
+    checksum = packet.get("checksum", 0)
+    if "window" in packet:
+        # ACKs não têm checksum: o campo leva a janela de recepção anunciada
+        flags |= FLAG_WINDOW
+        checksum = packet["window"]
+    if packet.get("sack"):
+        # ACKs levam os blocos SACK no lugar do payload
+        flags |= FLAG_SACK
+        payload = b''.join(SACK_BLOCK.pack(start & SEQ_MASK, end & SEQ_MASK) for start, end in packet["sack"])
+    else:
+        # Pacotes de erro levam o motivo no lugar do payload
+        text = packet.get("reason", "") if packet["type"] == "error" else packet.get("payload", "")
+        payload = text.encode('utf-8', TEXT_ERRORS)
+    header = BINARY_HEADER.pack(PACKET_TYPES[packet["type"]], flags, packet["seq_num"] & SEQ_MASK,
+                                checksum, len(payload))
+    return header + stream_id + payload
+
+def decode_packet(data, encoding='json'):
+    """Converte bytes recebidos de volta para o dicionário do pacote"""
+    if encoding != 'binary':
+        return json.loads(str(data, 'utf-8'))  # Aceita bytes ou fatias (memoryview) do buffer de leitura
+
+    if len(data) < BINARY_HEADER.size:
+        raise ValueError("Pacote binário truncado")
+    type_code, flags, seq_num, checksum, length = BINARY_HEADER.unpack_from(data)
+    packet_type = PACKET_TYPE_NAMES.get(type_code)
+    if packet_type is None:
+        raise ValueError(f"Tipo de pacote desconhecido: {type_code}")
+
+    packet = {"type": packet_type, "seq_num": seq_num}
+    offset = BINARY_HEADER.size
+    if flags & FLAG_STREAM:
+        if len(data) < offset + STREAM_ID.size:
+            raise ValueError("Identificador de fluxo truncado")
+        packet["stream"], = STREAM_ID.unpack_from(data, offset)
+        offset += STREAM_ID.size
+    if flags & FLAG_END:
+        packet["end"] = True
+    if flags & FLAG_CUMULATIVE:
+        packet["cumulative"] = True
+    if flags & FLAG_GAP:
+        packet["gap"] = True
+    if flags & FLAG_WINDOW:
+        packet["window"] = checksum
+    if flags & FLAG_SACK:
+        end = offset + length
+        if len(data) < end or length % SACK_BLOCK.size:
+            raise ValueError("Blocos SACK truncados")
+        packet["sack"] = [list(block) for block in SACK_BLOCK.iter_unpack(data[offset:end])]
+    if packet_type in ("data", "error"):
+        end = offset + length
+        if len(data) < end:
+            raise ValueError("Payload binário truncado")
+        text = str(data[offset:end], 'utf-8', TEXT_ERRORS)
+        if packet_type == "error":
+            packet["reason"] = text
+        else:
+            packet["payload"] = text
+            packet["checksum"] = checksum
+            if flags & FLAG_ENCRYPTED:
+                packet["encrypted"] = True
+    return packet
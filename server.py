@@ -1,81 +1,59 @@
+import os
+import sys
+import base64
+import time
+import heapq
 import socket
-import json
+import logging
 import argparse
+import itertools
+import selectors
+from collections import OrderedDict
 
-# Servidor com troca de mensagens
+from protocol import (encode_packet, decode_packet, frame, choose_packet_encoding, choose_checksum_algorithm,
+                      compute_checksum, parse_size, receive_exactly, FrameReader, SequenceRing, unwrap_seq,
+                      check_frame_size, max_frame_size, MAX_HANDSHAKE_FRAME,
+                      is_positive_int, is_name_list, is_json_datagram, DEFAULT_SEGMENT_SIZE, MAX_SEGMENT_SIZE,
+                      DEFAULT_MAX_MESSAGE_SIZE, MAX_SACK_BLOCKS, SEQ_SPACE, TRANSPORTS, TEXT_ERRORS)
+from ciphers import KeyExchange, caesar_decrypt, choose_cipher, resume_session
+from tickets import TicketStore, RESUME_NONCE_BYTES
+from logs import add_logging_arguments, configure_logging
+from compression import PayloadDecoder, choose_compression, COMPRESSION_MODES, MAX_UTF8_BYTES
+from metrics import MetricsRegistry, MetricsEndpoint, OCCUPANCY_BUCKETS
+from workers import Supervisor
 
-# ===== CONFIGURAÇÕES DO SERVIDOR (via CLI) =====
-parser = argparse.ArgumentParser(description='Servidor do Protocolo de Transporte Confiável')
-parser.add_argument('--host', type=str, default='localhost', help='Endereço do servidor (padrão: localhost)')
-parser.add_argument('--port', type=int, default=8080, help='Porta do servidor (padrão: 8080)')
-parser.add_argument('--window-size', type=int, default=5, help='Tamanho da janela (padrão: 5)')
+try:
+    import resource  # Disponível apenas em sistemas POSIX
+except ImportError:
+    resource = None
 
-args = parser.parse_args()
+# Servidor com troca de mensagens (vários clientes simultâneos via laço de eventos)
 
-HOST = args.host
-PORT = args.port
-WINDOW_SIZE = args.window_size
+log = logging.getLogger('server')
 
-def send_message(socket, message):
+def send_message(socket, message, encoding='json'):
     """Envia uma mensagem com framing"""
-    json_data = json.dumps(message) # Converte dicionário para JSON
-    message_bytes = json_data.encode('utf-8') # Converte a string para bytes
-    socket.send(len(message_bytes).to_bytes(4, byteorder='big')) # Envia tamanho primeiro (4 bytes)
-    socket.send(message_bytes) # Envia a mensagem
+    message_bytes = encode_packet(message, encoding) # Serializa na codificação negociada
+    socket.sendall(frame(message_bytes)) # Tamanho (4 bytes) e mensagem em uma única escrita
 
-def receive_message(socket):
+def receive_message(socket, encoding='json', max_frame=MAX_HANDSHAKE_FRAME):
     """Recebe uma mensagem com framing"""
-    size_data = socket.recv(4) # Recebe os 4 bytes do tamanho
-    
-    # Verificar se a conexão foi fechada
-    if not size_data or len(size_data) == 0:
-        raise ConnectionError("Conexão fechada pelo cliente")
-    
-    # Verificar se recebemos os 4 bytes completos
-    if len(size_data) < 4:
-        raise ConnectionError("Conexão fechada antes de receber tamanho completo")
-    
-    size = int.from_bytes(size_data, byteorder='big') # Converte para número
-    
-    # Verificar se o tamanho é válido
-    if size <= 0:
-        raise ValueError("Tamanho de mensagem inválido")
-    
-    message_data = b'' # Buffer para a mensagem (string de bytes)
-    while len(message_data) < size: # Recebe até completar o tamanho
-        chunk = socket.recv(size - len(message_data))
-        if not chunk:  # Conexão fechada durante recebimento
-            raise ConnectionError("Conexão fechada durante recebimento de dados")
-        message_data += chunk
-    
-    # Verificar se recebemos dados válidos
-    if not message_data:
-        raise ValueError("Mensagem vazia recebida")
-    
-    return json.loads(message_data.decode('utf-8')) # Converte de volta para dicionário
-
-def caesar_decrypt(text, shift):
-    """Descriptografa texto usando Cifra de César (desloca no sentido oposto)"""
-    result = []
-    for char in text:
-        if char.isalpha():
-            # Determinar se é maiúscula ou minúscula
-            base = ord('A') if char.isupper() else ord('a')
-            # Aplicar deslocamento circular no sentido oposto
-            shifted = (ord(char) - base - shift) % 26
-            result.append(chr(base + shifted))
-        else:
-            # Manter caracteres não-alfabéticos inalterados
-            result.append(char)
-    return ''.join(result)
+    # Os 4 bytes do tamanho podem chegar em mais de um recv: ler até completá-los
+    size = int.from_bytes(receive_exactly(socket, 4), byteorder='big') # Converte para número
+
+    # Verificar se o tamanho é válido (antes de alocar o buffer do tamanho pedido)
+    check_frame_size(size, max_frame)
+
+    message_data = receive_exactly(socket, size) # Buffer pré-alocado do tamanho da mensagem
+    return decode_packet(message_data, encoding) # Converte de volta para dicionário
 
-def calculate_checksum(data):
-    """Calcula soma de verificação simples"""
-    return sum(ord(c) for c in data) % 256 # Soma valores ASCII e pega resto da divisão por 256
+def calculate_checksum(data, algorithm='sum'):
+    """Calcula a soma de verificação no algoritmo negociado (padrão: soma original módulo 256)"""
+    return compute_checksum(data, algorithm)
 
-def verify_checksum(payload, received_checksum):
+def verify_checksum(payload, received_checksum, algorithm='sum'):
     """Verifica se a soma de verificação está correta"""
-    calculated_checksum = calculate_checksum(payload) # Calcula checksum do payload
+    calculated_checksum = calculate_checksum(payload, algorithm) # Calcula checksum do payload
     return calculated_checksum == received_checksum # Compara com o recebido
 
 def create_ack_packet(seq_num):
@@ -85,6 +63,14 @@ def create_ack_packet(seq_num):
         "seq_num": seq_num # Número do pacote confirmado
     }
 
+def create_cumulative_ack_packet(seq_num):
+    """Cria um ACK cumulativo: confirma todos os pacotes até seq_num (inclusive)"""
+    return {
+        "type": "ack",      # Tipo de confirmação
+        "seq_num": seq_num, # Maior número entregue em ordem (expected_seq - 1)
+        "cumulative": True  # Confirma também todos os anteriores
+    }
+
 def create_nack_packet(seq_num):
     """Cria um pacote de reconhecimento negativo"""
     return {
@@ -92,176 +78,1344 @@ def create_nack_packet(seq_num):
         "seq_num": seq_num # Número do pacote rejeitado
     }
 
-# Configurar servidor
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # Socket TCP
-server_socket.bind((HOST, PORT)) # Associar ao endereço e porta
-server_socket.listen(1) # Aguardar conexões (1 cliente por vez)
-
-print(f"Servidor iniciado em {HOST}:{PORT}")
-print("Aguardando conexões...")
-
-while True:
-    # Aguardar conexão de cliente
-    client_socket, client_address = server_socket.accept()
-    print(f"Conexão estabelecida com {client_address}") 
-    
-    # Handshake - negociação inicial
-    print("Iniciando handshake...")
-    
-    handshake_data = receive_message(client_socket) # Receber handshake do cliente
-    print(f"Dados recebidos: {handshake_data}")
-    
-    # Verificar se cliente solicitou criptografia
-    encryption_enabled = handshake_data.get("encryption_enabled", False)
-    caesar_shift = None
-    
-    if encryption_enabled:
-        # Receber shift da Cifra de César do cliente
-        if "caesar_shift" in handshake_data:
-            caesar_shift = handshake_data["caesar_shift"]
-            print(f"[ENCRYPTION] Cifra de César recebida com deslocamento: {caesar_shift}")
-        else:
-            print("[WARNING] Criptografia solicitada mas shift não fornecido")
-            encryption_enabled = False
-    
-    # Enviar resposta do handshake
-    response = {
-        "type": "handshake_ack",                                # Confirmação do handshake
-        "max_message_size": handshake_data["max_message_size"], # Confirmar tamanho
-        "window_size": WINDOW_SIZE,                             # Tamanho da janela
-        "operation_mode": handshake_data["operation_mode"],     # Confirmar modo
-        "encryption_enabled": encryption_enabled,               # Confirmar criptografia
-        "status": "success"                                     # Status de sucesso
+def create_gap_nack_packet(seq_num):
+    """Cria um NACK de lacuna: seq_num é o próximo pacote esperado, que não chegou"""
+    return {
+        "type": "nack",     # Tipo de rejeição
+        "seq_num": seq_num, # Pacote que falta (expected_seq)
+        "gap": True         # Lacuna, não erro de checksum
     }
-    
-    send_message(client_socket, response) # Enviar confirmação (handshake_ack)
-    
-    print(f"Handshake concluído:")
-    print(f"  - Tamanho máximo: {handshake_data['max_message_size']}")
-    print(f"  - Modo: {handshake_data['operation_mode']}")
-    if encryption_enabled:
-        print(f"  - Criptografia: Habilitada")
-    
-    # Troca de mensagens - recebimento dos dados
-    print("\n=== INICIANDO TROCA DE MENSAGENS ===")
-    
-    received_segments = [] # Lista para armazenar segmentos recebidos
-    expected_seq = 0       # Próximo número de sequência esperado
-    
-    # Variáveis para Selective Repeat
-    operation_mode = handshake_data.get("operation_mode", "go_back_n")
-    buffer = {}  # Buffer para armazenar pacotes fora de ordem
-    
-    if operation_mode == "selective_repeat":
-        print(f"[SR] Iniciando Selective Repeat com janela de tamanho: {WINDOW_SIZE}")
-        print(f"[BUFFER] Buffer de recebimento: {WINDOW_SIZE * 2} pacotes")
-    else:
-        print(f"[GBN] Iniciando Go-Back-N com janela de tamanho: {WINDOW_SIZE}")
-    
-    try:
-        while True:
-            # Receber pacote de dados do cliente
+
+def create_fin_packet(seq_num):
+    """Cria um pacote de encerramento (UDP não tem conexão para fechar)"""
+    return {
+        "type": "fin",     # Fim da transferência
+        "seq_num": seq_num # Próximo número de sequência (total de pacotes enviados)
+    }
+
+def create_error_packet(seq_num, reason):
+    """Cria um pacote de erro que encerra a sessão"""
+    return {
+        "type": "error",   # Violação dos parâmetros negociados
+        "seq_num": seq_num, # Pacote que causou o erro
+        "reason": reason   # Descrição do problema
+    }
+
+def raise_open_file_limit():
+    """Eleva o limite de descritores abertos até o máximo permitido (milhares de conexões)"""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+def open_output(target, session_id, client_address, stream_id=0):
+    """Abre o destino dos dados entregues: stdout, um arquivo por sessão/fluxo (diretório) ou arquivo único"""
+    if target == '-':
+        return sys.__stdout__, False # Compartilhado entre sessões, não fechar
+    if os.path.isdir(target):
+        host, port = client_address[0], client_address[1]
+        suffix = f"_stream_{stream_id}" if stream_id else ""
+        target = os.path.join(target, f"session_{session_id}_{host}_{port}{suffix}.txt")
+    return open(target, 'a', encoding='utf-8', errors='surrogateescape', newline=''), True
+
+def is_shared_output(target):
+    """Destino único (stdout ou um arquivo): fluxos simultâneos intercalariam as mensagens nele"""
+    return target is not None and (target == '-' or not os.path.isdir(target))
+
+RECEIVED_TYPES = ("handshake", "data", "fin")     # Tipos de pacote do cliente contados separadamente nas métricas
+SENT_TYPES = ("handshake_ack", "ack", "nack", "fin", "error") # ... e enviados pelo servidor
+
+class ServerMetrics:
+    """Métricas do servidor, expostas pelo endpoint HTTP (referências guardadas para não buscar rótulos por pacote)"""
+
+    def __init__(self, settings):
+        self.registry = registry = MetricsRegistry()
+        self.sessions = registry.counter('sessions_total', 'Sessões (conexões TCP ou clientes UDP) atendidas')
+        self.active_sessions = registry.gauge('sessions_active', 'Sessões abertas')
+        self.active_streams = registry.gauge('streams_active', 'Fluxos com mensagem em andamento')
+        self.handshakes = registry.counter('handshakes_total', 'Handshakes por resultado', ('result',))
+        packets_received = registry.counter('packets_received_total', 'Pacotes recebidos por tipo', ('type',))
+        # Tipos vindos do cliente: os desconhecidos são contados como "other" (não criam rótulos novos)
+        self.received_by_type = {packet_type: packets_received.labels(packet_type) for packet_type in RECEIVED_TYPES}
+        self.received_other = packets_received.labels('other')
+        self.bytes_received = registry.counter('bytes_received_total', 'Bytes de pacotes recebidos (sem o prefixo de tamanho)')
+        packets_sent = registry.counter('packets_sent_total', 'Pacotes enviados por tipo', ('type',))
+        self.sent_by_type = {packet_type: packets_sent.labels(packet_type) for packet_type in SENT_TYPES}
+        self.bytes_sent = registry.counter('bytes_sent_total', 'Bytes de pacotes enviados (sem o prefixo de tamanho)')
+        self.corrupt = registry.counter('corrupt_packets_total', 'Pacotes com checksum ou tag de autenticação inválidos')
+        self.duplicates = registry.counter('duplicate_packets_total', 'Pacotes de dados já recebidos (ACK perdido ou retransmissão)')
+        self.out_of_order = registry.counter('out_of_order_packets_total', 'Pacotes de dados além do próximo esperado')
+        self.beyond_window = registry.counter('beyond_window_packets_total', 'Pacotes descartados por excederem a janela anunciada')
+        self.delivered = registry.counter('delivered_chars_total', 'Caracteres entregues em ordem')
+        self.compressed = registry.counter('compressed_payload_bytes_total', 'Bytes de payload comprimido entregues (antes da descompressão)')
+        self.messages = registry.counter('messages_completed_total', 'Mensagens recebidas por inteiro')
+        self.occupancy = registry.histogram('reorder_buffer_occupancy', 'Pacotes no buffer fora de ordem a cada pacote recebido (Selective Repeat)',
+                                            OCCUPANCY_BUCKETS)
+        self.buffered = registry.series('reorder_buffer_packets', 'Pacotes fora de ordem guardados em todas as sessões, ao longo do tempo')
+        self.buffered.record(0)
+        registry.gauge('tickets_stored', 'Tickets de sessão válidos guardados',
+                       function=lambda: len(settings.tickets) if settings.tickets is not None else 0)
+
+    def buffer_changed(self, delta):
+        """Pacotes entraram (ou saíram) de algum buffer fora de ordem"""
+        self.buffered.record(self.buffered.value + delta)
+
+class ServerSettings:
+    """Parâmetros que o servidor oferece e impõe no handshake"""
+
+    def __init__(self, window_size=64, max_message_size=DEFAULT_MAX_MESSAGE_SIZE,
+                 max_segment_size=MAX_SEGMENT_SIZE, output=None, ack_every=2, ack_delay=0.02,
+                 idle_timeout=60.0, tcp_nodelay=True, max_streams=64, ticket_lifetime=3600.0, handler=None):
+        self.window_size = window_size
+        self.max_message_size = max_message_size # Maior mensagem aceita (caracteres)
+        self.max_segment_size = max_segment_size # Maior segmento aceito (caracteres)
+        self.output = output                     # Destino em streaming (None = reconstruir em memória)
+        self.ack_every = ack_every               # ACK cumulativo a cada N pacotes em ordem
+        self.ack_delay = ack_delay               # ... ou após este atraso (segundos)
+        self.idle_timeout = idle_timeout         # Sessões UDP sem tráfego por este tempo são encerradas
+        self.tcp_nodelay = tcp_nodelay           # Desativar o algoritmo de Nagle nas conexões aceitas
+        self.max_streams = max_streams           # Fluxos (mensagens) simultâneos por conexão multiplexada
+        # Tickets de sessão emitidos a cada handshake (None: retomada desativada)
+        self.tickets = TicketStore(ticket_lifetime) if ticket_lifetime > 0 else None
+        self.metrics = ServerMetrics(self)
+        self.handler = handler                   # Chamado com (texto, endereço) a cada mensagem completa em memória
+        # Mensagens enviadas em faixas por várias conexões: (host do cliente, id) -> StripeAssembly
+        # (None: recusadas, ex.: workers em processos separados não veem as faixas uns dos outros)
+        self.stripes = {}
+
+session_ids = itertools.count(1) # Identificador sequencial de cada conexão aceita
+
+MAX_DATAGRAM_BUFFER = 65535 # Maior datagrama lido de uma vez
+MAX_FINISHED_STREAMS = 4096 # Fluxos concluídos lembrados por conexão (para reconfirmar duplicatas atrasadas)
+MAX_TRANSFER_ID = 64        # Maior identificador de transferência em faixas aceito
+IDLE_CHECK_INTERVAL = 1.0   # Intervalo entre verificações de sessões UDP inativas (segundos)
+
+class ReceiveStream:
+    """Mensagem de um fluxo: sequência própria, buffer fora de ordem e entrega em ordem
+
+    Conexões sem multiplexação têm apenas o fluxo 0, concluído quando a conexão é encerrada.
+    """
+
+    def __init__(self, session, stream_id):
+        self.session = session
+        self.stream_id = stream_id
+        self.received_segments = []  # Lista para armazenar segmentos recebidos
+        self.received_size = 0       # Caracteres já entregues em ordem
+        self.delivered_count = 0     # Segmentos já entregues em ordem
+        self.output = None           # Destino em streaming (arquivo/stdout), se configurado
+        self.owns_output = False
+        self.expected_seq = 0        # Próximo número de sequência esperado
+        self.buffer = SequenceRing(session.window_size) # Pacotes fora de ordem (Selective Repeat), limitado à janela
+        self.pending_acks = 0        # Pacotes em ordem ainda não confirmados
+        self.end_seq = None          # Pacote com o marcador de fim da mensagem, quando aceito
+        # Descompressão negociada, aplicada na entrega em ordem
+        self.decoder = PayloadDecoder(session.compression, session.compression_mode) if session.compression else None
+        settings = session.settings
+        self.metrics = settings.metrics
+        self.metrics.active_streams.inc()
+        if settings.output is not None and session.stripe is None:
+            # Faixas ficam em memória: a StripeAssembly grava a mensagem inteira na ordem dos deslocamentos
+            self.output, self.owns_output = open_output(settings.output, session.session_id, session.address, stream_id)
+            log.info("[OUTPUT] Dados entregues serão gravados em: %s", getattr(self.output, 'name', settings.output))
+
+    def send(self, message):
+        """Envia uma resposta identificando o fluxo (o fluxo 0 mantém o formato original)"""
+        if self.stream_id:
+            message["stream"] = self.stream_id
+        self.session.send(message)
+
+    def deliver(self, seq_num, payload):
+        """Entrega um segmento em ordem, respeitando o tamanho máximo negociado"""
+        if self.decoder is not None:
+            self.metrics.compressed.inc(len(payload))
+            try:
+                # Limite da descompressão: o que ainda cabe na mensagem, no pior caso de bytes por caractere
+                payload = self.decoder.decode(payload, (self.session.max_message_size - self.received_size) * MAX_UTF8_BYTES + 3)
+            except ValueError as e:
+                self.session.abort(seq_num, f"Segmento {seq_num} com compressão inválida: {e}")
+                return False
+        if self.received_size + len(payload) > self.session.max_message_size:
+            self.session.abort(seq_num, f"Mensagem excede o limite negociado de {self.session.max_message_size} caracteres")
+            return False
+        if self.output is not None:
+            self.output.write(payload) # Streaming: memória limitada à janela de recepção
+        else:
+            self.received_segments.append(payload)
+        self.received_size += len(payload)
+        self.delivered_count += 1
+        self.metrics.delivered.inc(len(payload))
+        return True
+
+    def schedule_ack(self):
+        """Conta um pacote entregue em ordem e envia o ACK cumulativo a cada N pacotes (ou após o atraso)"""
+        self.pending_acks += 1
+        if self.pending_acks >= self.session.settings.ack_every:
+            self.flush_ack()
+        else:
+            self.session.streams_with_acks.add(self)
+            if self.session.ack_deadline is None:
+                self.session.ack_deadline = time.monotonic() + self.session.settings.ack_delay
+
+    def clear_pending_acks(self):
+        """ACK enviado: o fluxo deixa de contar para o prazo do ACK atrasado da sessão"""
+        self.pending_acks = 0
+        self.session.streams_with_acks.discard(self)
+        if not self.session.streams_with_acks:
+            self.session.ack_deadline = None
+
+    def flush_ack(self):
+        """Envia imediatamente o ACK cumulativo do maior pacote entregue em ordem"""
+        self.clear_pending_acks()
+        if self.expected_seq > 0:
+            ack = create_cumulative_ack_packet(self.expected_seq - 1)
+            if self.session.sack and self.buffer:
+                ack["sack"] = self.sack_blocks(self.expected_seq - 1)
+            self.send(ack)
+            log.debug("[ACK] ACK cumulativo enviado até pacote %d", self.expected_seq - 1)
+
+    def sack_blocks(self, recent_seq):
+        """Intervalos contíguos do buffer; o bloco com o pacote mais recente vem primeiro (RFC 2018)"""
+        blocks = []
+        for seq in self.buffer.sequences(self.expected_seq):
+            if blocks and seq == blocks[-1][1] + 1:
+                blocks[-1][1] = seq
+            else:
+                blocks.append([seq, seq])
+        blocks.sort(key=lambda block: not (block[0] <= recent_seq <= block[1]))
+        return blocks[:MAX_SACK_BLOCKS]
+
+    def send_sack(self, seq_num):
+        """Confirma imediatamente o estado do buffer: ACK (cumulativo se possível) + blocos SACK"""
+        self.clear_pending_acks()
+        if self.session.cumulative_ack and self.expected_seq > 0:
+            ack = create_cumulative_ack_packet(self.expected_seq - 1)
+        else:
+            ack = create_ack_packet(seq_num)
+        ack["sack"] = self.sack_blocks(seq_num)
+        self.send(ack)
+        log.debug("[SACK] ACK enviado para pacote %d com blocos %s", seq_num, ack["sack"])
+
+    def receive(self, seq_num, payload, end=False):
+        """Processa um segmento válido: entrega em ordem, bufferiza ou descarta e confirma"""
+        session = self.session
+        if session.operation_mode == "go_back_n":
+            # Go-Back-N: Armazenar segmento se for o próximo esperado
+            if seq_num == self.expected_seq:
+                if not self.deliver(seq_num, payload):  # Adicionar à lista
+                    return
+                self.expected_seq += 1  # Próximo número esperado
+                if end:
+                    self.end_seq = seq_num
+                log.debug("[OK] Segmento %d adicionado à mensagem", seq_num)
+
+                if session.cumulative_ack:
+                    self.schedule_ack() # ACK cumulativo (possivelmente atrasado)
+                else:
+                    # Enviar ACK para pacote válido
+                    self.send(create_ack_packet(seq_num))
+                    log.debug("[ACK] ACK enviado para pacote %d", seq_num)
+            elif seq_num < self.expected_seq:
+                # Duplicata: o cliente não recebeu nosso ACK - reconfirmar imediatamente
+                self.metrics.duplicates.inc()
+                log.debug("[DUPLICATE] Pacote %d duplicado (esperado: %d) - reenviando ACK", seq_num, self.expected_seq)
+                if session.cumulative_ack:
+                    self.flush_ack()
+                else:
+                    self.send(create_ack_packet(seq_num))
+            elif session.gap_nack and seq_num > self.expected_seq:
+                # Pacote descartado, mas o cliente fica sabendo da lacuna sem esperar o timeout
+                self.metrics.out_of_order.inc()
+                log.debug("[ORDER] Pacote %d fora de ordem (esperado: %d) - sinalizando lacuna", seq_num, self.expected_seq)
+                if self.pending_acks:
+                    self.flush_ack() # O ACK atrasado precisa chegar antes do NACK de lacuna
+                self.send(create_gap_nack_packet(self.expected_seq))
+                log.debug("[NACK] NACK de lacuna enviado para pacote %d", self.expected_seq)
+            else:
+                self.metrics.out_of_order.inc()
+                log.debug("[ORDER] Pacote %d fora de ordem (esperado: %d) - ignorando", seq_num, self.expected_seq)
+                # Go-Back-N: NÃO enviar ACK para pacotes fora de ordem
+
+        elif session.operation_mode == "selective_repeat":
+            # Selective Repeat: Armazenar pacote no buffer (duplicatas já entregues são descartadas)
+            metrics = self.metrics
+            buffered_before = len(self.buffer)
+            if seq_num >= self.expected_seq + session.window_size:
+                # Controle de fluxo: o buffer nunca passa da janela anunciada (nem da sua capacidade)
+                metrics.beyond_window.inc()
+                log.debug("[BUFFER] Pacote %d além da janela anunciada - descartando", seq_num)
+                return
+            elif seq_num < self.expected_seq or seq_num in self.buffer:
+                metrics.duplicates.inc()
+                log.debug("[BUFFER] Pacote %d já recebido - descartando duplicata", seq_num)
+            else:
+                if seq_num > self.expected_seq:
+                    metrics.out_of_order.inc()
+                self.buffer.put(seq_num, payload)
+                if end:
+                    self.end_seq = seq_num
+                log.debug("[BUFFER] Pacote %d armazenado no buffer", seq_num)
+            metrics.occupancy.observe(len(self.buffer))
+
+            # Verificar se podemos entregar pacotes em ordem
+            first_undelivered = self.expected_seq
+            while self.expected_seq in self.buffer:
+                if not self.deliver(self.expected_seq, self.buffer.pop(self.expected_seq)):  # Remover do buffer
+                    break  # Sessão abortada
+                log.debug("[DELIVER] Segmento %d entregue em ordem", self.expected_seq)
+                self.expected_seq += 1
+            if len(self.buffer) != buffered_before:
+                metrics.buffer_changed(len(self.buffer) - buffered_before)
+            if session.closing:
+                return
+            delivered = self.expected_seq - first_undelivered
+
+            if session.sack and self.buffer:
+                # Ainda há lacunas: informar todos os blocos recebidos imediatamente
+                self.send_sack(seq_num)
+            elif not session.cumulative_ack or (delivered == 0 and seq_num >= self.expected_seq):
+                # Enviar ACK para pacote válido (fora de ordem: confirmação individual imediata)
+                self.send(create_ack_packet(seq_num))
+                log.debug("[ACK] ACK enviado para pacote %d", seq_num)
+            elif delivered == 1:
+                self.schedule_ack() # Caso comum: ACK cumulativo atrasado
+            else:
+                # Lacuna preenchida ou duplicata: confirmar tudo imediatamente
+                self.flush_ack()
+
+            # Mostrar estado do buffer (a lista só é montada se o nível debug estiver ativo)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("[BUFFER] Buffer atual: %s", list(self.buffer.sequences(self.expected_seq)) if self.buffer else "vazio")
+
+        if self.end_seq is not None and self.expected_seq > self.end_seq:
+            self.complete()
+
+    def complete(self):
+        """Marcador de fim entregue em ordem: confirmar já, reconstruir a mensagem e liberar o fluxo"""
+        if self.pending_acks:
+            self.flush_ack() # O remetente só conclui o fluxo quando o último pacote é confirmado
+        session = self.session
+        session.finished_streams[self.stream_id] = self.end_seq
+        if len(session.finished_streams) > MAX_FINISHED_STREAMS:
+            # Conexões reutilizadas abrem fluxos indefinidamente: esquecer os concluídos mais antigos
+            stream_id, _ = session.finished_streams.popitem(last=False)
+            session.forgotten_streams = max(session.forgotten_streams, stream_id)
+        del session.streams[self.stream_id]
+        self.finish()
+
+    def finish(self):
+        """Reconstrói a mensagem completa do fluxo"""
+        self.metrics.active_streams.dec()
+        if self.decoder is not None:
+            try:
+                tail = self.decoder.finish()
+            except ValueError as e:
+                log.warning("[COMPRESSION] Fluxo %d: %s", self.stream_id, e)
+            else:
+                if tail and self.output is not None:
+                    self.output.write(tail)
+                elif tail:
+                    self.received_segments.append(tail)
+                self.received_size += len(tail)
+        if self.buffer:
+            self.metrics.buffer_changed(-len(self.buffer))  # Pacotes fora de ordem que nunca serão entregues
+            self.buffer.clear()
+        stripe = self.session.stripe
+        if stripe is not None:
+            # Faixa de uma mensagem maior: só a StripeAssembly reconstrói (e conta) a mensagem
+            if self.end_seq is not None and self.expected_seq > self.end_seq:
+                stripe.receive(self.session.stripe_offset, ''.join(self.received_segments))
+            self.received_segments = []
+            return
+        lines = ["", "=== MENSAGEM COMPLETA RECEBIDA ==="]
+        if self.session.multiplexed:
+            lines.append(f"Fluxo: {self.stream_id}")
+        if self.output is not None:
+            self.output.flush()
+            lines.append(f"Destino: {getattr(self.output, 'name', self.session.settings.output)}")
+            if self.owns_output:
+                self.output.close()
+        elif self.received_segments or self.end_seq is not None:
+            text = ''.join(self.received_segments) # Juntar segmentos
+            lines.append(f"Texto: {text}")
+        else:
+            return
+        self.metrics.messages.inc()
+        lines.append(f"Total de segmentos: {self.delivered_count}")
+        lines.append(f"Tamanho total: {self.received_size} caracteres")
+        if self.decoder is not None:
+            lines.append(f"Compressão: {self.decoder.name} ({self.decoder.mode}), {self.decoder.compressed_bytes} bytes recebidos")
+        log.info("\n".join(lines))
+        handler = self.session.settings.handler
+        # Com multiplexação, um fluxo sem o marcador de fim entregue foi interrompido pela conexão: não repassar
+        complete = not self.session.multiplexed or (self.end_seq is not None and self.expected_seq > self.end_seq)
+        if handler is not None and self.output is None and complete:
+            try:
+                handler(text, self.session.address)
+            except Exception:
+                # Erros do handler não podem derrubar o laço de eventos (nem as demais sessões)
+                log.exception("[HANDLER] Erro ao processar a mensagem do fluxo %d de %s", self.stream_id, self.session.address)
+
+class StripeAssembly:
+    """Mensagem enviada em faixas por várias conexões em paralelo, juntada pelo deslocamento global
+
+    Deslocamentos e comprimentos são em bytes da mensagem em UTF-8. Cada conexão declara a sua faixa no
+    handshake e envia o texto dela como uma mensagem comum; as faixas recebidas entram na mensagem assim que
+    o trecho anterior está completo (com --output, gravadas e liberadas). Se a última conexão da
+    transferência termina sem que a mensagem esteja completa, ela é descartada.
+    """
+
+    def __init__(self, settings, key, total, session):
+        self.settings = settings
+        self.key = key
+        self.total = total          # Bytes da mensagem inteira
+        self.address = session.address
+        self.ranges = {}            # Deslocamento -> comprimento das faixas declaradas
+        self.pending = {}           # Deslocamento -> texto das faixas recebidas além do trecho contíguo
+        self.position = 0           # Bytes já juntados em ordem
+        self.parts = []             # Textos juntados (sem --output)
+        self.chars = 0
+        self.sessions = 0           # Conexões da transferência ainda abertas
+        self.done = False
+        self.session_id = session.session_id  # Nome do arquivo de saída: a conexão que abriu a transferência
+        self.output = None
+        self.owns_output = False
+
+    def join(self, offset, length):
+        """Registra a faixa de uma nova conexão; devolve o motivo da recusa (None se aceita)"""
+        if self.done:
+            return "Transferência em faixas já concluída"
+        end = offset + length
+        for other, other_length in self.ranges.items():
+            if offset < other + other_length and other < end or offset == other:
+                return f"Faixa {offset}-{end} sobrepõe a faixa {other}-{other + other_length}"
+        self.ranges[offset] = length
+        self.sessions += 1
+        return None
+
+    def leave(self):
+        """Uma conexão da transferência terminou; a última descarta a mensagem se ainda incompleta"""
+        self.sessions -= 1
+        if self.sessions == 0 and not self.done:
+            log.warning("[STRIPE] Transferência %s encerrada com %d de %d bytes - descartando",
+                        self.key[1], self.position + sum(self.ranges[offset] for offset in self.pending), self.total)
+            self.close()
+
+    def receive(self, offset, text):
+        """Faixa recebida por inteiro: junta-a (e as seguintes já recebidas) se o trecho anterior estiver completo"""
+        if self.done:
+            return  # Transferência já descartada por outra faixa
+        length = self.ranges[offset]
+        if len(text.encode('utf-8', TEXT_ERRORS)) != length:
+            log.error("[STRIPE] Faixa %d da transferência %s com tamanho diferente do declarado (%d bytes) - descartando",
+                      offset, self.key[1], length)
+            self.close()
+            return
+        log.info("[STRIPE] Faixa %d-%d da transferência %s recebida (%d caracteres)", offset, offset + length, self.key[1], len(text))
+        self.pending[offset] = text
+        while self.position in self.pending:
+            self.append(self.pending.pop(self.position))
+            self.position += self.ranges[self.position]
+        if self.position == self.total:
+            self.finish()
+
+    def append(self, text):
+        """Próximo trecho da mensagem, em ordem (com --output, gravado já)"""
+        if self.settings.output is None:
+            self.parts.append(text)
+        else:
+            if self.output is None:
+                self.output, self.owns_output = open_output(self.settings.output, self.session_id, self.address)
+            self.output.write(text)
+        self.chars += len(text)
+
+    def close(self):
+        """Libera a transferência (concluída ou descartada)"""
+        self.done = True
+        self.pending.clear()
+        if self.settings.stripes is not None:
+            self.settings.stripes.pop(self.key, None)
+        if self.owns_output:
+            self.output.close()
+
+    def finish(self):
+        """Todas as faixas juntadas: a mensagem completa segue como qualquer outra"""
+        lines = ["", "=== MENSAGEM COMPLETA RECEBIDA ===",
+                 f"Transferência em faixas: {self.key[1]} ({len(self.ranges)} faixas)"]
+        text = None
+        if self.settings.output is not None:
+            self.append('')  # Mensagem vazia: o destino ainda não foi aberto
+            self.output.flush()
+            lines.append(f"Destino: {getattr(self.output, 'name', self.settings.output)}")
+        else:
+            text = ''.join(self.parts)
+            self.parts = []
+            lines.append(f"Texto: {text}")
+        lines.append(f"Tamanho total: {self.chars} caracteres ({self.total} bytes)")
+        log.info("\n".join(lines))
+        self.settings.metrics.messages.inc()
+        self.close()
+        handler = self.settings.handler
+        if handler is not None and text is not None:
+            try:
+                handler(text, self.address)
+            except Exception:
+                log.exception("[HANDLER] Erro ao processar a mensagem em faixas %s de %s", self.key[1], self.address)
+
+class ClientSession:
+    """Estado de uma conexão: handshake, janela de recepção e segmentos recebidos"""
+
+    def __init__(self, client_socket, client_address, settings):
+        self.socket = client_socket
+        self.address = client_address
+        self.settings = settings
+        self.session_id = next(session_ids)
+        self.window_size = settings.window_size
+        self.max_message_size = settings.max_message_size  # Valores finais definidos no handshake
+        self.max_segment_size = settings.max_segment_size
+        self.handshake_done = False  # Handshake ainda não recebido
+        self.handshake_response = None # Resposta enviada (reenviada se o handshake chegar de novo)
+        self.closing = False         # Encerrar assim que os dados pendentes forem enviados
+        self.closed = False
+        self.cumulative_ack = False  # Cliente aceita ACKs cumulativos (negociado)
+        self.sack = False            # Cliente aceita blocos SACK (negociado, Selective Repeat)
+        self.gap_nack = False        # Cliente aceita NACKs de lacuna (negociado, Go-Back-N)
+        self.multiplexed = False     # Cliente envia várias mensagens, uma por fluxo (negociado)
+        self.streams = {}            # Fluxos com mensagem em andamento, por identificador
+        self.finished_streams = OrderedDict() # Fluxos concluídos: identificador -> número de sequência do fim
+        self.forgotten_streams = -1  # Maior fluxo concluído já esquecido (pacotes atrasados de fluxos até ele são descartados)
+        self.streams_with_acks = set() # Fluxos com ACK cumulativo pendente
+        self.ack_deadline = None     # Momento limite para enviar o ACK atrasado
+        self.ack_timer_armed = False # Sessão já está na fila de ACKs atrasados do laço de eventos
+        self.encryption_enabled = False
+        self.caesar_shift = None
+        self.cipher = None           # Cifra autenticada negociada (None: César ou sem criptografia)
+        self.resumption_secret = None # Segredo da cifra guardado no ticket para a próxima sessão
+        self.operation_mode = "go_back_n"
+        self.packet_encoding = 'json'  # Handshake sempre em JSON
+        self.checksum_algorithm = 'sum' # Soma original até que outro algoritmo seja negociado
+        self.compression = None      # Algoritmo de compressão dos payloads (negociado)
+        self.compression_mode = 'stream'
+        self.stripe = None           # Transferência em faixas da qual esta conexão carrega uma faixa
+        self.stripe_offset = 0
+        self.max_streams = settings.max_streams  # Fluxos simultâneos aceitos (1 com um destino único)
+        self.reader = FrameReader()  # Bytes recebidos ainda não processados (quadros TCP)
+        self.out_data = bytearray()  # Bytes aguardando envio
+        self.metrics = settings.metrics
+        self.metrics.sessions.inc()
+        self.metrics.active_sessions.inc()
+
+    def send(self, message):
+        """Enfileira uma mensagem para envio quando o socket estiver pronto"""
+        if message["type"] in ("ack", "nack"):
+            # Controle de fluxo: todo ACK/NACK anuncia a janela de recepção a partir de expected_seq
+            message["window"] = self.window_size
+        packet_bytes = encode_packet(message, self.packet_encoding)
+        metrics = self.metrics
+        metrics.sent_by_type[message["type"]].inc()
+        metrics.bytes_sent.inc(len(packet_bytes))
+        self.queue(packet_bytes)
+
+    def queue(self, packet_bytes):
+        """Coloca um pacote serializado no buffer de saída (com o prefixo de tamanho)"""
+        self.out_data += frame(packet_bytes)
+
+    def feed(self):
+        """Processa todos os quadros completos já lidos pelo leitor"""
+        while not self.closing:
+            message_data = self.reader.next_frame()
+            if message_data is None:
+                break  # Quadro incompleto, aguardar mais dados
+            message = decode_packet(message_data, self.packet_encoding)
+            self.count_received(message, len(message_data))
+            self.handle_message(message)
+
+    def count_received(self, message, size):
+        """Contabiliza um pacote recebido nas métricas"""
+        metrics = self.metrics
+        metrics.received_by_type.get(message.get("type"), metrics.received_other).inc()
+        metrics.bytes_received.inc(size)
+
+    def handle_message(self, message):
+        """Encaminha a mensagem para o handshake ou para a troca de dados"""
+        if not self.handshake_done:
+            self.handle_handshake(message)
+        else:
+            self.handle_packet(message)
+
+    def abort(self, seq_num, reason):
+        """Informa o erro ao cliente e encerra a sessão após o envio"""
+        log.error("[ERROR] %s - encerrando conexão", reason)
+        self.send(create_error_packet(seq_num, reason))
+        self.closing = True
+
+    def reject_handshake(self, reason):
+        """Recusa o handshake com parâmetros inválidos"""
+        log.warning("[ERROR] Handshake recusado: %s", reason)
+        self.metrics.handshakes.labels('rejected').inc()
+        self.send({"type": "handshake_ack", "status": "error", "reason": reason})
+        self.closing = True
+
+    def handle_handshake(self, handshake_data):
+        """Handshake - negociação inicial, ou retomada com um ticket de sessão"""
+        log.info("Iniciando handshake...")
+        log.debug("Dados recebidos: %s", handshake_data)
+
+        if "ticket" in handshake_data:
+            response = self.resume(handshake_data)
+        else:
+            response = self.negotiate(handshake_data)
+        if response is None:
+            return # Handshake recusado
+        if "stripe" in handshake_data:
+            reason = self.join_stripe(handshake_data["stripe"])
+            if reason is not None:
+                return self.reject_handshake(reason)
+            response["stripe"] = True                                # Confirmar a faixa
+        self.metrics.handshakes.labels('resumed' if response.get('resumed') else 'full').inc()
+
+        tickets = self.settings.tickets
+        if tickets is not None and self.stripe is None:
+            # Ticket de uso único: a próxima conexão retoma estes parâmetros e já envia dados com o handshake
+            params = {key: value for key, value in response.items() if key not in ("key_share", "resumed")}
+            response["ticket"] = tickets.issue({"response": params, "caesar_shift": self.caesar_shift,
+                                                "resumption_secret": self.resumption_secret})
+            response["ticket_lifetime"] = tickets.lifetime
+
+        self.handshake_response = response
+        self.send(response) # Enviar confirmação (handshake_ack)
+        self.handshake_done = True
+        self.packet_encoding = response["packet_encoding"] # Pacotes seguintes usam a codificação negociada
+        self.reader.max_frame = max_frame_size(self.max_segment_size, self.packet_encoding)
+
+        if not log.isEnabledFor(logging.INFO):
+            return
+        lines = [f"Handshake {'retomado' if response.get('resumed') else 'concluído'}:",
+                 f"  - Tamanho máximo: {self.max_message_size}",
+                 f"  - Tamanho do segmento: {self.max_segment_size}",
+                 f"  - Modo: {self.operation_mode}",
+                 f"  - Codificação: {self.packet_encoding}",
+                 f"  - Checksum: {self.checksum_algorithm}"]
+        if self.encryption_enabled:
+            lines.append(f"  - Criptografia: {response['cipher']}")
+        if self.cumulative_ack:
+            lines.append(f"  - ACK cumulativo: a cada {self.settings.ack_every} pacotes ou {self.settings.ack_delay}s")
+        if self.sack:
+            lines.append(f"  - SACK: habilitado")
+        if self.gap_nack:
+            lines.append(f"  - NACK de lacuna: habilitado")
+        if self.multiplexed:
+            lines.append(f"  - Fluxos multiplexados: até {self.max_streams} simultâneos")
+
+        # Troca de mensagens - recebimento dos dados
+        lines.append("\n=== INICIANDO TROCA DE MENSAGENS ===")
+        if self.operation_mode == "selective_repeat":
+            lines.append(f"[SR] Iniciando Selective Repeat com janela de tamanho: {self.window_size}")
+            lines.append(f"[BUFFER] Buffer de recebimento: {self.window_size} pacotes")
+        else:
+            lines.append(f"[GBN] Iniciando Go-Back-N com janela de tamanho: {self.window_size}")
+        log.info("\n".join(lines))
+
+    def negotiate(self, handshake_data):
+        """Negocia os parâmetros pedidos pelo cliente; devolve a resposta do handshake (None se recusado)"""
+        # Validar parâmetros solicitados pelo cliente
+        requested_message_size = handshake_data.get("max_message_size")
+        requested_segment_size = handshake_data.get("max_segment_size", DEFAULT_SEGMENT_SIZE)
+        operation_mode = handshake_data.get("operation_mode")
+        if not is_positive_int(requested_message_size):
+            return self.reject_handshake(f"max_message_size inválido: {requested_message_size}")
+        if not is_positive_int(requested_segment_size):
+            return self.reject_handshake(f"max_segment_size inválido: {requested_segment_size}")
+        if operation_mode not in ("go_back_n", "selective_repeat"):
+            return self.reject_handshake(f"operation_mode inválido: {operation_mode}")
+        for field in ("packet_encodings", "checksum_algorithms", "compressions", "ciphers"):
+            if field in handshake_data and not is_name_list(handshake_data[field]):
+                return self.reject_handshake(f"{field} inválido: {handshake_data[field]}")
+
+        # Valores finais: o menor entre o pedido do cliente e o limite do servidor
+        self.max_message_size = min(requested_message_size, self.settings.max_message_size)
+        self.max_segment_size = min(requested_segment_size, self.settings.max_segment_size)
+
+        # Verificar se cliente solicitou criptografia
+        self.encryption_enabled = handshake_data.get("encryption_enabled", False)
+
+        cipher = choose_cipher(handshake_data.get("ciphers", ['caesar'])) if self.encryption_enabled else None
+        key_share = None
+        if cipher is not None and cipher != 'caesar' and "key_share" in handshake_data:
+            # Cifra autenticada: chave derivada de uma troca X25519 com a chave pública do cliente
+            key_exchange = KeyExchange()
             try:
-                packet = receive_message(client_socket)
-            except (ConnectionError, ValueError) as e:
-                # Conexão fechada pelo cliente ou dados inválidos
-                print(f"[INFO] Cliente encerrou a conexão: {e}")
-                break
-            except json.JSONDecodeError as e:
-                # Erro ao decodificar JSON (conexão pode ter sido fechada)
-                print(f"[INFO] Erro ao decodificar mensagem (conexão pode ter sido fechada): {e}")
-                break
-            
-            print(f"Pacote recebido: {packet}")
-            
-            if packet["type"] == "data": # Se for pacote de dados
-                seq_num = packet["seq_num"]   # Número de sequência
-                payload_encrypted = packet["payload"]   # Dados (pode estar criptografado)
-                checksum = packet["checksum"] # Soma de verificação
-                is_encrypted = packet.get("encrypted", False)  # Verificar se está criptografado
-                
-                # Descriptografar payload se necessário
-                payload = payload_encrypted
-                if is_encrypted and caesar_shift is not None:
+                self.cipher = key_exchange.derive(handshake_data["key_share"], cipher)
+            except (ValueError, TypeError) as e:
+                return self.reject_handshake(f"key_share inválido: {e}")
+            key_share = key_exchange.key_share
+            self.resumption_secret = key_exchange.resumption_secret
+            log.info("[ENCRYPTION] Cifra %s com chave derivada no handshake", cipher)
+        elif self.encryption_enabled:
+            cipher = 'caesar'
+            # Receber shift da Cifra de César do cliente
+            if "caesar_shift" in handshake_data:
+                shift = handshake_data["caesar_shift"]
+                if not isinstance(shift, int) or isinstance(shift, bool):
+                    return self.reject_handshake(f"caesar_shift inválido: {shift}")
+                self.caesar_shift = shift
+                log.info("[ENCRYPTION] Cifra de César recebida com deslocamento: %s", self.caesar_shift)
+            else:
+                log.warning("[WARNING] Criptografia solicitada mas shift não fornecido")
+                self.encryption_enabled = False
+
+        # ACKs cumulativos/atrasados apenas para clientes que os entendem
+        self.cumulative_ack = bool(handshake_data.get("cumulative_ack", False))
+        # SACK só faz sentido no Selective Repeat, que mantém pacotes fora de ordem no buffer
+        self.sack = bool(handshake_data.get("sack", False)) and operation_mode == "selective_repeat"
+        # No Go-Back-N pacotes fora de ordem são descartados: sinalizar a lacuna para retransmissão rápida
+        self.gap_nack = bool(handshake_data.get("gap_nack", False)) and operation_mode == "go_back_n"
+
+        # Escolher codificação dos pacotes (binária se o cliente oferecer, JSON caso contrário)
+        packet_encoding = choose_packet_encoding(handshake_data.get("packet_encodings", ['json']))
+        # Algoritmo de integridade: o primeiro oferecido que o servidor suporta (clientes antigos: soma)
+        self.checksum_algorithm = choose_checksum_algorithm(handshake_data.get("checksum_algorithms", ['sum']))
+        # Várias mensagens por conexão, cada uma em um fluxo com sequência própria e marcador de fim
+        self.multiplexed = bool(handshake_data.get("streams", False))
+        if is_shared_output(self.settings.output):
+            self.max_streams = 1  # Um fluxo por vez: cada mensagem é gravada inteira antes da próxima
+        # Compressão só com a codificação binária: em JSON cada byte comprimido viraria um escape de 6 caracteres
+        if packet_encoding == 'binary':
+            self.compression = choose_compression(handshake_data.get("compressions", []))
+        if handshake_data.get("compression_mode") in COMPRESSION_MODES:
+            self.compression_mode = handshake_data["compression_mode"]
+
+        self.operation_mode = operation_mode
+
+        # Resposta do handshake
+        response = {
+            "type": "handshake_ack",                                # Confirmação do handshake
+            "max_message_size": self.max_message_size,              # Tamanho negociado
+            "max_segment_size": self.max_segment_size,              # Segmento (MSS) negociado
+            "window_size": self.window_size,                        # Tamanho da janela
+            "operation_mode": operation_mode,                       # Confirmar modo
+            "encryption_enabled": self.encryption_enabled,          # Confirmar criptografia
+            "packet_encoding": packet_encoding,                     # Codificação dos próximos pacotes
+            "checksum_algorithm": self.checksum_algorithm,          # Algoritmo de integridade escolhido
+            "cumulative_ack": self.cumulative_ack,                  # Confirmar ACKs cumulativos
+            "sack": self.sack,                                      # Confirmar blocos SACK
+            "gap_nack": self.gap_nack,                              # Confirmar NACKs de lacuna
+            "streams": self.multiplexed,                            # Confirmar fluxos multiplexados
+            "compression": self.compression,                        # Compressão escolhida (None: desativada)
+            "status": "success"                                     # Status de sucesso
+        }
+        if self.compression is not None:
+            response["compression_mode"] = self.compression_mode    # Um compressor por mensagem ou por segmento
+            log.info("[COMPRESSION] Payloads comprimidos com %s (modo %s)", self.compression, self.compression_mode)
+        if self.encryption_enabled:
+            response["cipher"] = cipher                             # Cifra escolhida
+        if key_share is not None:
+            response["key_share"] = key_share                       # Chave pública do servidor
+        if self.multiplexed:
+            response["max_streams"] = self.max_streams              # Fluxos simultâneos aceitos
+        return response
+
+    def resume(self, handshake_data):
+        """Retomada: os parâmetros vêm do ticket, sem nova negociação nem troca de chaves (None se recusado)"""
+        tickets = self.settings.tickets
+        params = tickets.redeem(handshake_data["ticket"]) if tickets is not None else None
+        if params is None:
+            return self.reject_handshake("Ticket de sessão inválido, expirado ou já utilizado")
+        response = dict(params["response"])
+        cipher = response.get("cipher")
+        if cipher is not None and cipher != 'caesar':
+            # Chave nova derivada do segredo do ticket e do valor aleatório enviado pelo cliente
+            try:
+                resume_nonce = base64.b64decode(handshake_data["resume_nonce"], validate=True)
+            except (KeyError, ValueError, TypeError):
+                resume_nonce = b''
+            if len(resume_nonce) != RESUME_NONCE_BYTES:
+                return self.reject_handshake("resume_nonce inválido")
+            self.cipher, self.resumption_secret = resume_session(params["resumption_secret"], cipher, resume_nonce)
+
+        self.max_message_size = response["max_message_size"]
+        self.max_segment_size = response["max_segment_size"]
+        self.encryption_enabled = response["encryption_enabled"]
+        self.caesar_shift = params["caesar_shift"]
+        self.checksum_algorithm = response["checksum_algorithm"]
+        self.cumulative_ack = response["cumulative_ack"]
+        self.sack = response["sack"]
+        self.gap_nack = response["gap_nack"]
+        self.multiplexed = response["streams"]
+        self.max_streams = response.get("max_streams", self.max_streams)
+        self.compression = response.get("compression")
+        self.compression_mode = response.get("compression_mode", 'stream')
+        self.operation_mode = response["operation_mode"]
+        response["resumed"] = True
+        log.info("[TICKET] Sessão retomada: parâmetros restaurados do ticket (dados 0-RTT aceitos)")
+        return response
+
+    def join_stripe(self, stripe):
+        """Associa a conexão à faixa declarada no handshake; devolve o motivo da recusa (None se aceita)"""
+        stripes = self.settings.stripes
+        if stripes is None:
+            return "Transferência em faixas não suportada por este servidor"
+        try:
+            transfer, offset, length, total = stripe["transfer"], stripe["offset"], stripe["length"], stripe["total"]
+        except (KeyError, TypeError):
+            return f"stripe inválido: {stripe}"
+        if not isinstance(transfer, str) or not 0 < len(transfer) <= MAX_TRANSFER_ID:
+            return f"Identificador de transferência inválido: {transfer}"
+        if not all(isinstance(value, int) and value >= 0 for value in (offset, length, total)):
+            return f"Faixa inválida: {stripe}"
+        if offset + length > total or (length == 0 and total > 0):
+            return f"Faixa {offset}-{offset + length} fora da transferência de {total} bytes"
+        if total > self.settings.max_message_size:
+            return f"Transferência de {total} bytes excede o limite de {self.settings.max_message_size}"
+        key = (self.address[0], transfer)
+        assembly = stripes.get(key)
+        if assembly is None:
+            assembly = stripes[key] = StripeAssembly(self.settings, key, total, self)
+        elif assembly.total != total:
+            return f"Tamanho da transferência diverge das outras faixas ({total} != {assembly.total})"
+        reason = assembly.join(offset, length)
+        if reason is not None:
+            return reason
+        self.stripe, self.stripe_offset = assembly, offset
+        log.info("[STRIPE] Conexão carrega a faixa %d-%d da transferência %s (%d bytes)", offset, offset + length, transfer, total)
+        return None
+
+    def stream(self, stream_id):
+        """Fluxo do pacote recebido, criado no primeiro pacote (None se a sessão foi abortada)"""
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            return stream
+        if stream_id != 0 and not self.multiplexed:
+            self.abort(0, f"Fluxo {stream_id} sem multiplexação negociada")
+            return None
+        if stream_id != 0 and self.stripe is not None:
+            self.abort(0, "Conexão de faixa carrega uma única mensagem")
+            return None
+        if len(self.streams) >= self.max_streams:
+            self.abort(0, f"Limite de {self.max_streams} fluxos simultâneos excedido")
+            return None
+        stream = self.streams[stream_id] = ReceiveStream(self, stream_id)
+        return stream
+
+    def flush_acks(self):
+        """Envia os ACKs cumulativos pendentes de todos os fluxos (prazo do ACK atrasado expirou)"""
+        for stream in list(self.streams_with_acks):
+            stream.flush_ack()
+        self.ack_deadline = None
+
+    def ack_finished_stream(self, stream_id, seq_num):
+        """Duplicata de um fluxo já concluído: o ACK final se perdeu, reconfirmar a mensagem inteira"""
+        end_seq = self.finished_streams[stream_id]
+        ack = create_cumulative_ack_packet(end_seq) if self.cumulative_ack else create_ack_packet(seq_num)
+        if stream_id:
+            ack["stream"] = stream_id
+        self.send(ack)
+        log.debug("[ACK] Fluxo %d já concluído - reconfirmando pacote %d", stream_id, seq_num)
+
+    def handle_packet(self, packet):
+        """Processa um pacote recebido após o handshake"""
+        log.debug("Pacote recebido: %s", packet)
+
+        if packet["type"] == "data": # Se for pacote de dados
+            stream_id = packet.get("stream", 0)
+            # Número de sequência completo (no fio vai módulo 2^32): o mais próximo do esperado pelo fluxo
+            stream = self.streams.get(stream_id)
+            seq_num = unwrap_seq(packet["seq_num"], stream.expected_seq if stream is not None
+                                 else self.finished_streams.get(stream_id, -1) + 1)
+            payload_encrypted = packet["payload"]   # Dados (pode estar criptografado)
+            checksum = packet["checksum"] # Soma de verificação
+            is_encrypted = packet.get("encrypted", False)  # Verificar se está criptografado
+
+            # Descriptografar payload se necessário
+            payload = payload_encrypted
+            if is_encrypted and self.cipher is not None:
+                # A tag AEAD já garante a integridade: sem checksum separado
+                try:
+                    payload = self.cipher.open(seq_num, payload_encrypted, packet.get("stream", 0))
+                    is_valid = True
+                    log.debug("[ENCRYPTION] Payload autenticado e descriptografado para pacote %d", seq_num)
+                except ValueError as e:
+                    log.debug("[CORRUPT] %s", e)
+                    payload, is_valid = "", False
+            else:
+                if is_encrypted and self.caesar_shift is not None:
                     try:
-                        payload = caesar_decrypt(payload_encrypted, caesar_shift)
-                        print(f"[ENCRYPTION] Payload descriptografado para pacote {seq_num}: '{payload_encrypted}' -> '{payload}'")
+                        payload = caesar_decrypt(payload_encrypted, self.caesar_shift)
+                        log.debug("[ENCRYPTION] Payload descriptografado para pacote %d: %r -> %r", seq_num, payload_encrypted, payload)
                     except Exception as e:
-                        print(f"[ERROR] Falha ao descriptografar pacote {seq_num}: {e}")
+                        log.warning("[ERROR] Falha ao descriptografar pacote %d: %s", seq_num, e)
                         payload = payload_encrypted  # Usar payload original em caso de erro
-                
+
                 # Verificar se a soma de verificação está correta
                 # O checksum é calculado sobre o payload original (antes da criptografia)
-                is_valid = verify_checksum(payload, checksum)
-                if is_valid:
-                    print(f"[OK] Pacote {seq_num} válido: '{payload}' (checksum: {checksum})")
-                    
-                    if operation_mode == "go_back_n":
-                        # Go-Back-N: Armazenar segmento se for o próximo esperado
-                        if seq_num == expected_seq:
-                            received_segments.append(payload)  # Adicionar à lista
-                            expected_seq += 1  # Próximo número esperado
-                            print(f"[OK] Segmento {seq_num} adicionado à mensagem")
-                            
-                            # Enviar ACK para pacote válido
-                            ack = create_ack_packet(seq_num)
-                            send_message(client_socket, ack)
-                            print(f"[ACK] ACK enviado para pacote {seq_num}")
-                        else:
-                            print(f"[WARNING] Pacote {seq_num} fora de ordem (esperado: {expected_seq}) - ignorando")
-                            # Go-Back-N: NÃO enviar ACK para pacotes fora de ordem
-                    
-                    elif operation_mode == "selective_repeat":
-                        # Selective Repeat: Armazenar pacote no buffer
-                        if seq_num not in buffer:
-                            buffer[seq_num] = payload
-                            print(f"[BUFFER] Pacote {seq_num} armazenado no buffer")
-                        
-                        # Verificar se podemos entregar pacotes em ordem
-                        while expected_seq in buffer:
-                            received_segments.append(buffer[expected_seq])
-                            del buffer[expected_seq]  # Remover do buffer
-                            print(f"[DELIVER] Segmento {expected_seq} entregue em ordem")
-                            expected_seq += 1
-                        
-                        # Enviar ACK para pacote válido
-                        ack = create_ack_packet(seq_num)
-                        send_message(client_socket, ack)
-                        print(f"[ACK] ACK enviado para pacote {seq_num}")
-                        
-                        # Mostrar estado do buffer
-                        if buffer:
-                            print(f"[BUFFER] Buffer atual: {list(buffer.keys())}")
-                        else:
-                            print(f"[BUFFER] Buffer vazio")
-                else:
-                    print(f"[ERROR] Pacote {seq_num} com erro de checksum")
-                    
-                    # Enviar NACK para pacote com erro
-                    nack = create_nack_packet(seq_num)
-                    send_message(client_socket, nack)
-                    print(f"[NACK] NACK enviado para pacote {seq_num}")
-                
-                # Mostrar informações do pacote
-                print(f"Metadados do pacote {seq_num}:")
-                print(f"  - Payload: '{payload}'")
-                print(f"  - Checksum: {checksum}")
-                print(f"  - Número de sequência: {seq_num}")
-                print(f"  - Status: {'Válido' if is_valid else 'Inválido'}")
-                print()
-                
+                is_valid = verify_checksum(payload, checksum, self.checksum_algorithm)
+            if len(payload) > self.max_segment_size:
+                return self.abort(seq_num, f"Segmento {seq_num} excede o MSS negociado de {self.max_segment_size} caracteres")
+            if stream_id in self.finished_streams:
+                return self.ack_finished_stream(stream_id, seq_num)
+            if stream_id <= self.forgotten_streams and stream_id not in self.streams:
+                log.debug("[STREAM] Pacote atrasado do fluxo %d, concluído há muito tempo - descartando", stream_id)
+                return
+            stream = self.stream(stream_id)
+            if stream is None:
+                return
+            if is_valid:
+                log.debug("[OK] Pacote %d válido: %r (checksum: %d)", seq_num, payload, checksum)
+                stream.receive(seq_num, payload, packet.get("end", False))
+            else:
+                self.metrics.corrupt.inc()
+                log.debug("[CORRUPT] Pacote %d com erro de checksum", seq_num)
+
+                # Enviar NACK para pacote com erro
+                stream.send(create_nack_packet(seq_num))
+                log.debug("[NACK] NACK enviado para pacote %d", seq_num)
+
+            # Mostrar informações do pacote
+            log.debug("Metadados do pacote %d: payload=%r checksum=%d seq=%d status=%s",
+                      seq_num, payload, checksum, seq_num, "Válido" if is_valid else "Inválido")
+
+    def finish(self):
+        """Reconstrói as mensagens sem marcador de fim (encerradas pela conexão) e encerra a conexão"""
+        self.closed = True
+        self.metrics.active_sessions.dec()
+        for stream in list(self.streams.values()):
+            stream.finish()
+        if self.stripe is not None:
+            self.stripe.leave()
+
+        log.info("\n=== TROCA DE MENSAGENS CONCLUÍDA ===")
+        self.close_transport()
+        log.info("Conexão com %s encerrada", self.address)
+
+    def close_transport(self):
+        """Fecha o socket exclusivo da conexão"""
+        self.socket.close() # Fechar conexão com cliente
+
+class DatagramSession(ClientSession):
+    """Sessão sobre UDP: um pacote por datagrama, todas as sessões compartilham o socket do servidor"""
+
+    def __init__(self, server_socket, client_address, settings):
+        super().__init__(server_socket, client_address, settings)
+        self.last_activity = time.monotonic()
+
+    def queue(self, packet_bytes):
+        """Envia o pacote como um datagrama (se o socket estiver cheio, é uma perda como outra qualquer)"""
+        try:
+            self.socket.sendto(packet_bytes, self.address)
+        except (BlockingIOError, InterruptedError):
+            log.debug("[UDP] Buffer de envio cheio - datagrama para %s descartado", self.address)
+
+    def handle_datagram(self, data):
+        """Processa um datagrama recebido deste cliente"""
+        self.last_activity = time.monotonic()
+        if self.handshake_done and is_json_datagram(data) and self.packet_encoding != 'json':
+            # Após o handshake binário só o próprio handshake (repetido pelo cliente) ainda chega em JSON
+            message = decode_packet(data, 'json')
+            if message.get("type") != "handshake":
+                raise ValueError("pacote JSON após o handshake binário")
+        else:
+            message = decode_packet(data, self.packet_encoding)
+        self.count_received(message, len(data))
+        if message["type"] == "handshake" and self.handshake_done:
+            # A resposta se perdeu e o cliente repetiu o handshake: reenviar a mesma resposta
+            log.info("[UDP] Handshake repetido por %s - reenviando resposta", self.address)
+            self.queue(encode_packet(self.handshake_response, 'json'))
+        elif message["type"] == "fin" and self.handshake_done:
+            log.info("[UDP] Cliente %s encerrou a transferência", self.address)
+            self.flush_acks()
+            self.send(create_fin_packet(message["seq_num"]))
+            self.closing = True
+        else:
+            self.handle_message(message)
+
+    def close_transport(self):
+        """O socket UDP é compartilhado: nada a fechar"""
+
+def accept_clients(server_socket, selector, settings):
+    """Aceita todas as conexões pendentes e registra uma sessão para cada uma"""
+    while True:
+        try:
+            client_socket, client_address = server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            # Limite de descritores atingido, por exemplo - tentar novamente depois
+            log.error("[ERROR] Falha ao aceitar conexão: %s", e)
+            return
+        client_socket.setblocking(False)
+        if settings.tcp_nodelay:
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Sem Nagle: ACKs saem imediatamente
+        log.info("Conexão estabelecida com %s", client_address)
+        session = ClientSession(client_socket, client_address, settings)
+        selector.register(client_socket, selectors.EVENT_READ, session)
+
+def arm_ack_timer(session, ack_timers):
+    """Coloca a sessão na fila de ACKs atrasados (heap ordenado pelo prazo)"""
+    if session.ack_deadline is not None and not session.ack_timer_armed and not session.closed:
+        heapq.heappush(ack_timers, (session.ack_deadline, session.session_id, session))
+        session.ack_timer_armed = True
+
+def fire_ack_timers(selector, ack_timers):
+    """Envia os ACKs atrasados cujo prazo expirou e retorna o tempo até o próximo prazo"""
+    now = time.monotonic()
+    while ack_timers and ack_timers[0][0] <= now:
+        _, _, session = heapq.heappop(ack_timers)
+        session.ack_timer_armed = False
+        if session.closed or session.ack_deadline is None:
+            continue # ACK já enviado (a cada N pacotes) ou sessão encerrada
+        if session.ack_deadline > now:
+            arm_ack_timer(session, ack_timers) # Prazo foi renovado, reagendar
+            continue
+        session.flush_acks()
+        try:
+            flush_session(selector, session)
+        except ConnectionError as e:
+            log.info("[INFO] Cliente encerrou a conexão: %s", e)
+            close_session(selector, session)
+    return max(0.0, ack_timers[0][0] - now) if ack_timers else None
+
+def close_session(selector, session):
+    """Remove a sessão do laço de eventos e finaliza a conexão"""
+    selector.unregister(session.socket)
+    session.finish()
+
+def flush_session(selector, session):
+    """Envia o máximo possível dos dados pendentes sem bloquear"""
+    if session.out_data:
+        try:
+            sent = session.socket.send(session.out_data)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        del session.out_data[:sent]
+    # Só pedir EVENT_WRITE enquanto houver dados pendentes
+    events = selectors.EVENT_READ | (selectors.EVENT_WRITE if session.out_data else 0)
+    if selector.get_key(session.socket).events != events:
+        selector.modify(session.socket, events, session)
+
+def service_session(selector, session, mask, ack_timers):
+    """Processa eventos de leitura/escrita de uma sessão"""
+    try:
+        if mask & selectors.EVENT_READ:
+            try:
+                received = session.reader.read_from(session.socket)
+            except (BlockingIOError, InterruptedError):
+                received = None
+            if received is not None:
+                if not received:
+                    raise ConnectionError("Conexão fechada pelo cliente")
+                session.feed()
+        flush_session(selector, session)
+        if session.closing and not session.out_data:
+            close_session(selector, session)
+        else:
+            arm_ack_timer(session, ack_timers)
+    except (ConnectionError, ValueError) as e:
+        # Conexão fechada pelo cliente ou dados inválidos (inclui erro de JSON)
+        log.info("[INFO] Cliente encerrou a conexão: %s", e)
+        close_session(selector, session)
     except Exception as e:
-        # Erros inesperados (erros de conexão já tratados no loop interno)
-        print(f"[ERROR] Erro inesperado na comunicação: {e}")
-    
-    # Reconstruir mensagem completa juntando todos os segmentos
-    if received_segments:
-        complete_message = ''.join(received_segments) # Juntar segmentos
-        print(f"\n=== MENSAGEM COMPLETA RECEBIDA ===")
-        print(f"Texto: {complete_message}")
-        print(f"Total de segmentos: {len(received_segments)}")
-        print(f"Tamanho total: {len(complete_message)} caracteres")
-        
-    print("\n=== TROCA DE MENSAGENS CONCLUÍDA ===")
-    client_socket.close() # Fechar conexão com cliente
-    print(f"Conexão com {client_address} encerrada")
\ No newline at end of file
+        # Erros inesperados isolados nesta sessão, as demais continuam
+        log.error("[ERROR] Erro inesperado na comunicação: %s", e)
+        close_session(selector, session)
+
+def close_datagram_session(sessions, session):
+    """Remove a sessão UDP da tabela de clientes e finaliza a transferência"""
+    sessions.pop(session.address, None)
+    session.finish()
+
+def service_datagrams(server_socket, sessions, settings, ack_timers):
+    """Lê todos os datagramas pendentes e entrega cada um à sessão do seu remetente"""
+    while True:
+        try:
+            data, client_address = server_socket.recvfrom(MAX_DATAGRAM_BUFFER)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            log.warning("[UDP] Erro ao receber datagrama: %s", e)
+            return
+
+        session = sessions.get(client_address)
+        if session is None:
+            if not is_json_datagram(data):
+                # Pacote de uma sessão já encerrada (ex.: FIN repetido porque nossa resposta se perdeu)
+                try:
+                    if decode_packet(data, 'binary')["type"] == "fin":
+                        server_socket.sendto(encode_packet(create_fin_packet(0), 'binary'), client_address)
+                except ValueError:
+                    pass
+                continue
+            log.info("Nova sessão UDP de %s", client_address)
+            session = DatagramSession(server_socket, client_address, settings)
+            sessions[client_address] = session
+
+        try:
+            session.handle_datagram(data)
+        except (ValueError, KeyError) as e:
+            # Datagrama inválido: descartar, o protocolo trata como perda
+            log.debug("[UDP] Datagrama inválido de %s descartado: %s", client_address, e)
+            continue
+        except Exception as e:
+            # Erros inesperados isolados nesta sessão, as demais continuam
+            log.error("[ERROR] Erro inesperado na sessão UDP de %s: %s", client_address, e)
+            close_datagram_session(sessions, session)
+            continue
+        if session.closing:
+            close_datagram_session(sessions, session)
+        else:
+            arm_ack_timer(session, ack_timers)
+
+def reap_idle_sessions(sessions, settings):
+    """Encerra sessões UDP sem tráfego há mais de idle_timeout segundos"""
+    now = time.monotonic()
+    for session in [s for s in sessions.values() if now - s.last_activity > settings.idle_timeout]:
+        log.info("[UDP] Sessão %s inativa por %ss - encerrando", session.address, settings.idle_timeout)
+        close_datagram_session(sessions, session)
+
+def bind_server(host, port, backlog=socket.SOMAXCONN, transport='tcp', reuse_port=False):
+    """Cria o socket do servidor associado ao endereço (porta 0: uma porta livre escolhida pelo sistema)
+
+    Com reuse_port (SO_REUSEPORT), vários processos associam o mesmo endereço e o kernel distribui entre eles
+    as conexões (TCP) ou os datagramas, sempre os de um mesmo cliente para o mesmo socket (UDP).
+    """
+    if transport == 'udp':
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # Socket UDP
+    else:
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # Socket TCP
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind((host, port)) # Associar ao endereço e porta
+    if transport != 'udp':
+        server_socket.listen(backlog) # Fila de conexões pendentes
+    server_socket.setblocking(False)
+    return server_socket
+
+def close_all_sessions(selector, sessions):
+    """Encerra as sessões ainda abertas (servidor parando a pedido)"""
+    for key in list(selector.get_map().values()):
+        if isinstance(key.data, ClientSession):
+            close_session(selector, key.data)
+    for session in list(sessions.values()):
+        close_datagram_session(sessions, session)
+
+def run_server(host, port, settings, backlog=socket.SOMAXCONN, transport='tcp', metrics_endpoints=()):
+    """Associa o endereço e atende as conexões até o processo ser interrompido"""
+    serve_socket(bind_server(host, port, backlog, transport), settings, transport, metrics_endpoints)
+
+def serve_socket(server_socket, settings, transport='tcp', metrics_endpoints=(), wakeup=None):
+    """Laço de eventos principal: atende todas as conexões (e o endpoint de métricas) em um único thread
+
+    Com wakeup (socket), o laço encerra as sessões e retorna assim que ele ficar legível.
+    """
+    raise_open_file_limit()
+
+    selector = selectors.DefaultSelector()
+    selector.register(server_socket, selectors.EVENT_READ, None)
+    if wakeup is not None:
+        selector.register(wakeup, selectors.EVENT_READ, None)
+    for endpoint in metrics_endpoints:
+        endpoint.register(selector)
+        log.info("[METRICS] Métricas em %s (/metrics: Prometheus, /metrics.json: JSON)", endpoint.address)
+
+    host, port = server_socket.getsockname()[:2]
+    log.info("Servidor iniciado em %s:%s (%s)", host, port, transport.upper())
+    log.info("Aguardando conexões...")
+
+    ack_timers = [] # Heap de (prazo, id, sessão) para ACKs atrasados
+    sessions = {}   # Sessões UDP por endereço do cliente
+    timeout = None
+    next_reap = time.monotonic() + IDLE_CHECK_INTERVAL
+    try:
+        while True:
+            for key, mask in selector.select(timeout):
+                if isinstance(key.data, MetricsEndpoint):
+                    key.data.service(selector, key.fileobj, mask)
+                elif key.data is not None:
+                    service_session(selector, key.data, mask, ack_timers)
+                elif key.fileobj is wakeup:
+                    close_all_sessions(selector, sessions)
+                    return
+                elif transport == 'udp':
+                    service_datagrams(server_socket, sessions, settings, ack_timers)
+                else:
+                    accept_clients(server_socket, selector, settings)
+            timeout = fire_ack_timers(selector, ack_timers)
+            if sessions:
+                # UDP não avisa quando o cliente some: verificar sessões inativas periodicamente
+                if time.monotonic() >= next_reap:
+                    reap_idle_sessions(sessions, settings)
+                    next_reap = time.monotonic() + IDLE_CHECK_INTERVAL
+                timeout = min(timeout if timeout is not None else IDLE_CHECK_INTERVAL, IDLE_CHECK_INTERVAL)
+    finally:
+        for endpoint in metrics_endpoints:
+            endpoint.shutdown()
+        selector.close()
+        server_socket.close()
+
+class Server:
+    """Servidor importável: o laço de eventos da CLI, entregando cada mensagem completa a um handler
+
+    Com a porta 0 o sistema escolhe uma porta livre (em .port). serve() bloqueia até shutdown(),
+    que pode ser chamado de outro thread.
+    """
+
+    def __init__(self, host='localhost', port=8080, settings=None, transport='tcp', backlog=socket.SOMAXCONN,
+                 metrics_endpoints=()):
+        self.settings = settings if settings is not None else ServerSettings()
+        self.transport = transport
+        self.metrics_endpoints = metrics_endpoints
+        self.socket = bind_server(host, port, backlog, transport)
+        self.host, self.port = self.socket.getsockname()[:2]
+        self.wakeup, self.waker = socket.socketpair() # Acorda o laço de eventos para encerrar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def serve(self, handler=None):
+        """Atende conexões até shutdown(); handler(texto, endereço) recebe cada mensagem completa"""
+        if handler is not None:
+            self.settings.handler = handler
+        try:
+            serve_socket(self.socket, self.settings, self.transport, self.metrics_endpoints, self.wakeup)
+        finally:
+            self.wakeup.close()
+            self.waker.close()
+
+    def shutdown(self):
+        """Pede ao laço de eventos que encerre as sessões e retorne"""
+        try:
+            self.waker.send(b'\0')
+        except OSError:
+            pass # Laço já encerrado
+
+def run_workers(args, create_settings, create_endpoints):
+    """Modo pré-fork: args.workers processos atendem o mesmo endereço; o supervisor serve as métricas combinadas
+
+    Cada worker tem o próprio laço de eventos, sessões e tickets (uma retomada que chega a outro worker
+    faz o handshake completo).
+    """
+    # Sem SO_REUSEPORT os workers herdam um único socket TCP, criado antes do fork
+    shared_socket = None if args.reuse_port else bind_server(args.host, args.port, args.backlog, args.transport)
+    port = args.port
+    if shared_socket is None:
+        # Associação de teste antes do fork: um endereço em uso falha aqui uma vez, e não a cada worker recriado
+        probe = bind_server(args.host, port, args.backlog, args.transport, reuse_port=True)
+        port = probe.getsockname()[1]  # Porta 0: todos os workers na porta escolhida pelo sistema
+        probe.close()
+
+    def serve_worker(index, reporter):
+        settings = create_settings()
+        settings.stripes = None  # As faixas de uma transferência poderiam chegar a workers diferentes
+        reporter.start(settings.metrics.registry)
+        server_socket = shared_socket
+        if server_socket is None:
+            server_socket = bind_server(args.host, port, args.backlog, args.transport, reuse_port=True)
+        serve_socket(server_socket, settings, args.transport)
+
+    supervisor = Supervisor(args.workers, serve_worker)
+    supervisor.run(create_endpoints(supervisor.view))
+    if shared_socket is not None:
+        shared_socket.close()
+    log.info("\nServidor encerrado")
+
+def main():
+    # ===== CONFIGURAÇÕES DO SERVIDOR (via CLI) =====
+    parser = argparse.ArgumentParser(description='Servidor do Protocolo de Transporte Confiável')
+    parser.add_argument('--host', type=str, default='localhost', help='Endereço do servidor (padrão: localhost)')
+    parser.add_argument('--port', type=int, default=8080, help='Porta do servidor (padrão: 8080)')
+    parser.add_argument('--window-size', type=int, default=64,
+                        help='Janela de recepção anunciada ao cliente, em pacotes (padrão: 64)')
+    parser.add_argument('--max-message-size', type=parse_size, default=DEFAULT_MAX_MESSAGE_SIZE,
+                        help='Maior mensagem aceita em caracteres, aceita sufixos K/M/G (padrão: 1G)')
+    parser.add_argument('--max-segment-size', type=parse_size, default=MAX_SEGMENT_SIZE,
+                        help=f'Maior segmento aceito em caracteres (padrão e máximo: {MAX_SEGMENT_SIZE})')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Gravar dados entregues em streaming: "-" (stdout), diretório (um arquivo por sessão) ou arquivo')
+    parser.add_argument('--ack-every', type=int, default=2,
+                        help='ACK cumulativo a cada N pacotes em ordem (padrão: 2)')
+    parser.add_argument('--ack-delay', type=float, default=0.02,
+                        help='Atraso máximo de um ACK cumulativo em segundos (padrão: 0.02)')
+    parser.add_argument('--backlog', type=int, default=socket.SOMAXCONN,
+                        help=f'Fila de conexões pendentes (padrão: {socket.SOMAXCONN})')
+    parser.add_argument('--transport', type=str, default='tcp', choices=TRANSPORTS,
+                        help='Transporte: tcp ou udp, onde a confiabilidade fica só com o protocolo (padrão: tcp)')
+    parser.add_argument('--idle-timeout', type=float, default=60.0,
+                        help='Encerrar sessões UDP sem tráfego após este tempo em segundos (padrão: 60)')
+    parser.add_argument('--tcp-nodelay', action=argparse.BooleanOptionalAction, default=True,
+                        help='Desativar o algoritmo de Nagle nas conexões TCP (padrão: ativado)')
+    parser.add_argument('--max-streams', type=int, default=64,
+                        help='Fluxos (mensagens) simultâneos por conexão multiplexada (padrão: 64)')
+    parser.add_argument('--ticket-lifetime', type=float, default=3600.0,
+                        help='Validade dos tickets de retomada de sessão em segundos, 0 desativa (padrão: 3600)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Expor métricas por HTTP nesta porta (Prometheus em /metrics, JSON em /metrics.json)')
+    parser.add_argument('--metrics-host', type=str, default='127.0.0.1',
+                        help='Endereço do endpoint de métricas (padrão: 127.0.0.1, apenas local)')
+    parser.add_argument('--metrics-unix', type=str, default=None,
+                        help='Expor métricas por HTTP em um socket Unix neste caminho')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processos worker atendendo o mesmo endereço, com um supervisor que recria os que terminam (padrão: 1)')
+    parser.add_argument('--reuse-port', action=argparse.BooleanOptionalAction, default=hasattr(socket, 'SO_REUSEPORT'),
+                        help='Com --workers: cada worker associa o endereço com SO_REUSEPORT; sem, compartilham um socket TCP '
+                             '(padrão: ativado se disponível)')
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    for option, value in (('--window-size', args.window_size), ('--max-streams', args.max_streams),
+                          ('--max-segment-size', args.max_segment_size)):
+        if value < 1:
+            parser.error(f"{option} deve ser pelo menos 1")
+    if args.window_size >= SEQ_SPACE // 2:
+        # Números de sequência no fio são módulo 2^32: a janela precisa ser menor que metade do espaço
+        parser.error(f"--window-size deve ser menor que {SEQ_SPACE // 2}")
+    if args.max_segment_size > MAX_SEGMENT_SIZE:
+        parser.error(f"--max-segment-size não pode exceder {MAX_SEGMENT_SIZE}")
+    if args.workers > 1:
+        if args.reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            parser.error("SO_REUSEPORT não está disponível neste sistema: use --no-reuse-port")
+        if args.transport == 'udp' and not args.reuse_port:
+            # Um socket UDP compartilhado espalharia os datagramas de uma sessão entre os workers
+            parser.error("--transport udp com --workers requer --reuse-port")
+        if not hasattr(os, 'fork'):
+            parser.error("--workers requer os.fork (sistemas POSIX)")
+
+    if args.output == '-':
+        # stdout passa a carregar apenas os dados recebidos; mensagens de log vão para stderr
+        sys.__stdout__.reconfigure(encoding='utf-8', errors='surrogateescape', newline='')
+        sys.stdout = sys.stderr
+    configure_logging(args)
+
+    def create_settings():
+        return ServerSettings(args.window_size, args.max_message_size, args.max_segment_size, args.output,
+                              max(1, args.ack_every), max(0.0, args.ack_delay), args.idle_timeout,
+                              args.tcp_nodelay, args.max_streams, args.ticket_lifetime)
+
+    def create_endpoints(registry):
+        metrics_endpoints = []
+        if args.metrics_port is not None:
+            metrics_endpoints.append(MetricsEndpoint(registry, (args.metrics_host, args.metrics_port)))
+        if args.metrics_unix:
+            metrics_endpoints.append(MetricsEndpoint(registry, args.metrics_unix, unix=True))
+        return metrics_endpoints
+
+    if args.workers > 1:
+        run_workers(args, create_settings, create_endpoints)
+        return
+
+    settings = create_settings()
+    metrics_endpoints = create_endpoints(settings.metrics.registry)
+    try:
+        run_server(args.host, args.port, settings, args.backlog, args.transport, metrics_endpoints)
+    except KeyboardInterrupt:
+        log.info("\nServidor encerrado")
+
+if __name__ == '__main__':
+    main()
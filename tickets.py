@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import secrets
+from collections import OrderedDict
+
+# Tickets de sessão: retomada sem negociação completa e envio de dados junto com o handshake (0-RTT)
+
+TICKET_BYTES = 16        # Entropia do identificador opaco entregue ao cliente
+MAX_TICKETS = 100000     # Tickets guardados pelo servidor (os mais antigos são descartados primeiro)
+RESUME_NONCE_BYTES = 16  # Valor aleatório do cliente em cada retomada (chave AEAD nova a cada sessão)
+
+class TicketStore:
+    """Tickets emitidos pelo servidor: parâmetros negociados guardados em memória, válidos uma única vez
+
+    O uso único impede que um handshake com dados 0-RTT capturado seja reproduzido.
+    """
+
+    def __init__(self, lifetime, capacity=MAX_TICKETS):
+        self.lifetime = lifetime
+        self.capacity = capacity
+        self.tickets = OrderedDict()  # ticket -> (instante de expiração, parâmetros), em ordem de emissão
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def issue(self, params):
+        """Guarda os parâmetros e devolve o ticket que permite retomá-los"""
+        ticket = secrets.token_urlsafe(TICKET_BYTES)
+        self.tickets[ticket] = (time.monotonic() + self.lifetime, params)
+        while len(self.tickets) > self.capacity:
+            self.tickets.popitem(last=False)
+        return ticket
+
+    def redeem(self, ticket):
+        """Parâmetros do ticket, consumindo-o; None se desconhecido, já usado ou expirado"""
+        entry = self.tickets.pop(ticket, None) if isinstance(ticket, str) else None
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+def cache_key(host, port):
+    """Chave do servidor no cache de tickets do cliente"""
+    return f"{host}:{port}"
+
+def load_ticket(path, host, port, request):
+    """Ticket guardado pelo cliente para o servidor, se ainda válido e emitido para o mesmo pedido"""
+    try:
+        with open(path) as cache_file:
+            entry = json.load(cache_file).get(cache_key(host, port))
+    except (OSError, ValueError):
+        return None
+    if entry is None or entry.get("expires", 0) < time.time() or entry.get("request") != request:
+        return None
+    return entry
+
+def save_ticket(path, host, port, entry):
+    """Grava (ou remove, com entry None) o ticket do servidor no cache do cliente, legível só pelo dono"""
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        cache = {}
+    now = time.time()
+    cache = {key: value for key, value in cache.items() if value.get("expires", 0) >= now}
+    if entry is None:
+        cache.pop(cache_key(host, port), None)
+    else:
+        cache[cache_key(host, port)] = entry
+    # O segredo de retomada da cifra fica no arquivo: permissões restritas ao usuário
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as cache_file:
+        json.dump(cache, cache_file)
@@ -0,0 +1,47 @@
+import heapq
+
+# Timers de retransmissão do remetente
+
+class RetransmissionTimers:
+    """Timers de retransmissão em um heap ordenado pelo instante de envio
+
+    Todos os pacotes compartilham o RTO atual, então o mais antigo é sempre o próximo a expirar.
+    Armar custa O(log n); cancelar é O(1) e a entrada obsoleta é descartada quando chega ao topo.
+    """
+
+    def __init__(self):
+        self.heap = []     # (instante de envio, seq), incluindo entradas canceladas ou rearmadas
+        self.sent_at = {}  # Instante de envio vigente de cada pacote com timer ativo
+
+    def __len__(self):
+        return len(self.sent_at)
+
+    def __contains__(self, seq_num):
+        return seq_num in self.sent_at
+
+    def arm(self, seq_num, now):
+        """Inicia (ou reinicia, na retransmissão) o timer do pacote"""
+        self.sent_at[seq_num] = now
+        heapq.heappush(self.heap, (now, seq_num))
+
+    def cancel(self, seq_num):
+        """Cancela o timer do pacote; False se não havia timer ativo"""
+        return self.sent_at.pop(seq_num, None) is not None
+
+    def sent_time(self, seq_num):
+        """Instante do último envio do pacote (None sem timer ativo)"""
+        return self.sent_at.get(seq_num)
+
+    def earliest(self):
+        """(instante de envio, seq) do timer ativo mais antigo, ou None"""
+        heap = self.heap
+        while heap:
+            sent_at, seq_num = heap[0]
+            if self.sent_at.get(seq_num) == sent_at:
+                return sent_at, seq_num
+            heapq.heappop(heap)  # Cancelado ou rearmado depois
+        return None
+
+    def clear(self):
+        self.heap.clear()
+        self.sent_at.clear()
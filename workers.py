@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import signal
+import logging
+import selectors
+import threading
+
+from metrics import MetricsRegistry, MetricsEndpoint, SnapshotView, merge_snapshots
+
+# Modo pré-fork do servidor: um supervisor cria N processos worker (cada um com seu laço de eventos),
+# recria os que terminam e combina as métricas que eles enviam periodicamente por um pipe
+
+log = logging.getLogger('workers')
+
+STATS_INTERVAL = 1.0     # Segundos entre os snapshots de métricas enviados por cada worker
+RESTART_DELAY = 0.1      # Espera antes de recriar um worker que terminou (dobra a cada falha seguida)
+MAX_RESTART_DELAY = 10.0
+STABLE_AFTER = 10.0      # Worker que rodou por esse tempo volta ao atraso mínimo se terminar
+STOP_TIMEOUT = 5.0       # Espera pelos workers ao encerrar antes de SIGKILL
+READ_SIZE = 65536
+
+def strip_samples(snapshot):
+    """Snapshot sem as amostras das séries temporais (o supervisor só combina o valor atual)"""
+    for metric in snapshot.values():
+        for entry in metric["values"]:
+            if isinstance(entry["value"], dict) and "samples" in entry["value"]:
+                entry["value"] = {"value": entry["value"]["value"], "samples": []}
+    return snapshot
+
+def retained(snapshot):
+    """Parte de um snapshot que continua valendo depois que o worker termina: contadores e histogramas"""
+    return {name: metric for name, metric in snapshot.items() if metric["type"] in ('counter', 'histogram')}
+
+def metric_total(snapshot, name):
+    """Soma de todos os rótulos de um contador ou medidor (0 se ausente)"""
+    metric = snapshot.get(name)
+    return sum(entry["value"] or 0 for entry in metric["values"]) if metric else 0
+
+class MetricsReporter:
+    """Lado do worker: envia o snapshot das métricas ao supervisor, uma linha JSON a cada intervalo"""
+
+    def __init__(self, fd, interval=STATS_INTERVAL):
+        self.stream = os.fdopen(fd, 'wb')
+        self.interval = interval
+        self.registry = None
+        self.lock = threading.Lock()
+
+    def start(self, registry):
+        """Começa os envios periódicos em um thread (o laço de eventos não é interrompido)"""
+        self.registry = registry
+        threading.Thread(target=self.run, name='metrics-reporter', daemon=True).start()
+
+    def run(self):
+        try:
+            while True:
+                self.send()
+                time.sleep(self.interval)
+        except OSError:
+            pass  # Supervisor encerrado: pipe fechado
+
+    def send(self):
+        if self.registry is None:
+            return
+        for _ in range(3):
+            try:
+                snapshot = self.registry.snapshot()
+                break
+            except RuntimeError:
+                continue  # Rótulo novo criado pelo laço de eventos durante a leitura: tentar de novo
+        else:
+            return
+        line = json.dumps(strip_samples(snapshot)).encode() + b'\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+class WorkerSlot:
+    """Posição de um worker: o processo atual, o pipe de métricas e o último snapshot recebido"""
+
+    def __init__(self, index):
+        self.index = index
+        self.pid = None
+        self.reader = None          # Extremidade de leitura do pipe de métricas
+        self.buffer = b''
+        self.snapshot = {}
+        self.started = 0.0
+        self.delay = RESTART_DELAY
+        self.restart_at = None      # Instante da recriação pendente (worker terminou)
+
+class Supervisor:
+    """Cria e mantém count workers; target(índice, reporter) roda o servidor no processo filho
+
+    Workers que terminam são recriados com espera crescente enquanto falharem logo após iniciar.
+    As métricas dos workers vivos são somadas (mais os contadores dos que já terminaram) e servidas
+    pelos endpoints passados a run().
+    """
+
+    def __init__(self, count, target, interval=STATS_INTERVAL):
+        self.target = target
+        self.interval = interval
+        self.slots = [WorkerSlot(index) for index in range(count)]
+        self.selector = selectors.DefaultSelector()
+        self.retired = {}  # Contadores e histogramas de workers que já terminaram
+        self.registry = MetricsRegistry()
+        self.alive = self.registry.gauge('workers_alive', 'Processos worker em execução')
+        self.restarts = self.registry.counter('worker_restarts_total', 'Workers recriados após terminarem')
+        self.view = SnapshotView(self.snapshot)
+        self.metrics_endpoints = ()
+        self.stopping = False
+
+    def snapshot(self):
+        """Métricas combinadas: supervisor, workers que terminaram e o último snapshot de cada worker vivo"""
+        return merge_snapshots([self.registry.snapshot(), self.retired, *(slot.snapshot for slot in self.slots)])
+
+    def spawn(self, slot):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self.run_child(slot, write_fd)
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        slot.pid, slot.reader, slot.buffer = pid, read_fd, b''
+        slot.started, slot.restart_at = time.monotonic(), None
+        self.selector.register(read_fd, selectors.EVENT_READ, slot)
+        self.alive.inc()
+        log.info("[WORKERS] Worker %d iniciado (pid %d)", slot.index, pid)
+
+    def run_child(self, slot, write_fd):
+        """Processo filho: descarta o que é do supervisor, roda target e termina sem voltar ao chamador"""
+        code = 0
+        reporter = None
+        try:
+            signal.signal(signal.SIGTERM, signal.default_int_handler)  # Encerra o laço como Ctrl+C
+            self.selector.close()
+            for other in self.slots:
+                if other.reader is not None:
+                    os.close(other.reader)
+            for endpoint in self.metrics_endpoints:
+                endpoint.listener.close()  # Sem shutdown(): removeria o socket Unix do supervisor
+            reporter = MetricsReporter(write_fd, self.interval)
+            self.target(slot.index, reporter)
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            log.exception("[WORKERS] Worker %d falhou", slot.index)
+            code = 1
+        finally:
+            try:
+                if reporter is not None:
+                    reporter.send()  # Snapshot final: os contadores do worker não se perdem
+            except OSError:
+                pass
+            logging.shutdown()
+            os._exit(code)
+
+    def read_stats(self, slot):
+        """Lê o pipe do worker e guarda o último snapshot completo; False no fim do pipe"""
+        pipe_open = True
+        while True:
+            try:
+                data = os.read(slot.reader, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                pipe_open = False
+                break
+            slot.buffer += data
+        lines = slot.buffer.split(b'\n')
+        slot.buffer = lines.pop()
+        for line in reversed(lines):
+            if line:
+                slot.snapshot = json.loads(line)
+                break
+        return pipe_open
+
+    def close_reader(self, slot):
+        if slot.reader is not None:
+            os.set_blocking(slot.reader, True)
+            self.read_stats(slot)  # Processo já terminou: o que restou no pipe termina em EOF
+            self.selector.unregister(slot.reader)
+            os.close(slot.reader)
+            slot.reader = None
+
+    def reap(self):
+        """Recolhe os workers que terminaram e agenda a recriação de cada um"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((slot for slot in self.slots if slot.pid == pid), None)
+            if slot is None:
+                continue
+            self.close_reader(slot)
+            self.retired = merge_snapshots([self.retired, retained(slot.snapshot)])
+            slot.snapshot, slot.pid = {}, None
+            self.alive.dec()
+            uptime = time.monotonic() - slot.started
+            if self.stopping:
+                log.info("[WORKERS] Worker %d (pid %d) encerrado", slot.index, pid)
+                continue
+            if uptime >= STABLE_AFTER:
+                slot.delay = RESTART_DELAY
+            slot.restart_at = time.monotonic() + slot.delay
+            log.warning("[WORKERS] Worker %d (pid %d) terminou com código %d após %.1fs - recriando em %.1fs",
+                        slot.index, pid, os.waitstatus_to_exitcode(status), uptime, slot.delay)
+            slot.delay = min(MAX_RESTART_DELAY, slot.delay * 2)
+
+    def restart_due(self):
+        """Recria os workers cuja espera acabou; devolve o tempo até a próxima recriação pendente"""
+        now = time.monotonic()
+        pending = None
+        for slot in self.slots:
+            if slot.restart_at is None:
+                continue
+            if slot.restart_at <= now:
+                self.restarts.inc()
+                self.spawn(slot)
+            else:
+                wait = slot.restart_at - now
+                pending = wait if pending is None else min(pending, wait)
+        return pending
+
+    def run(self, metrics_endpoints=()):
+        """Cria os workers e os mantém até o supervisor ser interrompido (Ctrl+C ou SIGTERM)"""
+        self.metrics_endpoints = metrics_endpoints
+        previous = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        for endpoint in metrics_endpoints:
+            endpoint.register(self.selector)
+            log.info("[METRICS] Métricas combinadas dos workers em %s (/metrics: Prometheus, /metrics.json: JSON)",
+                     endpoint.address)
+        log.info("[WORKERS] Supervisor (pid %d) com %d workers", os.getpid(), len(self.slots))
+        try:
+            for slot in self.slots:
+                self.spawn(slot)
+            timeout = self.interval
+            while True:
+                for key, mask in self.selector.select(timeout):
+                    if isinstance(key.data, MetricsEndpoint):
+                        key.data.service(self.selector, key.fileobj, mask)
+                    elif not self.read_stats(key.data):
+                        self.close_reader(key.data)  # Worker terminando: waitpid o recolhe em seguida
+                self.reap()
+                pending = self.restart_due()
+                timeout = self.interval if pending is None else min(self.interval, pending)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            signal.signal(signal.SIGTERM, previous)
+            for endpoint in metrics_endpoints:
+                endpoint.shutdown()
+            self.selector.close()
+        self.log_summary()
+
+    def stop(self):
+        """Envia SIGTERM aos workers e espera que terminem (SIGKILL após STOP_TIMEOUT)"""
+        self.stopping = True
+        for slot in self.slots:
+            slot.restart_at = None
+            if slot.pid is not None:
+                try:
+                    os.kill(slot.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while any(slot.pid is not None for slot in self.slots):
+            if time.monotonic() >= deadline:
+                for slot in self.slots:
+                    if slot.pid is not None:
+                        os.kill(slot.pid, signal.SIGKILL)
+                deadline = float('inf')
+            self.reap()
+            time.sleep(0.01)
+
+    def log_summary(self):
+        snapshot = self.snapshot()
+        log.info("=== ESTATÍSTICAS COMBINADAS (%d workers) ===", len(self.slots))
+        log.info("Sessões atendidas: %d", metric_total(snapshot, 'sessions_total'))
+        log.info("Mensagens completas: %d", metric_total(snapshot, 'messages_completed_total'))
+        log.info("Caracteres entregues: %d", metric_total(snapshot, 'delivered_chars_total'))
+        log.info("Pacotes recebidos: %d", metric_total(snapshot, 'packets_received_total'))
+        log.info("Workers recriados: %d", metric_total(snapshot, 'worker_restarts_total'))